@@ -0,0 +1,35 @@
+"""
+Metrics API Endpoints
+
+Databento usage metering: Prometheus scrape target, current usage and
+persisted daily totals.
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Dict, List, Any
+
+from ..core.lean_metering import usage_meter
+from ..services.lean_databento_service import lean_databento_service
+
+router = APIRouter(prefix="/api/metrics", tags=["Metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+@router.get("", response_class=PlainTextResponse)
+async def get_metrics():
+    """Today's usage and request latency in the Prometheus text format"""
+    return PlainTextResponse(usage_meter.to_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@router.get("/usage")
+async def get_usage() -> Dict[str, Any]:
+    """Usage, cost and pipeline statistics of the Databento service"""
+    stats = await lean_databento_service.get_usage_stats()
+    if not stats:
+        raise HTTPException(status_code=500, detail="Failed to get usage stats")
+    return stats
+
+@router.get("/usage/daily")
+async def get_daily_usage(days: int = Query(30, ge=1, le=366)) -> List[Dict[str, Any]]:
+    """Persisted daily totals, newest first"""
+    return usage_meter.daily_totals(days)
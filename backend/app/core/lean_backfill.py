@@ -0,0 +1,532 @@
+"""
+Lean Backfill for Smart-0DTE-System
+Historical Databento downloads through a content-addressed local DBN cache.
+
+A backfill is split into chunks of ``DATABENTO_BACKFILL_CHUNK_DAYS``, each one
+``timeseries.get_range`` request. A chunk is streamed to a partial file in
+the run's own directory, hashed, and moved to
+``{root}/objects/{sha[:2]}/{sha}.dbn``; a ref named after the hash of the
+request (dataset, schema, symbols, range) points at it. Re-runs find finished
+chunks through their refs without calling the API, and identical payloads are
+stored once. Restarts are chunk-level: an interrupted run leaves partial files
+behind, and a later run discards them (once no process holds that run's lock)
+and downloads every chunk with no ref again from its start.
+Downloads are metered as historical usage and cache hits as avoided usage.
+
+Cached chunks of market data schemas go through the data quality rules into
+the tick store. A directory of DBN files can stand in for the API
+(``DBNFixtureSource``).
+
+Usage (from backend/):
+    python -m app.core.lean_backfill --symbols SPY QQQ IWM --start 2024-01-02 --end 2024-02-01
+"""
+
+import argparse
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.lean_config import lean_config
+from app.core.lean_data_quality import DataQualityFilter
+from app.core.lean_dbn_decode import DBNReader, to_price
+from app.core.lean_live_feed import InstrumentRegistry
+from app.core.lean_metering import usage_meter
+from app.core.lean_rate_limiter import Priority, databento_rate_limiter
+from app.core.lean_tick_store import MARKET_DATA, tick_store
+
+try:
+    import databento as db
+except ImportError:
+    db = None
+
+logger = logging.getLogger(__name__)
+
+_HASH_BLOCK = 1 << 20
+
+# Schemas converted into the tick store's market data layout
+_BAR_SCHEMAS = {"ohlcv-1s", "ohlcv-1m", "ohlcv-1h", "ohlcv-1d"}
+_TRADE_SCHEMAS = {"trades"}
+_QUOTE_SCHEMAS = {"tbbo", "mbp-1"}
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path: Path, payload: Dict[str, Any]) -> None:
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(payload, sort_keys=True, default=str))
+    os.replace(tmp_path, path)
+
+
+class DBNCache:
+    """Content-addressed store of downloaded DBN files with request refs."""
+    
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or lean_config.DATABENTO_BACKFILL_CACHE_DIR)
+        self.objects_dir = self.root / "objects"
+        self.refs_dir = self.root / "refs"
+        self.partial_dir = self.root / "partial"
+        for directory in (self.objects_dir, self.refs_dir, self.partial_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "objects_written": 0,
+            "duplicate_objects": 0,
+            "bytes_written": 0,
+            "partials_discarded": 0
+        }
+        # Run directory -> its open lock file, held for the run's lifetime
+        self._run_locks: Dict[Path, Any] = {}
+    
+    @staticmethod
+    def request_key(request: Dict[str, Any]) -> str:
+        """Stable key of a request; symbol order does not matter."""
+        canonical = {**request, "symbols": sorted(request["symbols"])}
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True, default=str).encode()).hexdigest()
+    
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / f"{digest}.dbn"
+    
+    def _ref_path(self, key: str) -> Path:
+        return self.refs_dir / f"{key}.json"
+    
+    def begin_run(self) -> Path:
+        """Private partial directory for one run, locked until ``end_run``."""
+        name = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        # Locked under a hidden name first, so discard_partials never sees it unlocked
+        staging_dir = self.partial_dir / f".{name}"
+        staging_dir.mkdir()
+        lock_file = open(staging_dir / ".lock", "w")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        run_dir = self.partial_dir / name
+        staging_dir.rename(run_dir)
+        self._run_locks[run_dir] = lock_file
+        return run_dir
+    
+    def end_run(self, run_dir: Path) -> None:
+        lock_file = self._run_locks.pop(run_dir, None)
+        shutil.rmtree(run_dir, ignore_errors=True)
+        if lock_file is not None:
+            lock_file.close()
+    
+    @staticmethod
+    def partial_path(run_dir: Path, key: str) -> Path:
+        return run_dir / f"{key}.part"
+    
+    def ref(self, key: str) -> Optional[Dict[str, Any]]:
+        """Ref of a finished request whose object is still present, or None."""
+        ref_path = self._ref_path(key)
+        if not ref_path.exists():
+            return None
+        ref = json.loads(ref_path.read_text())
+        return ref if self._object_path(ref["digest"]).exists() else None
+    
+    def get(self, key: str) -> Optional[Path]:
+        ref = self.ref(key)
+        if ref is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return self._object_path(ref["digest"])
+    
+    def put(
+        self,
+        key: str,
+        partial: Path,
+        request: Dict[str, Any],
+        usage: Optional[Dict[str, int]] = None
+    ) -> Path:
+        """Move a completed download into the cache and point the request at it.
+        
+        ``usage`` (records, uncompressed DBN bytes) is kept in the ref so
+        later cache hits can be metered as avoided downloads.
+        """
+        digest = _file_digest(partial)
+        path = self._object_path(digest)
+        size = partial.stat().st_size
+        
+        if path.exists():
+            partial.unlink()
+            self.stats["duplicate_objects"] += 1
+        else:
+            path.parent.mkdir(exist_ok=True)
+            os.replace(partial, path)
+            self.stats["objects_written"] += 1
+            self.stats["bytes_written"] += size
+        
+        _write_json(self._ref_path(key), {
+            "digest": digest,
+            "bytes": size,
+            "request": request,
+            **(usage or {}),
+            "downloaded_at": datetime.utcnow().isoformat(),
+            "converted": False
+        })
+        return path
+    
+    def mark_converted(self, key: str) -> None:
+        ref = self.ref(key)
+        if ref is not None:
+            _write_json(self._ref_path(key), {**ref, "converted": True})
+    
+    def discard_partials(self) -> int:
+        """Remove downloads of earlier runs that were interrupted.
+        
+        A run directory is only removed when its lock can be taken, i.e. the
+        run that created it has exited; concurrent runs keep their partials.
+        """
+        discarded = 0
+        for run_dir in self.partial_dir.iterdir():
+            if not run_dir.is_dir() or run_dir.name.startswith(".") or run_dir in self._run_locks:
+                continue
+            try:
+                with open(run_dir / ".lock", "a") as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    discarded += sum(1 for _ in run_dir.glob("*.part"))
+                    shutil.rmtree(run_dir, ignore_errors=True)
+            except BlockingIOError:
+                continue
+        self.stats["partials_discarded"] += discarded
+        return discarded
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {"root": str(self.root), **self.stats}
+
+
+class DBNFixtureSource:
+    """Stand-in for ``Historical.timeseries`` that serves local DBN files.
+    
+    Each request is answered from the files in ``directory`` whose dataset and
+    schema match, keeping records inside the time range for the requested
+    symbols, and written to ``path`` as a DBN file like the API would.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._fixtures: Optional[List[Tuple[Any, np.ndarray]]] = None
+    
+    def _load(self) -> List[Tuple[Any, np.ndarray]]:
+        """Metadata and records of every fixture file."""
+        if self._fixtures is None:
+            paths = sorted(p for p in self.directory.iterdir() if p.name.endswith((".dbn", ".dbn.zst")))
+            self._fixtures = []
+            for path in paths:
+                reader = DBNReader(path)
+                self._fixtures.append((reader.metadata, reader.read_all()))
+        return self._fixtures
+    
+    def get_range(
+        self,
+        dataset: str,
+        start: Any,
+        end: Any,
+        symbols: Sequence[str],
+        schema: str,
+        stype_in: str = "raw_symbol",
+        path: Optional[str] = None
+    ) -> Any:
+        start_ns = np.datetime64(start, "ns").astype(np.int64)
+        end_ns = np.datetime64(end, "ns").astype(np.int64)
+        metadata, selected = None, []
+        
+        for fixture_metadata, records in self._load():
+            if fixture_metadata.dataset != dataset or str(fixture_metadata.schema) != schema:
+                continue
+            
+            registry = InstrumentRegistry()
+            registry.add_mappings(fixture_metadata.mappings)
+            # Same filter as the API: ts_recv when the schema has it
+            ts = records["ts_recv"] if "ts_recv" in records.dtype.names else records["ts_event"]
+            mask = (ts >= start_ns) & (ts < end_ns)
+            if symbols:
+                wanted = [i for i, s in registry.symbols_by_id.items() if s in symbols]
+                mask &= np.isin(records["instrument_id"], wanted)
+            
+            metadata = metadata or fixture_metadata
+            selected.append(records[mask])
+        
+        if metadata is None:
+            raise FileNotFoundError(f"No {dataset} {schema} fixtures in {self.directory}")
+        
+        records = np.concatenate(selected)
+        records = records[np.argsort(records["ts_event"], kind="stable")]
+        with open(path, "wb") as f:
+            f.write(metadata.encode())
+            f.write(records.tobytes())
+        return db.DBNStore.from_file(path)
+
+
+def dbn_to_market_data(
+    records: np.ndarray,
+    schema: str,
+    mappings: Dict[str, List[Dict[str, Any]]]
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """Market data columns per symbol from decoded bar, trade or TBBO/MBP-1 records."""
+    if len(records) == 0:
+        return {}
+    
+    if schema in _BAR_SCHEMAS:
+        columns = {
+            "price": to_price(records["close"]),
+            "open": to_price(records["open"]),
+            "high": to_price(records["high"]),
+            "low": to_price(records["low"]),
+            "volume": records["volume"].astype(np.int64),
+        }
+    elif schema in _TRADE_SCHEMAS:
+        columns = {"price": to_price(records["price"]), "volume": records["size"].astype(np.int64)}
+    elif schema in _QUOTE_SCHEMAS:
+        is_trade = records["action"] == b"T"
+        columns = {
+            "price": np.where(is_trade, to_price(records["price"]), np.nan),
+            "volume": np.where(is_trade, records["size"], 0).astype(np.int64),
+            "bid": to_price(records["bid_px_00"]),
+            "ask": to_price(records["ask_px_00"]),
+        }
+    else:
+        raise ValueError(f"Schema {schema} has no market data conversion")
+    
+    columns["timestamp"] = (records["ts_event"] // 1000).astype("datetime64[us]")
+    
+    registry = InstrumentRegistry()
+    registry.add_mappings(mappings)
+    instrument_ids = records["instrument_id"]
+    by_symbol = {}
+    for instrument_id in np.unique(instrument_ids):
+        symbol = registry.symbol(int(instrument_id))
+        if symbol is None:
+            logger.warning(f"Skipping records of unmapped instrument {instrument_id}")
+            continue
+        mask = instrument_ids == instrument_id
+        by_symbol[symbol] = {name: values[mask] for name, values in columns.items()}
+    return by_symbol
+
+
+class HistoricalBackfill:
+    """Download date ranges in parallel chunks, cache them and fill the tick store.
+    
+    ``source`` is a ``databento.Historical`` client or a ``DBNFixtureSource``.
+    """
+    
+    def __init__(
+        self,
+        source: Any,
+        cache: Optional[DBNCache] = None,
+        store: Any = None,
+        rate_limiter: Any = None,
+        concurrency: Optional[int] = None,
+        meter: Any = None
+    ):
+        self.source = source
+        self.cache = cache or DBNCache()
+        self.store = store or tick_store
+        self.rate_limiter = rate_limiter or databento_rate_limiter
+        self.concurrency = concurrency or lean_config.DATABENTO_BACKFILL_CONCURRENCY
+        self.meter = meter or usage_meter
+        self._is_fixture = isinstance(source, DBNFixtureSource)
+        # Separate from the live filter: history would move its per-instrument state back in time
+        self.quality = DataQualityFilter()
+        
+        self.stats = {
+            "chunks_planned": 0,
+            "chunks_cached": 0,
+            "chunks_downloaded": 0,
+            "chunks_failed": 0,
+            "chunks_converted": 0,
+            "rows_converted": 0
+        }
+    
+    def plan(
+        self,
+        symbols: Sequence[str],
+        start: date,
+        end: date,
+        schema: Optional[str] = None,
+        dataset: Optional[str] = None,
+        chunk_days: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Requests covering [start, end) in chunks of ``chunk_days``."""
+        step = timedelta(days=chunk_days or lean_config.DATABENTO_BACKFILL_CHUNK_DAYS)
+        requests = []
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = min(chunk_start + step, end)
+            requests.append({
+                "dataset": dataset or lean_config.DATABENTO_EQUITY_DATASET,
+                "schema": schema or lean_config.DATABENTO_BACKFILL_SCHEMA,
+                "symbols": list(symbols),
+                "stype_in": "raw_symbol",
+                "start": chunk_start.isoformat(),
+                "end": chunk_end.isoformat()
+            })
+            chunk_start = chunk_end
+        return requests
+    
+    def _get_range(self, request: Dict[str, Any], path: Path) -> Tuple[int, int]:
+        """Download a request to ``path``; returns its records and uncompressed bytes."""
+        timeseries = self.source if self._is_fixture else self.source.timeseries
+        with self.meter.request("historical"):
+            timeseries.get_range(**request, path=str(path))
+        
+        with DBNReader(path) as reader:
+            for _ in reader:
+                pass
+            return reader.stats["records"], reader.stats["bytes"]
+    
+    async def _fetch(self, request: Dict[str, Any], run_dir: Path) -> Tuple[str, Optional[Path]]:
+        """Cached object for a request, downloading it if needed."""
+        key = self.cache.request_key(request)
+        path = self.cache.get(key)
+        if path is not None:
+            self.stats["chunks_cached"] += 1
+            ref = self.cache.ref(key)
+            self.meter.avoid("historical", request["schema"], ref.get("dbn_bytes", ref["bytes"]))
+            return key, path
+        
+        if not self._is_fixture:
+            admitted = await self.rate_limiter.acquire(
+                "historical", Priority.BACKGROUND, max_wait=lean_config.DATABENTO_BACKFILL_MAX_WAIT
+            )
+            if not admitted:
+                self.stats["chunks_failed"] += 1
+                logger.warning(f"Backfill chunk {request['start']} deferred: no rate limit budget")
+                return key, None
+        
+        partial = self.cache.partial_path(run_dir, key)
+        try:
+            records, nbytes = await asyncio.to_thread(self._get_range, request, partial)
+            path = self.cache.put(key, partial, request, {"records": records, "dbn_bytes": nbytes})
+        except Exception as e:
+            partial.unlink(missing_ok=True)
+            self.stats["chunks_failed"] += 1
+            logger.error(f"Backfill chunk {request['schema']} {request['start']} failed: {e}")
+            return key, None
+        
+        self.stats["chunks_downloaded"] += 1
+        self.meter.add("historical", request["schema"], records, nbytes, requests=1)
+        return key, path
+    
+    def convert(self, key: str, path: Path, force: bool = False) -> int:
+        """Write a cached chunk into the tick store once; returns rows written."""
+        ref = self.cache.ref(key)
+        if ref is None or (ref.get("converted") and not force):
+            return 0
+        
+        with DBNReader(path) as reader:
+            if reader.schema not in _BAR_SCHEMAS | _TRADE_SCHEMAS | _QUOTE_SCHEMAS:
+                return 0
+            by_symbol = dbn_to_market_data(reader.read_all(), reader.schema, reader.mappings)
+        
+        rows = 0
+        # Named after the object so converting again replaces instead of duplicating
+        name = f"backfill-{ref['digest'][:16]}"
+        for symbol, columns in by_symbol.items():
+            columns = self.quality.filter_columns(symbol, columns)
+            rows += self.store.append_columns(MARKET_DATA, symbol, columns, name=name)
+        
+        self.cache.mark_converted(key)
+        self.stats["chunks_converted"] += 1
+        self.stats["rows_converted"] += rows
+        return rows
+    
+    async def run(
+        self,
+        symbols: Sequence[str],
+        start: date,
+        end: date,
+        schema: Optional[str] = None,
+        dataset: Optional[str] = None,
+        convert: bool = True
+    ) -> Dict[str, Any]:
+        """Backfill [start, end); safe to re-run, and a re-run after a failure
+        downloads only the chunks that have no cached object.
+        """
+        requests = self.plan(symbols, start, end, schema, dataset)
+        self.stats["chunks_planned"] += len(requests)
+        self.cache.discard_partials()
+        run_dir = self.cache.begin_run()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def fetch(request: Dict[str, Any]) -> Tuple[str, Optional[Path]]:
+            async with semaphore:
+                return await self._fetch(request, run_dir)
+        
+        try:
+            results = await asyncio.gather(*(fetch(request) for request in requests))
+        finally:
+            self.cache.end_run(run_dir)
+        missing = [request["start"] for request, (_, path) in zip(requests, results) if path is None]
+        
+        rows = 0
+        if convert:
+            for key, path in results:
+                if path is not None:
+                    rows += await asyncio.to_thread(self.convert, key, path)
+        
+        summary = {
+            "chunks": len(requests),
+            "complete": len(requests) - len(missing),
+            "missing": missing,
+            "rows_converted": rows
+        }
+        self.meter.flush()
+        logger.info(f"Backfill {start} to {end}: {summary['complete']}/{summary['chunks']} chunks, {rows} rows")
+        return summary
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "cache": self.cache.get_stats(),
+            "data_quality": self.quality.get_stats(),
+            "source": type(self.source).__name__
+        }
+
+
+def create_source(fixture_dir: Optional[str] = None) -> Any:
+    """Fixture source when a fixture directory is configured, else the Historical API."""
+    fixture_dir = fixture_dir or lean_config.DATABENTO_BACKFILL_FIXTURE_DIR
+    if fixture_dir:
+        return DBNFixtureSource(fixture_dir)
+    if not lean_config.DATABENTO_API_KEY:
+        raise RuntimeError("Set DATABENTO_API_KEY or a backfill fixture directory")
+    return db.Historical(key=lean_config.DATABENTO_API_KEY)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill Databento history into the tick store")
+    parser.add_argument("--symbols", nargs="+", default=lean_config.SUPPORTED_TICKERS)
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True, help="Exclusive")
+    parser.add_argument("--schema", default=lean_config.DATABENTO_BACKFILL_SCHEMA)
+    parser.add_argument("--dataset", default=lean_config.DATABENTO_EQUITY_DATASET)
+    parser.add_argument("--fixtures", help="Directory of DBN files to use instead of the API")
+    parser.add_argument("--no-convert", action="store_true", help="Only fill the DBN cache")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    backfill = HistoricalBackfill(create_source(args.fixtures))
+    summary = asyncio.run(backfill.run(
+        args.symbols, args.start, args.end, args.schema, args.dataset, convert=not args.no_convert
+    ))
+    print(json.dumps({**summary, "stats": backfill.get_stats()}, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,32 +4,150 @@ Optimized Redis caching for cost-effective deployment.
 """
 
 import asyncio
+import inspect
 import logging
 import json
-import gzip
-import pickle
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Union, Callable
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import asdict, is_dataclass
+from datetime import date, datetime, timedelta, time as dt_time
+from decimal import Decimal
+from enum import Enum
+from typing import Dict, List, Optional, Any, Union, Callable, Tuple, Awaitable, Iterable
 import redis.asyncio as redis
-import msgpack
 from functools import wraps
 import hashlib
+import numpy as np
 
-from app.core.lean_config import lean_config, cache_optimization, get_cache_ttl
+from app.core.lean_config import lean_config, cache_optimization, data_optimization, get_cache_ttl
+from app.core.lean_codecs import codec_registry, is_compressed, is_model, model_to_dict
+from app.core.lean_metering import usage_meter
+from app.core.lean_cache_invalidation import CacheInvalidationBus
 
 logger = logging.getLogger(__name__)
 
+# Sentinel distinguishing an L1 miss from a cached ``None``
+_MISSING = object()
+
+
+def _estimate_size(value: Any, _depth: int = 0) -> int:
+    """Roughly estimate the in-memory footprint of a cached value in bytes."""
+    size = sys.getsizeof(value)
+    if _depth >= 4:
+        return size
+    
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += _estimate_size(k, _depth + 1) + _estimate_size(v, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += _estimate_size(item, _depth + 1)
+    
+    return size
+
+
+class L1Cache:
+    """In-process LRU cache with per-entry TTLs and a byte budget.
+    
+    Entries live in an ``OrderedDict`` ordered from least to most recently
+    used, so lookups, promotions and evictions are all O(1). Expiry is checked
+    lazily on access using ``time.monotonic()``.
+    """
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        # key -> (value, expires_at, size_bytes)
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not _MISSING
+    
+    def get(self, key: str) -> Any:
+        """Return the cached value or ``_MISSING``, refreshing its recency."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        
+        value, expires_at, size = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.current_bytes -= size
+            self.expirations += 1
+            return _MISSING
+        
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any, ttl: float, size: Optional[int] = None) -> bool:
+        """Insert or replace an entry, evicting least recently used entries as needed."""
+        if size is None:
+            size = _estimate_size(value)
+        
+        self.pop(key)
+        
+        # Never let a single oversized value flush the whole tier
+        if size > self.max_bytes or ttl <= 0:
+            return False
+        
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        self.current_bytes += size
+        self._evict()
+        return True
+    
+    def pop(self, key: str) -> bool:
+        """Remove an entry, returning whether it was present."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        
+        self.current_bytes -= entry[2]
+        return True
+    
+    def remove_prefix(self, prefix: str) -> int:
+        """Remove every entry whose key starts with ``prefix``."""
+        keys_to_remove = [k for k in self._entries if k.startswith(prefix)]
+        for key in keys_to_remove:
+            self.pop(key)
+        return len(keys_to_remove)
+    
+    def resize(self, max_bytes: int) -> None:
+        """Change the byte budget, evicting immediately if it shrank."""
+        self.max_bytes = max_bytes
+        self._evict()
+    
+    def clear(self) -> None:
+        self._entries.clear()
+        self.current_bytes = 0
+    
+    def _evict(self) -> None:
+        """Pop least recently used entries until the tier is within budget."""
+        while self._entries and self.current_bytes > self.max_bytes:
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
 
 class LeanCacheManager:
     """Optimized cache manager for lean deployment with intelligent strategies."""
     
     def __init__(self):
         self.redis_client = None
-        self.l1_cache = {}  # In-memory L1 cache
-        self.l1_cache_timestamps = {}
-        self.l1_cache_max_size = cache_optimization.L1_CACHE_SIZE
-        self.compression_enabled = True
+        self.invalidation_bus: Optional[CacheInvalidationBus] = None
+        self.l1_cache = L1Cache(cache_optimization.L1_CACHE_MAX_BYTES)  # In-memory L1 cache
+        self.compression_enabled = lean_config.CACHE_COMPRESSION
         self.serialization_method = lean_config.CACHE_SERIALIZATION
+        self.codec = codec_registry.get_codec(
+            self.serialization_method,
+            data_optimization.COMPRESSION_ALGORITHM if self.compression_enabled else "none",
+            on_encode=usage_meter.observe_compression
+        )
         
         # Cache statistics
         self.stats = {
@@ -40,8 +158,17 @@ class LeanCacheManager:
             "sets": 0,
             "deletes": 0,
             "compressions": 0,
-            "decompressions": 0
+            "decompressions": 0,
+            "coalesced": 0,
+            "stale_hits": 0,
+            "background_refreshes": 0
         }
+        
+        # Single-flight state: one in-flight load task per cache key
+        self._inflight: Dict[str, asyncio.Task] = {}
+        
+        # cache_result calls, hits and misses per decorated function
+        self.function_stats: Dict[str, Dict[str, int]] = {}
     
     async def initialize(self) -> None:
         """Initialize Redis connection with optimized settings."""
@@ -66,6 +193,11 @@ class LeanCacheManager:
             # Configure Redis for optimal memory usage
             await self._configure_redis_optimization()
             
+            # Keep L1 caches coherent across workers
+            if cache_optimization.CACHE_INVALIDATION_ENABLED:
+                self.invalidation_bus = CacheInvalidationBus(self.redis_client, self.l1_cache)
+                await self.invalidation_bus.start()
+            
             # Start cache warming if enabled
             if cache_optimization.CACHE_WARMING_ENABLED:
                 asyncio.create_task(self._cache_warming_loop())
@@ -101,22 +233,11 @@ class LeanCacheManager:
             logger.warning(f"Could not apply Redis optimization: {e}")
     
     def _serialize_data(self, data: Any) -> bytes:
-        """Serialize data using configured method with compression."""
+        """Serialize data using the configured codec with compression."""
         try:
-            # Choose serialization method
-            if self.serialization_method == "msgpack":
-                serialized = msgpack.packb(data)
-            elif self.serialization_method == "pickle":
-                serialized = pickle.dumps(data)
-            else:
-                serialized = json.dumps(data).encode('utf-8')
-            
-            # Compress if enabled and data is large enough
-            if self.compression_enabled and len(serialized) > 1024:  # Compress if > 1KB
-                compressed = gzip.compress(serialized)
+            serialized = self.codec.encode(data)
+            if is_compressed(serialized):
                 self.stats["compressions"] += 1
-                return b"GZIP:" + compressed
-            
             return serialized
             
         except Exception as e:
@@ -124,20 +245,11 @@ class LeanCacheManager:
             return json.dumps(str(data)).encode('utf-8')
     
     def _deserialize_data(self, data: bytes) -> Any:
-        """Deserialize data with decompression support."""
+        """Deserialize data written by any registered codec."""
         try:
-            # Check if data is compressed
-            if data.startswith(b"GZIP:"):
-                data = gzip.decompress(data[5:])
+            if is_compressed(data):
                 self.stats["decompressions"] += 1
-            
-            # Choose deserialization method
-            if self.serialization_method == "msgpack":
-                return msgpack.unpackb(data, raw=False)
-            elif self.serialization_method == "pickle":
-                return pickle.loads(data)
-            else:
-                return json.loads(data.decode('utf-8'))
+            return self.codec.decode(data)
                 
         except Exception as e:
             logger.error(f"Failed to deserialize data: {e}")
@@ -147,19 +259,22 @@ class LeanCacheManager:
         """Generate standardized cache key with namespace."""
         return f"{namespace}:{key}"
     
-    def _evict_l1_cache(self) -> None:
-        """Evict oldest entries from L1 cache when it's full."""
-        if len(self.l1_cache) >= self.l1_cache_max_size:
-            # Remove oldest 20% of entries
-            sorted_keys = sorted(
-                self.l1_cache_timestamps.keys(),
-                key=lambda k: self.l1_cache_timestamps[k]
-            )
-            
-            keys_to_remove = sorted_keys[:int(self.l1_cache_max_size * 0.2)]
-            for key in keys_to_remove:
-                self.l1_cache.pop(key, None)
-                self.l1_cache_timestamps.pop(key, None)
+    def _resolve_ttl(self, key: str, ttl: Optional[int] = None) -> int:
+        """Resolve the TTL for a key from its data type prefix."""
+        if ttl is not None:
+            return ttl
+        
+        data_type = key.split(':')[0] if ':' in key else 'default'
+        return get_cache_ttl(data_type)
+    
+    def _promotion_ttl(self, key: str, pttl: int) -> float:
+        """L1 TTL of a value read from Redis: the key's TTL, capped at what is
+        left of the Redis entry (PTTL is -1 without an expiry, -2 if gone).
+        """
+        ttl = self._resolve_ttl(key)
+        if pttl == -2:
+            return 0
+        return min(ttl, pttl / 1000) if pttl >= 0 else ttl
     
     async def get(self, key: str, default: Any = None) -> Any:
         """Get value from cache with L1/L2 hierarchy."""
@@ -167,22 +282,23 @@ class LeanCacheManager:
         
         try:
             # Check L1 cache first (in-memory)
-            if cache_key in self.l1_cache:
+            value = self.l1_cache.get(cache_key)
+            if value is not _MISSING:
                 self.stats["hits"] += 1
                 self.stats["l1_hits"] += 1
-                self.l1_cache_timestamps[cache_key] = datetime.utcnow()
-                return self.l1_cache[cache_key]
+                return value
             
             # Check L2 cache (Redis)
             if self.redis_client:
-                data = await self.redis_client.get(cache_key)
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.get(cache_key)
+                pipe.pttl(cache_key)
+                data, pttl = await pipe.execute()
                 if data is not None:
                     value = self._deserialize_data(data)
                     
-                    # Store in L1 cache for faster access
-                    self._evict_l1_cache()
-                    self.l1_cache[cache_key] = value
-                    self.l1_cache_timestamps[cache_key] = datetime.utcnow()
+                    # Store in L1 cache for faster access, expiring no later than Redis
+                    self.l1_cache.set(cache_key, value, self._promotion_ttl(key, pttl), len(data))
                     
                     self.stats["hits"] += 1
                     self.stats["l2_hits"] += 1
@@ -203,19 +319,21 @@ class LeanCacheManager:
         
         try:
             # Determine TTL
-            if ttl is None:
-                data_type = key.split(':')[0] if ':' in key else 'default'
-                ttl = get_cache_ttl(data_type)
-            
-            # Store in L1 cache
-            self._evict_l1_cache()
-            self.l1_cache[cache_key] = value
-            self.l1_cache_timestamps[cache_key] = datetime.utcnow()
+            ttl = self._resolve_ttl(key, ttl)
             
-            # Store in L2 cache (Redis)
+            # Store in L2 cache (Redis), sizing the L1 entry by its payload
             if self.redis_client:
                 serialized_data = self._serialize_data(value)
-                await self.redis_client.setex(cache_key, ttl, serialized_data)
+                self.l1_cache.set(cache_key, value, ttl, len(serialized_data))
+                
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.setex(cache_key, ttl, serialized_data)
+                self._index_keys(pipe, [cache_key], [ttl])
+                await pipe.execute()
+                
+                self._publish_invalidation(keys=[cache_key])
+            else:
+                self.l1_cache.set(cache_key, value, ttl)
             
             self.stats["sets"] += 1
             return True
@@ -230,12 +348,12 @@ class LeanCacheManager:
         
         try:
             # Remove from L1 cache
-            self.l1_cache.pop(cache_key, None)
-            self.l1_cache_timestamps.pop(cache_key, None)
+            self.l1_cache.pop(cache_key)
             
             # Remove from L2 cache
             if self.redis_client:
                 await self.redis_client.delete(cache_key)
+                self._publish_invalidation(keys=[cache_key])
             
             self.stats["deletes"] += 1
             return True
@@ -244,6 +362,99 @@ class LeanCacheManager:
             logger.error(f"Failed to delete cache value for key {key}: {e}")
             return False
     
+    def _namespace_of(self, cache_key: str) -> str:
+        """Indexed namespace of a key: ``smart0dte:market_data`` for ``smart0dte:market_data:SPY``."""
+        parts = cache_key.split(':', 2)
+        return f"{parts[0]}:{parts[1]}" if len(parts) > 2 else parts[0]
+    
+    def _namespace_index_key(self, namespace: str) -> str:
+        """Redis sorted set of the keys written to a namespace, scored by expiry."""
+        return f"{namespace}:__index__"
+    
+    def _index_keys(self, pipe, cache_keys: Iterable[str], ttls: Iterable[float]) -> None:
+        """Queue ZADDs recording keys in their namespace index with their expiry time."""
+        if not cache_optimization.CACHE_NAMESPACE_INDEX_ENABLED:
+            return
+        
+        now = time.time()
+        keys_by_namespace: Dict[str, Dict[str, float]] = {}
+        for cache_key, ttl in zip(cache_keys, ttls):
+            keys_by_namespace.setdefault(self._namespace_of(cache_key), {})[cache_key] = now + ttl
+        
+        for namespace, expiries in keys_by_namespace.items():
+            pipe.zadd(self._namespace_index_key(namespace), expiries)
+            pipe.sadd(f"{namespace.split(':', 1)[0]}:__namespaces__", namespace)
+    
+    async def _namespace_indexes(self, namespace: str) -> List[str]:
+        """Index keys covering ``namespace`` and the namespaces below it."""
+        root = namespace.split(':', 1)[0]
+        namespaces = [
+            member.decode() if isinstance(member, bytes) else member
+            for member in await self.redis_client.smembers(f"{root}:__namespaces__")
+        ]
+        return [
+            self._namespace_index_key(indexed) for indexed in sorted(namespaces)
+            if indexed == namespace or indexed.startswith(f"{namespace}:")
+        ]
+    
+    async def _index_complete(self, namespace: str) -> bool:
+        """Whether the indexes hold every key of the namespace's root.
+        
+        Keys written before the index existed (or while it was disabled) are
+        only in it after ``rebuild_namespace_index`` has scanned for them.
+        """
+        if not cache_optimization.CACHE_NAMESPACE_INDEX_ENABLED:
+            return False
+        return bool(await self.redis_client.exists(f"{namespace.split(':', 1)[0]}:__indexed__"))
+    
+    async def rebuild_namespace_index(self, namespace: str = "smart0dte", batch_size: Optional[int] = None) -> int:
+        """Add every live key of a root namespace to the indexes with one SCAN,
+        then mark them complete; returns the keys indexed.
+        """
+        if not self.redis_client:
+            return 0
+        
+        batch_size = batch_size or cache_optimization.CACHE_CLEAR_BATCH_SIZE
+        root = namespace.split(':', 1)[0]
+        indexed = 0
+        
+        chunk = []
+        async for key in self.redis_client.scan_iter(match=f"{root}:*", count=batch_size):
+            key = key.decode() if isinstance(key, bytes) else key
+            if not key.endswith(("__index__", "__keys__", "__namespaces__", "__indexed__")):
+                chunk.append(key)
+            if len(chunk) >= batch_size:
+                indexed += await self._index_chunk(chunk)
+                chunk = []
+        
+        if chunk:
+            indexed += await self._index_chunk(chunk)
+        
+        # Superseded by the sorted sets: the plain set of every key in the root
+        await self.redis_client.unlink(f"{root}:__keys__")
+        await self.redis_client.set(f"{root}:__indexed__", 1)
+        logger.info(f"Indexed {indexed} keys of namespace {root}")
+        return indexed
+    
+    async def _index_chunk(self, chunk: List[str]) -> int:
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key in chunk:
+            pipe.pttl(key)
+        pttls = await pipe.execute()
+        
+        # PTTL is -1 without an expiry (never pruned) and -2 if the key is gone
+        live = [(key, pttl / 1000 if pttl >= 0 else float("inf")) for key, pttl in zip(chunk, pttls) if pttl != -2]
+        if live:
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._index_keys(pipe, [key for key, _ in live], [ttl for _, ttl in live])
+            await pipe.execute()
+        return len(live)
+    
+    def _publish_invalidation(self, keys: Iterable[str] = (), prefixes: Iterable[str] = ()) -> None:
+        """Tell other workers to drop these keys from their L1 tier."""
+        if self.invalidation_bus:
+            self.invalidation_bus.publish(keys=keys, prefixes=prefixes)
+    
     async def get_many(self, keys: List[str]) -> Dict[str, Any]:
         """Get multiple values from cache efficiently."""
         results = {}
@@ -253,9 +464,9 @@ class LeanCacheManager:
         # Check L1 cache first
         for key in keys:
             cache_key = self._generate_cache_key(key)
-            if cache_key in self.l1_cache:
-                results[key] = self.l1_cache[cache_key]
-                self.l1_cache_timestamps[cache_key] = datetime.utcnow()
+            value = self.l1_cache.get(cache_key)
+            if value is not _MISSING:
+                results[key] = value
                 self.stats["l1_hits"] += 1
             else:
                 redis_keys.append(cache_key)
@@ -264,17 +475,19 @@ class LeanCacheManager:
         # Get remaining keys from Redis
         if redis_keys and self.redis_client:
             try:
-                redis_values = await self.redis_client.mget(redis_keys)
-                for cache_key, data in zip(redis_keys, redis_values):
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.mget(redis_keys)
+                for cache_key in redis_keys:
+                    pipe.pttl(cache_key)
+                redis_values, *pttls = await pipe.execute()
+                for cache_key, data, pttl in zip(redis_keys, redis_values, pttls):
                     original_key = redis_key_mapping[cache_key]
                     if data is not None:
                         value = self._deserialize_data(data)
                         results[original_key] = value
                         
-                        # Store in L1 cache
-                        self._evict_l1_cache()
-                        self.l1_cache[cache_key] = value
-                        self.l1_cache_timestamps[cache_key] = datetime.utcnow()
+                        # Store in L1 cache, expiring no later than Redis
+                        self.l1_cache.set(cache_key, value, self._promotion_ttl(original_key, pttl), len(data))
                         
                         self.stats["l2_hits"] += 1
                     else:
@@ -293,25 +506,25 @@ class LeanCacheManager:
             redis_data = {}
             for key, value in data.items():
                 cache_key = self._generate_cache_key(key)
+                key_ttl = self._resolve_ttl(key, ttl)
                 
-                # Store in L1 cache
-                self._evict_l1_cache()
-                self.l1_cache[cache_key] = value
-                self.l1_cache_timestamps[cache_key] = datetime.utcnow()
-                
-                # Prepare for Redis
-                redis_data[cache_key] = self._serialize_data(value)
+                if self.redis_client:
+                    serialized_value = self._serialize_data(value)
+                    self.l1_cache.set(cache_key, value, key_ttl, len(serialized_value))
+                    redis_data[cache_key] = (key_ttl, serialized_value)
+                else:
+                    self.l1_cache.set(cache_key, value, key_ttl)
             
             # Store in Redis with pipeline for efficiency
             if redis_data and self.redis_client:
                 pipe = self.redis_client.pipeline()
                 
-                for cache_key, serialized_value in redis_data.items():
-                    data_type = cache_key.split(':')[1] if ':' in cache_key else 'default'
-                    key_ttl = ttl or get_cache_ttl(data_type)
+                for cache_key, (key_ttl, serialized_value) in redis_data.items():
                     pipe.setex(cache_key, key_ttl, serialized_value)
+                self._index_keys(pipe, redis_data.keys(), [key_ttl for key_ttl, _ in redis_data.values()])
                 
                 await pipe.execute()
+                self._publish_invalidation(keys=redis_data.keys())
             
             self.stats["sets"] += len(data)
             return True
@@ -320,21 +533,157 @@ class LeanCacheManager:
             logger.error(f"Failed to set multiple cache values: {e}")
             return False
     
-    async def clear_namespace(self, namespace: str = "smart0dte") -> bool:
-        """Clear all keys in a namespace."""
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        stale_ttl: Optional[int] = None
+    ) -> Any:
+        """Get a value, computing it at most once per key on a miss.
+        
+        Concurrent misses on the same key wait on a single ``loader`` call
+        instead of each running it. With ``stale_ttl`` set, the value is kept
+        for ``stale_ttl`` seconds past its TTL and served stale while a single
+        background refresh runs.
+        """
+        if stale_ttl is None:
+            cached_value = await self.get(key)
+            if cached_value is not None:
+                return cached_value
+            return await self._load_single_flight(key, loader, ttl)
+        
+        # Stale-while-revalidate entries are stored as [fresh_until, value]
+        envelope = await self.get(key)
+        if envelope is not None:
+            fresh_until, cached_value = envelope
+            if time.time() < fresh_until:
+                return cached_value
+            
+            self.stats["stale_hits"] += 1
+            if key not in self._inflight:
+                self.stats["background_refreshes"] += 1
+                self._start_load(key, loader, ttl, stale_ttl).add_done_callback(self._on_refresh_done)
+            return cached_value
+        
+        return await self._load_single_flight(key, loader, ttl, stale_ttl)
+    
+    async def _load_single_flight(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int],
+        stale_ttl: Optional[int] = None
+    ) -> Any:
+        """Run ``loader`` for a key unless a computation is already in flight."""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = self._start_load(key, loader, ttl, stale_ttl)
+        # Cancelling one caller must not cancel the load the others wait on
+        return await asyncio.shield(task)
+    
+    def _start_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int],
+        stale_ttl: Optional[int] = None
+    ) -> asyncio.Task:
+        """Start the load of a key in its own task, registered as in flight
+        before it runs so concurrent callers cannot start a second one.
+        """
+        task = asyncio.create_task(self._load_and_store(key, loader, ttl, stale_ttl))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._on_load_done(key, done))
+        return task
+    
+    async def _load_and_store(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int],
+        stale_ttl: Optional[int]
+    ) -> Any:
+        result = await loader()
+        
+        if result is not None:
+            if stale_ttl is None:
+                await self.set(key, result, ttl)
+            else:
+                fresh_ttl = self._resolve_ttl(key, ttl)
+                await self.set(key, [time.time() + fresh_ttl, result], fresh_ttl + stale_ttl)
+        
+        return result
+    
+    def _on_load_done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark retrieved so a load whose callers all went away does not log a warning
+            task.exception()
+    
+    def _on_refresh_done(self, task: asyncio.Task) -> None:
+        """Log the failure of a background refresh, if any."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background cache refresh failed: {task.exception()}")
+    
+    async def clear_namespace(
+        self,
+        namespace: str = "smart0dte",
+        batch_size: Optional[int] = None,
+        full_scan: bool = False,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> bool:
+        """Clear all keys in a namespace without blocking Redis.
+        
+        ``namespace`` is a root (``smart0dte``) or one data type below it
+        (``smart0dte:market_data``). Keys are read from the namespace indexes
+        with ZSCAN, so clearing is O(namespace) rather than O(keyspace). If the
+        indexes are not known to be complete, or ``full_scan`` is set, the
+        keyspace is walked with an incremental SCAN instead of KEYS. Keys are
+        removed with pipelined UNLINKs in chunks of ``batch_size``, so Redis
+        frees memory in the background.
+        """
         try:
             # Clear L1 cache
-            keys_to_remove = [k for k in self.l1_cache.keys() if k.startswith(f"{namespace}:")]
-            for key in keys_to_remove:
-                self.l1_cache.pop(key, None)
-                self.l1_cache_timestamps.pop(key, None)
+            self.l1_cache.remove_prefix(f"{namespace}:")
             
             # Clear Redis keys
             if self.redis_client:
-                pattern = f"{namespace}:*"
-                keys = await self.redis_client.keys(pattern)
-                if keys:
-                    await self.redis_client.delete(*keys)
+                batch_size = batch_size or cache_optimization.CACHE_CLEAR_BATCH_SIZE
+                progress = {"namespace": namespace, "scanned": 0, "unlinked": 0, "batches": 0}
+                start_time = time.monotonic()
+                
+                index_keys = await self._namespace_indexes(namespace)
+                use_index = not full_scan and await self._index_complete(namespace)
+                
+                chunk = []
+                async for key in self._namespace_keys(namespace, index_keys if use_index else None, batch_size):
+                    chunk.append(key)
+                    if len(chunk) >= batch_size:
+                        await self._unlink_chunk(chunk, progress, progress_callback)
+                        chunk = []
+                
+                if chunk:
+                    await self._unlink_chunk(chunk, progress, progress_callback)
+                
+                # Drop the indexes last so an interrupted clear can resume from them
+                if index_keys:
+                    await self.redis_client.unlink(*index_keys)
+                    await self.redis_client.srem(
+                        f"{namespace.split(':', 1)[0]}:__namespaces__",
+                        *[index_key[:-len(":__index__")] for index_key in index_keys]
+                    )
+                
+                self._publish_invalidation(prefixes=[f"{namespace}:"])
+                
+                logger.info(
+                    f"Cleared namespace {namespace}: {progress['unlinked']} keys in "
+                    f"{progress['batches']} batches via {'index' if use_index else 'SCAN'} "
+                    f"({time.monotonic() - start_time:.2f}s)"
+                )
             
             return True
             
@@ -342,6 +691,59 @@ class LeanCacheManager:
             logger.error(f"Failed to clear namespace {namespace}: {e}")
             return False
     
+    async def _namespace_keys(self, namespace: str, index_keys: Optional[List[str]], batch_size: int):
+        """Keys of a namespace from its indexes, or from SCAN when ``index_keys`` is None."""
+        if index_keys is None:
+            async for key in self.redis_client.scan_iter(match=f"{namespace}:*", count=batch_size):
+                yield key
+            return
+        
+        for index_key in index_keys:
+            async for key, _ in self.redis_client.zscan_iter(index_key, count=batch_size):
+                yield key
+    
+    async def _unlink_chunk(
+        self,
+        chunk: List[bytes],
+        progress: Dict[str, Any],
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> None:
+        """UNLINK one bounded chunk of keys and report progress."""
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.unlink(*chunk)
+        results = await pipe.execute()
+        
+        progress["scanned"] += len(chunk)
+        progress["unlinked"] += results[0] or 0
+        progress["batches"] += 1
+        
+        logger.debug(f"Namespace clear progress: {progress}")
+        if progress_callback:
+            progress_callback(dict(progress))
+    
+    async def prune_namespace_index(self, namespace: str = "smart0dte") -> int:
+        """Remove expired keys from the namespace indexes; returns members removed.
+        
+        Members are scored by expiry, so each index is trimmed with one
+        ZREMRANGEBYSCORE instead of checking keys one by one. Indexes that are
+        not known to be complete are rebuilt with a SCAN first.
+        """
+        if not self.redis_client:
+            return 0
+        
+        if not await self._index_complete(namespace):
+            await self.rebuild_namespace_index(namespace)
+        
+        index_keys = await self._namespace_indexes(namespace)
+        if not index_keys:
+            return 0
+        
+        now = time.time()
+        pipe = self.redis_client.pipeline(transaction=False)
+        for index_key in index_keys:
+            pipe.zremrangebyscore(index_key, "-inf", now)
+        return sum(await pipe.execute())
+    
     async def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics and health metrics."""
         try:
@@ -364,12 +766,21 @@ class LeanCacheManager:
             
             return {
                 "l1_cache_size": len(self.l1_cache),
-                "l1_cache_max_size": self.l1_cache_max_size,
+                "l1_cache_bytes": self.l1_cache.current_bytes,
+                "l1_cache_max_bytes": self.l1_cache.max_bytes,
+                "l1_evictions": self.l1_cache.evictions,
+                "l1_expirations": self.l1_cache.expirations,
                 "hit_rate": round(hit_rate, 4),
                 "stats": self.stats.copy(),
+                "functions": {
+                    name: {**stats, "hit_ratio": round(stats["hits"] / stats["calls"], 4) if stats["calls"] else 0.0}
+                    for name, stats in sorted(self.function_stats.items())
+                },
                 "redis_info": redis_info,
+                "invalidation": self.invalidation_bus.get_stats() if self.invalidation_bus else {},
                 "compression_enabled": self.compression_enabled,
-                "serialization_method": self.serialization_method
+                "serialization_method": self.serialization_method,
+                "codec": self.codec.name
             }
             
         except Exception as e:
@@ -412,15 +823,22 @@ class LeanCacheManager:
                     if hit_rate < cache_optimization.CACHE_HIT_RATE_THRESHOLD:
                         logger.warning(f"Cache hit rate ({hit_rate:.2%}) below threshold ({cache_optimization.CACHE_HIT_RATE_THRESHOLD:.2%})")
                         
-                        # Adjust L1 cache size if hit rate is low
-                        if self.l1_cache_max_size < 200:
-                            self.l1_cache_max_size = min(200, self.l1_cache_max_size + 20)
-                            logger.info(f"Increased L1 cache size to {self.l1_cache_max_size}")
+                        # Grow the L1 byte budget if hit rate is low
+                        max_bytes_limit = cache_optimization.L1_CACHE_MAX_BYTES_LIMIT
+                        if self.l1_cache.max_bytes < max_bytes_limit:
+                            self.l1_cache.resize(min(max_bytes_limit, int(self.l1_cache.max_bytes * 1.25)))
+                            logger.info(f"Increased L1 cache budget to {self.l1_cache.max_bytes} bytes")
                 
                 # Reset stats periodically
                 if total_requests > 10000:
                     self.stats = {key: 0 for key in self.stats.keys()}
                 
+                # Keep the namespace index from accumulating expired keys
+                if cache_optimization.CACHE_NAMESPACE_INDEX_ENABLED:
+                    pruned = await self.prune_namespace_index()
+                    if pruned:
+                        logger.debug(f"Pruned {pruned} expired keys from namespace index")
+                        
             except Exception as e:
                 logger.error(f"Cache monitoring error: {e}")
                 await asyncio.sleep(60)
@@ -445,46 +863,191 @@ class LeanCacheManager:
     
     async def close(self) -> None:
         """Close cache connections."""
+        if self.invalidation_bus:
+            await self.invalidation_bus.stop()
+        
         if self.redis_client:
             await self.redis_client.close()
             logger.info("Cache connections closed")
 
 
-def cache_result(ttl: Optional[int] = None, key_prefix: str = ""):
-    """Decorator for caching function results."""
+_KEY_SCALARS = (str, int, date)
+_MAX_READABLE_KEY_PART = 64
+
+
+def _quantize(values: np.ndarray, digits: int) -> np.ndarray:
+    """Round to ``digits`` significant digits; -0.0 becomes 0.0 so both encode alike."""
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exponent = np.where(values != 0, np.floor(np.log10(np.abs(values))), 0.0)
+        scale = np.power(10.0, digits - 1 - exponent)
+        quantized = np.where(np.isfinite(values), np.round(values * scale) / scale, values)
+    return quantized + 0.0
+
+
+def _encode_key_value(value: Any, digits: int, out: List[bytes]) -> None:
+    """Append a canonical, type-tagged encoding of ``value`` to ``out``."""
+    if value is None:
+        out.append(b"N")
+    elif isinstance(value, (bool, np.bool_)):
+        out.append(b"T" if value else b"F")
+    elif isinstance(value, (int, np.integer)):
+        out.append(b"i%d;" % int(value))
+    elif isinstance(value, (float, np.floating, Decimal)):
+        out.append(b"f" + _quantize(float(value), digits).tobytes())
+    elif isinstance(value, str):
+        encoded = value.encode()
+        out.append(b"s%d:" % len(encoded) + encoded)
+    elif isinstance(value, bytes):
+        out.append(b"b%d:" % len(value) + value)
+    elif isinstance(value, (datetime, date, dt_time)):
+        out.append(b"d" + value.isoformat().encode() + b";")
+    elif isinstance(value, Enum):
+        _encode_key_value(value.value, digits, out)
+    elif isinstance(value, np.ndarray):
+        array = _quantize(value, digits) if value.dtype.kind in "fc" else np.ascontiguousarray(value)
+        out.append(b"a" + array.dtype.str.encode() + repr(array.shape).encode() + array.tobytes())
+    elif isinstance(value, dict):
+        # Items ordered by their encoded key, so insertion order does not matter
+        items = []
+        for k, v in value.items():
+            encoded_key, encoded_value = [], []
+            _encode_key_value(k, digits, encoded_key)
+            _encode_key_value(v, digits, encoded_value)
+            items.append((b"".join(encoded_key), b"".join(encoded_value)))
+        out.append(b"{")
+        for encoded_key, encoded_value in sorted(items):
+            out.extend((encoded_key, encoded_value))
+        out.append(b"}")
+    elif isinstance(value, (list, tuple)):
+        out.append(b"[")
+        for item in value:
+            _encode_key_value(item, digits, out)
+        out.append(b"]")
+    elif isinstance(value, (set, frozenset)):
+        encoded_items = []
+        for item in value:
+            encoded = []
+            _encode_key_value(item, digits, encoded)
+            encoded_items.append(b"".join(encoded))
+        out.append(b"<" + b"".join(sorted(encoded_items)) + b">")
+    elif is_dataclass(value) and not isinstance(value, type):
+        out.append(b"o" + type(value).__qualname__.encode())
+        _encode_key_value(asdict(value), digits, out)
+    elif is_model(value):
+        out.append(b"o" + type(value).__qualname__.encode())
+        _encode_key_value(model_to_dict(value), digits, out)
+    else:
+        out.append(b"r" + type(value).__qualname__.encode() + b":" + repr(value).encode() + b";")
+
+
+def canonical_key_digest(value: Any, digits: Optional[int] = None) -> str:
+    """128-bit hex digest of ``value`` that is stable across processes and runs.
+    
+    Dicts hash the same whatever their insertion order and floats are
+    quantized to ``digits`` significant digits, so values that differ only
+    in the noise share a digest.
+    """
+    out: List[bytes] = []
+    _encode_key_value(value, cache_optimization.CACHE_KEY_FLOAT_DIGITS if digits is None else digits, out)
+    return hashlib.blake2b(b"".join(out), digest_size=16).hexdigest()
+
+
+def _readable_key_part(label: str, value: Any) -> Optional[str]:
+    """Short scalars stay readable in keys (and usable for prefix invalidation)
+    as ``<label>.<type tag>=<value>``, so neither the type (None/"None",
+    1/"1") nor the argument a value was passed as is lost.
+    """
+    if value is None:
+        return f"{label}.N"
+    if isinstance(value, _KEY_SCALARS) and not isinstance(value, bool):
+        if isinstance(value, datetime):
+            tag, text = "t", value.isoformat()
+        elif isinstance(value, date):
+            tag, text = "d", value.isoformat()
+        elif isinstance(value, int):
+            tag, text = "i", str(value)
+        else:
+            tag, text = "s", str(value)
+        if len(text) <= _MAX_READABLE_KEY_PART and ":" not in text:
+            return f"{label}.{tag}={text}"
+    return None
+
+
+def cache_result(
+    ttl: Optional[int] = None,
+    key_prefix: str = "",
+    stale_ttl: Optional[int] = None,
+    key: Optional[Callable[..., Any]] = None,
+    digits: Optional[int] = None
+):
+    """Decorator for caching function results.
+    
+    Concurrent calls that miss on the same key share one execution of the
+    wrapped function. Pass ``stale_ttl`` to serve expired results while a
+    single background refresh runs.
+    
+    Arguments are bound to the signature (defaults applied, ``self``/``cls``
+    left out), so positional and keyword calls share a key. Short scalar
+    arguments stay readable in the key, tagged with their parameter name and
+    type (``market_data:symbol.s=SPY``); everything else is folded into one
+    ``canonical_key_digest`` with floats quantized to ``digits`` significant
+    digits. ``key`` replaces the arguments with what actually determines the
+    result: it is called with the same arguments as the function (including
+    ``self``) and its return value is keyed instead. Hits and misses are
+    counted per function in ``lean_cache_manager.function_stats``.
+    """
     def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            # Generate cache key from function name and arguments
-            key_parts = [key_prefix or func.__name__]
-            
-            # Add args to key
-            for arg in args:
-                if isinstance(arg, (str, int, float)):
-                    key_parts.append(str(arg))
-                else:
-                    key_parts.append(hashlib.md5(str(arg).encode()).hexdigest()[:8])
+        name = key_prefix or func.__qualname__
+        signature = inspect.signature(func)
+        parameters = list(signature.parameters)
+        skip_first = bool(parameters) and parameters[0] in ("self", "cls")
+        
+        def build_key(args: tuple, kwargs: Dict[str, Any]) -> str:
+            if key is not None:
+                values = key(*args, **kwargs)
+                values = list(values) if isinstance(values, (list, tuple)) else [values]
+                parts = [(str(position), value) for position, value in enumerate(values)]
+            else:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                parts = list(bound.arguments.items())[1 if skip_first else 0:]
             
-            # Add kwargs to key
-            for k, v in sorted(kwargs.items()):
-                if isinstance(v, (str, int, float)):
-                    key_parts.append(f"{k}:{v}")
+            key_parts = [name]
+            hashed = []
+            for label, part in parts:
+                readable = _readable_key_part(label, part)
+                if readable is None:
+                    hashed.append((label, part))
                 else:
-                    key_parts.append(f"{k}:{hashlib.md5(str(v).encode()).hexdigest()[:8]}")
+                    key_parts.append(readable)
+            if hashed:
+                key_parts.append(canonical_key_digest(hashed, digits))
+            return ":".join(key_parts)
+        
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_key = build_key(args, kwargs)
             
-            cache_key = ":".join(key_parts)
+            stats = lean_cache_manager.function_stats.get(name)
+            if stats is None:
+                stats = lean_cache_manager.function_stats[name] = {"calls": 0, "hits": 0, "misses": 0}
+            executed = False
             
-            # Try to get from cache
-            cached_result = await lean_cache_manager.get(cache_key)
-            if cached_result is not None:
-                return cached_result
+            def load() -> Awaitable[Any]:
+                nonlocal executed
+                executed = True
+                return func(*args, **kwargs)
             
-            # Execute function and cache result
-            result = await func(*args, **kwargs)
-            await lean_cache_manager.set(cache_key, result, ttl)
+            # Get from cache, executing the function once per key on a miss
+            result = await lean_cache_manager.get_or_set(cache_key, load, ttl=ttl, stale_ttl=stale_ttl)
             
+            # Calls served without running the function (cached or coalesced) count as hits
+            stats["calls"] += 1
+            stats["misses" if executed else "hits"] += 1
             return result
         
+        wrapper.cache_key = build_key
         return wrapper
     return decorator
 
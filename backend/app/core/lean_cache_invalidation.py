@@ -0,0 +1,209 @@
+"""
+Lean Cache Invalidation for Smart-0DTE-System
+Keeps per-worker L1 caches coherent through a Redis pub/sub channel.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from typing import Dict, Any, Iterable, Optional, Set
+
+from app.core.lean_config import cache_optimization
+
+logger = logging.getLogger(__name__)
+
+
+class CacheInvalidationBus:
+    """Broadcast L1 invalidations to every worker sharing a Redis instance.
+    
+    Writes and deletes are collected for a short debounce window and published
+    as a single message, so a burst of ``set_many`` calls costs one PUBLISH.
+    Each worker drops the named keys (or key prefixes) from its own L1 tier.
+    Messages from the publishing worker itself are ignored. If the subscription
+    drops, the whole L1 tier is cleared because invalidations may have been
+    missed.
+    
+    Invalidation lag is measured from publish time to apply time using wall
+    clocks, so it also includes clock skew between hosts.
+    """
+    
+    def __init__(self, redis_client, l1_cache):
+        self.redis_client = redis_client
+        self.l1_cache = l1_cache
+        self.channel = cache_optimization.CACHE_INVALIDATION_CHANNEL
+        self.debounce_seconds = cache_optimization.CACHE_INVALIDATION_DEBOUNCE_MS / 1000
+        self.batch_size = cache_optimization.CACHE_INVALIDATION_BATCH_SIZE
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        
+        self.pubsub = None
+        self.is_running = False
+        self._listener_task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._batch_full = asyncio.Event()
+        self._pending_keys: Set[str] = set()
+        self._pending_prefixes: Set[str] = set()
+        
+        # Invalidation metrics
+        self._lag_samples_ms = deque(maxlen=1024)
+        self.stats = {
+            "published_messages": 0,
+            "published_keys": 0,
+            "publish_errors": 0,
+            "received_messages": 0,
+            "invalidated_keys": 0,
+            "resubscribes": 0
+        }
+    
+    async def start(self) -> None:
+        """Subscribe to the invalidation channel and start the listener."""
+        self.is_running = True
+        await self._subscribe()
+        self._listener_task = asyncio.create_task(self._listen_loop())
+        logger.info(f"Cache invalidation bus started on '{self.channel}' as {self.worker_id}")
+    
+    async def stop(self) -> None:
+        """Flush pending invalidations and stop listening."""
+        self.is_running = False
+        await self.flush()
+        
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+        
+        await self._close_pubsub()
+    
+    def publish(self, keys: Iterable[str] = (), prefixes: Iterable[str] = ()) -> None:
+        """Queue keys or key prefixes for a debounced invalidation broadcast."""
+        if not self.is_running:
+            return
+        
+        self._pending_keys.update(keys)
+        self._pending_prefixes.update(prefixes)
+        
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_after_debounce())
+        
+        if len(self._pending_keys) >= self.batch_size:
+            self._batch_full.set()
+    
+    async def flush(self) -> None:
+        """Publish all pending invalidations as one message."""
+        if not self._pending_keys and not self._pending_prefixes:
+            return
+        
+        keys, self._pending_keys = self._pending_keys, set()
+        prefixes, self._pending_prefixes = self._pending_prefixes, set()
+        
+        message = json.dumps({
+            "origin": self.worker_id,
+            "published_at": time.time(),
+            "keys": list(keys),
+            "prefixes": list(prefixes)
+        })
+        
+        try:
+            await self.redis_client.publish(self.channel, message)
+            self.stats["published_messages"] += 1
+            self.stats["published_keys"] += len(keys)
+        except Exception as e:
+            self.stats["publish_errors"] += 1
+            logger.error(f"Failed to publish cache invalidation: {e}")
+    
+    async def _flush_after_debounce(self) -> None:
+        """Wait for the debounce window (or a full batch), then flush."""
+        try:
+            await asyncio.wait_for(self._batch_full.wait(), timeout=self.debounce_seconds)
+        except asyncio.TimeoutError:
+            pass
+        
+        self._batch_full.clear()
+        await self.flush()
+    
+    async def _subscribe(self) -> None:
+        # Release the previous subscription's connection before opening a new one
+        await self._close_pubsub()
+        self.pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.subscribe(self.channel)
+    
+    async def _close_pubsub(self) -> None:
+        """Unsubscribe and return the subscription's connection to the pool."""
+        pubsub, self.pubsub = self.pubsub, None
+        if pubsub is None:
+            return
+        
+        try:
+            await pubsub.unsubscribe(self.channel)
+        except Exception as e:
+            # Expected when the connection already dropped; closing still releases it
+            logger.debug(f"Error unsubscribing from cache invalidations: {e}")
+        try:
+            await pubsub.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing invalidation subscription: {e}")
+    
+    async def _listen_loop(self) -> None:
+        """Apply invalidations published by other workers."""
+        while self.is_running:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message and message.get("type") == "message":
+                    self._apply(message["data"])
+                    
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error, clearing L1: {e}")
+                # Invalidations may have been missed while disconnected
+                self.l1_cache.clear()
+                await asyncio.sleep(1)
+                
+                try:
+                    await self._subscribe()
+                    self.stats["resubscribes"] += 1
+                except Exception as resubscribe_error:
+                    logger.error(f"Failed to resubscribe to cache invalidations: {resubscribe_error}")
+                    await asyncio.sleep(5)
+    
+    def _apply(self, raw_message: Any) -> None:
+        """Drop the keys named in an invalidation message from L1."""
+        payload = json.loads(raw_message)
+        if payload.get("origin") == self.worker_id:
+            return
+        
+        invalidated = 0
+        for key in payload.get("keys", ()):
+            if self.l1_cache.pop(key):
+                invalidated += 1
+        for prefix in payload.get("prefixes", ()):
+            invalidated += self.l1_cache.remove_prefix(prefix)
+        
+        self.stats["received_messages"] += 1
+        self.stats["invalidated_keys"] += invalidated
+        self._lag_samples_ms.append((time.time() - payload.get("published_at", time.time())) * 1000)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Invalidation counters and lag percentiles over recent messages."""
+        lags = sorted(self._lag_samples_ms)
+        lag_stats = {}
+        if lags:
+            lag_stats = {
+                "lag_ms_avg": round(sum(lags) / len(lags), 3),
+                "lag_ms_p50": round(lags[len(lags) // 2], 3),
+                "lag_ms_p99": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))], 3),
+                "lag_ms_max": round(lags[-1], 3)
+            }
+        
+        return {
+            "worker_id": self.worker_id,
+            "channel": self.channel,
+            "pending_keys": len(self._pending_keys),
+            **self.stats,
+            **lag_stats
+        }
@@ -0,0 +1,496 @@
+"""
+Lean Codecs for Smart-0DTE-System
+Pluggable serialization and compression for cache and database payloads.
+
+Every encoded payload starts with a two byte header: a marker byte (0xC1, which
+is never emitted by msgpack, JSON, UTF-8 text or pickle) followed by a format
+byte whose high nibble identifies the serializer and whose low nibble identifies
+the compressor. The codec used for writing can therefore change without
+flushing Redis or rewriting stored rows; readers dispatch on the header.
+"""
+
+import gzip
+import json
+import logging
+import pickle
+import time
+from datetime import datetime, date
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import msgpack
+
+from app.core.lean_config import lean_config, data_optimization
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy ships with the backend image
+    np = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+HEADER_MARKER = 0xC1
+HEADER_SIZE = 2
+
+# Legacy payloads written before the codec header existed
+LEGACY_GZIP_PREFIX = b"GZIP:"
+GZIP_MAGIC = b"\x1f\x8b"
+
+# msgpack extension type codes
+EXT_DATETIME = 1
+EXT_DATE = 2
+EXT_DECIMAL = 3
+EXT_NDARRAY = 4
+
+
+# Legacy JSON payloads (dicts, lists, and the strings of the write fallbacks)
+# start with one of these; msgpack maps, arrays and strings never do
+LEGACY_JSON_PREFIXES = (b"{", b"[", b'"')
+
+
+def is_model(obj: Any) -> bool:
+    """Whether ``obj`` is a pydantic model instance (v2, or v1 with ``dict``)."""
+    if isinstance(obj, type):
+        return False
+    return hasattr(obj, "model_dump") or (hasattr(obj, "__fields__") and callable(getattr(obj, "dict", None)))
+
+
+def model_to_dict(obj: Any) -> Dict[str, Any]:
+    """Field values of a pydantic model; the one dump used by codecs and cache keys."""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    return obj.dict()
+
+
+# ---------------------------------------------------------------------------
+# msgpack extension hooks
+# ---------------------------------------------------------------------------
+
+def _msgpack_default(obj: Any) -> Any:
+    """Encode types msgpack cannot represent natively."""
+    if isinstance(obj, datetime):
+        return msgpack.ExtType(EXT_DATETIME, obj.isoformat().encode("ascii"))
+    if isinstance(obj, date):
+        return msgpack.ExtType(EXT_DATE, obj.isoformat().encode("ascii"))
+    if isinstance(obj, Decimal):
+        return msgpack.ExtType(EXT_DECIMAL, str(obj).encode("ascii"))
+    
+    if np is not None:
+        if isinstance(obj, np.ndarray):
+            array = np.ascontiguousarray(obj)
+            return msgpack.ExtType(
+                EXT_NDARRAY,
+                msgpack.packb([array.dtype.str, list(array.shape), array.tobytes()], use_bin_type=True)
+            )
+        if isinstance(obj, np.generic):
+            return obj.item()
+    
+    if is_model(obj):
+        return model_to_dict(obj)
+    
+    raise TypeError(f"Cannot serialize object of type {type(obj).__name__}")
+
+
+def _msgpack_ext_hook(code: int, data: bytes) -> Any:
+    """Decode extension types written by ``_msgpack_default``."""
+    if code == EXT_DATETIME:
+        return datetime.fromisoformat(data.decode("ascii"))
+    if code == EXT_DATE:
+        return date.fromisoformat(data.decode("ascii"))
+    if code == EXT_DECIMAL:
+        return Decimal(data.decode("ascii"))
+    if code == EXT_NDARRAY and np is not None:
+        dtype, shape, buffer = msgpack.unpackb(data, raw=False)
+        return np.frombuffer(buffer, dtype=np.dtype(dtype)).reshape(shape)
+    
+    return msgpack.ExtType(code, data)
+
+
+def _json_default(obj: Any) -> Any:
+    """Fallback JSON encoder for the stdlib ``json`` serializer."""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if np is not None and isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    if is_model(obj):
+        return model_to_dict(obj)
+    
+    raise TypeError(f"Cannot serialize object of type {type(obj).__name__}")
+
+
+# ---------------------------------------------------------------------------
+# Serializers and compressors
+# ---------------------------------------------------------------------------
+
+class Serializer:
+    """Named object <-> bytes serializer with a stable header id."""
+    
+    def __init__(self, name: str, codec_id: int, dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any]):
+        self.name = name
+        self.codec_id = codec_id
+        self.dumps = dumps
+        self.loads = loads
+
+
+class Compressor:
+    """Named bytes <-> bytes compressor with a stable header id."""
+    
+    def __init__(
+        self,
+        name: str,
+        codec_id: int,
+        compress: Callable[[bytes], bytes],
+        decompress: Callable[[bytes], bytes],
+        min_size: int = 0
+    ):
+        self.name = name
+        self.codec_id = codec_id
+        self.compress = compress
+        self.decompress = decompress
+        self.min_size = min_size  # Payloads smaller than this are stored raw
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _build_serializers() -> Dict[str, Serializer]:
+    serializers = {
+        "msgpack": Serializer(
+            "msgpack", 1,
+            lambda obj: msgpack.packb(obj, default=_msgpack_default, use_bin_type=True),
+            lambda data: msgpack.unpackb(data, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False)
+        ),
+        "json": Serializer(
+            "json", 2,
+            _orjson_dumps if orjson is not None else
+            (lambda obj: json.dumps(obj, default=_json_default).encode("utf-8")),
+            orjson.loads if orjson is not None else (lambda data: json.loads(bytes(data)))
+        ),
+        "pickle": Serializer(
+            "pickle", 3,
+            lambda obj: pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL),
+            pickle.loads
+        ),
+    }
+    return serializers
+
+
+class _ZstdCodec:
+    """zstd compressor with an optional trained dictionary for small payloads.
+    
+    Frames record the id of the dictionary they were written with, so every
+    dictionary kept next to the current one (``<path>.<dict_id>``, written by
+    ``train_zstd_dictionary``) is loaded for decoding; retraining does not
+    break frames written with an older dictionary.
+    """
+    
+    def __init__(self, level: int, dictionary_path: Optional[str]):
+        self.level = level
+        self.dictionary = None
+        # dict_id -> decompressor; 0 is a frame written without a dictionary
+        self._decompressors = {0: zstandard.ZstdDecompressor()}
+        
+        if dictionary_path:
+            path = Path(dictionary_path)
+            for previous_path in _archived_dictionaries(path):
+                self._add_decompressor(zstandard.ZstdCompressionDict(previous_path.read_bytes()))
+            if path.exists():
+                self.dictionary = zstandard.ZstdCompressionDict(path.read_bytes())
+                self._add_decompressor(self.dictionary)
+                logger.info(f"Loaded zstd dictionary {self.dictionary.dict_id()} from {dictionary_path}")
+        
+        self._compressor = zstandard.ZstdCompressor(level=level, dict_data=self.dictionary)
+    
+    def _add_decompressor(self, dictionary: Any) -> None:
+        self._decompressors[dictionary.dict_id()] = zstandard.ZstdDecompressor(dict_data=dictionary)
+    
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+    
+    def decompress(self, data: bytes) -> bytes:
+        dict_id = zstandard.get_frame_parameters(data).dict_id
+        decompressor = self._decompressors.get(dict_id)
+        if decompressor is None:
+            raise ValueError(f"zstd frame needs dictionary {dict_id}, which is not loaded")
+        return decompressor.decompress(data)
+
+
+def _archived_dictionaries(path: Path) -> List[Path]:
+    """Earlier dictionaries kept as ``<path>.<dict_id>``."""
+    if not path.parent.exists():
+        return []
+    return [
+        candidate for candidate in path.parent.glob(f"{path.name}.*")
+        if candidate.suffix[1:].isdigit()
+    ]
+
+
+def _build_compressors() -> Dict[str, Compressor]:
+    level = data_optimization.COMPRESSION_LEVEL
+    min_size = data_optimization.COMPRESSION_MIN_BYTES
+    
+    compressors = {
+        "none": Compressor("none", 0, bytes, bytes),
+        "gzip": Compressor(
+            "gzip", 1,
+            lambda data: gzip.compress(data, compresslevel=max(1, level)),
+            gzip.decompress,
+            min_size
+        ),
+    }
+    
+    if lz4_frame is not None:
+        compressors["lz4"] = Compressor(
+            "lz4", 2,
+            lambda data: lz4_frame.compress(data, compression_level=level),
+            lz4_frame.decompress,
+            min_size
+        )
+    
+    if zstandard is not None:
+        zstd = _ZstdCodec(level, data_optimization.ZSTD_DICTIONARY_PATH)
+        # A trained dictionary makes even small market-data dicts worth compressing
+        zstd_min_size = data_optimization.ZSTD_DICTIONARY_MIN_BYTES if zstd.dictionary else min_size
+        compressors["zstd"] = Compressor("zstd", 3, zstd.compress, zstd.decompress, zstd_min_size)
+    
+    return compressors
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+class CodecRegistry:
+    """Registry of serializers and compressors addressable by name or header id."""
+    
+    def __init__(self):
+        self.serializers: Dict[str, Serializer] = {}
+        self.compressors: Dict[str, Compressor] = {}
+        self._serializers_by_id: Dict[int, Serializer] = {}
+        self._compressors_by_id: Dict[int, Compressor] = {}
+        self.reload()
+    
+    def reload(self) -> None:
+        """(Re)build the built-in codecs, e.g. after training a zstd dictionary."""
+        self.serializers.clear()
+        self.compressors.clear()
+        self._serializers_by_id.clear()
+        self._compressors_by_id.clear()
+        
+        for serializer in _build_serializers().values():
+            self.register_serializer(serializer)
+        for compressor in _build_compressors().values():
+            self.register_compressor(compressor)
+    
+    def register_serializer(self, serializer: Serializer) -> None:
+        if not 0 < serializer.codec_id < 16:
+            raise ValueError("Serializer ids must fit in 4 bits and be non-zero")
+        self.serializers[serializer.name] = serializer
+        self._serializers_by_id[serializer.codec_id] = serializer
+    
+    def register_compressor(self, compressor: Compressor) -> None:
+        if not 0 <= compressor.codec_id < 16:
+            raise ValueError("Compressor ids must fit in 4 bits")
+        self.compressors[compressor.name] = compressor
+        self._compressors_by_id[compressor.codec_id] = compressor
+    
+    def get_codec(
+        self,
+        serialization: str = "msgpack",
+        compression: str = "lz4",
+        on_encode: Optional[Callable[[int, int], None]] = None
+    ) -> "PayloadCodec":
+        """Return a codec, falling back to gzip if the compressor is not installed.
+        
+        ``on_encode(raw_bytes, encoded_bytes)`` is called after every encode,
+        e.g. to meter the compression ratio of a write path.
+        """
+        serializer = self.serializers.get(serialization, self.serializers["msgpack"])
+        
+        compressor = self.compressors.get(compression)
+        if compressor is None:
+            logger.warning(f"Compression '{compression}' unavailable, falling back to gzip")
+            compressor = self.compressors["gzip"]
+        
+        return PayloadCodec(self, serializer, compressor, on_encode)
+    
+    def serializer_for(self, codec_id: int) -> Serializer:
+        return self._serializers_by_id[codec_id]
+    
+    def compressor_for(self, codec_id: int) -> Compressor:
+        try:
+            return self._compressors_by_id[codec_id]
+        except KeyError:
+            raise ValueError(f"Payload requires compressor id {codec_id}, which is not installed")
+
+
+class PayloadCodec:
+    """Encode/decode payloads with a self-describing header."""
+    
+    def __init__(
+        self,
+        registry: CodecRegistry,
+        serializer: Serializer,
+        compressor: Compressor,
+        on_encode: Optional[Callable[[int, int], None]] = None
+    ):
+        self.registry = registry
+        self.serializer = serializer
+        self.compressor = compressor
+        self.on_encode = on_encode
+    
+    @property
+    def name(self) -> str:
+        return f"{self.serializer.name}+{self.compressor.name}"
+    
+    def encode(self, data: Any, compress: bool = True) -> bytes:
+        """Serialize ``data`` and compress it when it is large enough."""
+        serialized = self.serializer.dumps(data)
+        raw_size = len(serialized)
+        
+        compressor = self.compressor
+        if not compress or compressor.codec_id == 0 or raw_size < compressor.min_size:
+            compressor = self.registry.compressors["none"]
+        else:
+            serialized = compressor.compress(serialized)
+        
+        header = bytes((HEADER_MARKER, (self.serializer.codec_id << 4) | compressor.codec_id))
+        payload = header + serialized
+        if self.on_encode is not None:
+            self.on_encode(raw_size, len(payload))
+        return payload
+    
+    def decode(self, payload: bytes) -> Any:
+        """Decode a payload written by any registered codec or the legacy formats."""
+        if len(payload) >= HEADER_SIZE and payload[0] == HEADER_MARKER:
+            format_byte = payload[1]
+            serializer = self.registry.serializer_for(format_byte >> 4)
+            compressor = self.registry.compressor_for(format_byte & 0x0F)
+            
+            body = memoryview(payload)[HEADER_SIZE:]
+            if compressor.codec_id != 0:
+                body = compressor.decompress(body)
+            return serializer.loads(body)
+        
+        # Legacy payloads: optional gzip, then JSON or the configured serializer
+        if payload.startswith(LEGACY_GZIP_PREFIX):
+            payload = gzip.decompress(payload[len(LEGACY_GZIP_PREFIX):])
+        elif payload.startswith(GZIP_MAGIC):
+            payload = gzip.decompress(payload)
+        if payload.startswith(LEGACY_JSON_PREFIXES):
+            return json.loads(payload)
+        return self.serializer.loads(payload)
+    
+    def decode_many(self, payloads: Sequence[Optional[bytes]], default: Any = None) -> List[Any]:
+        """Decode a column of payloads, e.g. one blob per database row.
+        
+        Uncompressed msgpack payloads (small rows are stored raw) are joined
+        behind a single array32 header and unpacked by one ``unpackb`` call,
+        skipping the per-payload header dispatch. Everything else, and a run
+        that fails to unpack, is decoded one payload at a time. Empty or
+        undecodable payloads yield ``default``.
+        """
+        results = [default] * len(payloads)
+        raw_msgpack_format = self.registry.serializers["msgpack"].codec_id << 4
+        bodies = []
+        body_positions = []
+        
+        for position, payload in enumerate(payloads):
+            if not payload:
+                continue
+            if len(payload) > HEADER_SIZE and payload[0] == HEADER_MARKER and payload[1] == raw_msgpack_format:
+                bodies.append(payload[HEADER_SIZE:])
+                body_positions.append(position)
+            else:
+                results[position] = self._decode_or_default(payload, default)
+        
+        if body_positions:
+            try:
+                packed = b"\xdd" + len(bodies).to_bytes(4, "big") + b"".join(bodies)
+                decoded = msgpack.unpackb(packed, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False)
+                for position, value in zip(body_positions, decoded):
+                    results[position] = value
+            except Exception as e:
+                logger.warning(f"Bulk msgpack decode failed, decoding payloads individually: {e}")
+                for position in body_positions:
+                    results[position] = self._decode_or_default(payloads[position], default)
+        
+        return results
+    
+    def _decode_or_default(self, payload: bytes, default: Any) -> Any:
+        try:
+            return self.decode(bytes(payload))
+        except Exception as e:
+            logger.error(f"Failed to decode payload: {e}")
+            return default
+
+
+def is_compressed(payload: bytes) -> bool:
+    """Check whether an encoded payload's body is compressed."""
+    if len(payload) >= HEADER_SIZE and payload[0] == HEADER_MARKER:
+        return (payload[1] & 0x0F) != 0
+    return payload.startswith(LEGACY_GZIP_PREFIX) or payload.startswith(GZIP_MAGIC)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(f"{path.name}.{int(time.time())}.tmp")
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
+
+
+def train_zstd_dictionary(
+    samples: List[Any],
+    dictionary_path: Optional[str] = None,
+    dict_size: int = 16 * 1024
+) -> bytes:
+    """Train a zstd dictionary on sample payloads and persist it.
+    
+    Samples are serialized with msgpack exactly as the cache would write them.
+    Reload the registry afterwards so new writes use the dictionary. Each
+    dictionary is also kept as ``<path>.<dict_id>``, so frames written with an
+    earlier one still decode after the reload.
+    """
+    if zstandard is None:
+        raise RuntimeError("zstandard is not installed")
+    
+    serializer = codec_registry.serializers["msgpack"]
+    encoded_samples = [serializer.dumps(sample) for sample in samples]
+    dictionary = zstandard.train_dictionary(dict_size, encoded_samples)
+    dictionary_bytes = dictionary.as_bytes()
+    
+    dictionary_path = dictionary_path or data_optimization.ZSTD_DICTIONARY_PATH
+    path = Path(dictionary_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        # Dictionaries trained before archiving existed only under the current name
+        previous_bytes = path.read_bytes()
+        previous_id = zstandard.ZstdCompressionDict(previous_bytes).dict_id()
+        _write_atomic(path.with_name(f"{path.name}.{previous_id}"), previous_bytes)
+    _write_atomic(path.with_name(f"{path.name}.{dictionary.dict_id()}"), dictionary_bytes)
+    _write_atomic(path, dictionary_bytes)
+    
+    logger.info(f"Trained zstd dictionary {dictionary.dict_id()} on {len(samples)} samples")
+    return dictionary_bytes
+
+
+# Global codec registry instance
+codec_registry = CodecRegistry()
@@ -8,6 +8,9 @@ from typing import Dict, Any, List
 from pydantic import BaseSettings, validator
 from datetime import timedelta
 
+# backend/, so default artifact paths do not depend on the working directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 
 class LeanConfig(BaseSettings):
     """Optimized configuration for lean deployment with 89-90% cost reduction."""
@@ -25,6 +28,11 @@ class LeanConfig(BaseSettings):
     DATABASE_POOL_TIMEOUT: int = 30
     DATABASE_POOL_RECYCLE: int = 3600  # 1 hour
     DATABASE_ECHO: bool = False
+    DATABASE_BULK_COPY_ENABLED: bool = True  # Binary COPY for batch inserts (asyncpg only)
+    DATABASE_PARTITIONING_ENABLED: bool = True  # Daily range partitions for time-series tables
+    DATABASE_PARTITION_PREMAKE_DAYS: int = 3  # Partitions created ahead of today
+    DATABASE_PARTITION_RETENTION_ACTION: str = "drop"  # "drop", or "detach" to keep expired partitions
+    DATABASE_BLOB_MIGRATION_BATCH_SIZE: int = 5000  # Rows per batch when converting hex blobs to bytea
     
     # Redis Settings - Optimized for cache.t3.micro
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -66,9 +74,34 @@ class LeanConfig(BaseSettings):
     # Databento Settings - Optimized for cost
     DATABENTO_API_KEY: str = os.getenv("DATABENTO_API_KEY", "")
     DATABENTO_DATASET: str = "OPRA.PILLAR"
-    DATABENTO_RATE_LIMIT: int = 100  # Requests per minute
+    DATABENTO_RATE_LIMIT: int = 100  # Request weight per minute, shared by all workers
+    DATABENTO_DAILY_BUDGET: int = 20000  # Request weight per UTC day, shared by all workers
+    DATABENTO_REQUEST_WEIGHTS: Dict[str, int] = {
+        "quote": 1,
+        "options_chain": 10,
+        "historical": 5
+    }
+    # Share of the minute and daily budgets each priority lane may not touch,
+    # and how long it will wait for tokens before giving up
+    DATABENTO_LANE_RESERVE: Dict[str, float] = {"critical": 0.0, "normal": 0.2, "background": 0.5}
+    DATABENTO_LANE_MAX_WAIT: Dict[str, float] = {"critical": 2.0, "normal": 0.0, "background": 0.0}
     DATABENTO_TIMEOUT: int = 30
     DATABENTO_RETRY_ATTEMPTS: int = 3
+    DATABENTO_EQUITY_DATASET: str = "XNAS.ITCH"  # Underlying trades/quotes for the live feed
+    DATABENTO_LIVE_SCHEMAS: List[str] = ["tbbo", "ohlcv-1m"]
+    DATABENTO_HEARTBEAT_INTERVAL: int = 10  # Gateway heartbeat (seconds)
+    DATABENTO_STALL_TIMEOUT: int = 30  # Reconnect when the stream is silent this long
+    DATABENTO_REPLAY_FILE: str = os.getenv("DATABENTO_REPLAY_FILE", "")  # Local DBN stand-in feed
+    DATABENTO_REPLAY_SPEED: float = 1.0  # Multiple of real time, 0 = as fast as possible
+    DATABENTO_BACKFILL_CACHE_DIR: str = os.getenv("DATABENTO_BACKFILL_CACHE_DIR", "data/dbn_cache")
+    DATABENTO_BACKFILL_FIXTURE_DIR: str = os.getenv("DATABENTO_BACKFILL_FIXTURE_DIR", "")  # Local DBN stand-in for the API
+    DATABENTO_BACKFILL_SCHEMA: str = "ohlcv-1m"
+    DATABENTO_BACKFILL_CHUNK_DAYS: int = 1  # Range of one get_range request; interrupted chunks restart from scratch
+    DATABENTO_BACKFILL_CONCURRENCY: int = 4  # Chunks downloaded in parallel
+    DATABENTO_BACKFILL_MAX_WAIT: float = 60.0  # Seconds a chunk waits for rate limit tokens
+    DATABENTO_METERING_FILE: str = os.getenv("DATABENTO_METERING_FILE", "data/metering/usage.json")  # Daily usage totals
+    DATABENTO_METERING_RETENTION_DAYS: int = 90
+    DATABENTO_PRICING_FILE: str = os.getenv("DATABENTO_PRICING_FILE", "")  # USD/GB by feed and schema, over the defaults
     
     # AI Settings - Optimized for efficiency
     AI_MODEL_CACHE_SIZE: int = 100  # Reduced from 1000
@@ -164,6 +197,9 @@ class DataOptimizationConfig:
     # Compression settings
     COMPRESSION_ALGORITHM: str = "lz4"  # Fast compression
     COMPRESSION_LEVEL: int = 1  # Low compression for speed
+    COMPRESSION_MIN_BYTES: int = 1024  # Store smaller payloads uncompressed
+    ZSTD_DICTIONARY_PATH: str = os.getenv("ZSTD_DICTIONARY_PATH", "data/codecs/market_data.zstd-dict")
+    ZSTD_DICTIONARY_MIN_BYTES: int = 64  # Compress small payloads when a dictionary is loaded
     
     # Data aggregation settings
     PRICE_PRECISION: int = 4  # 4 decimal places
@@ -177,18 +213,48 @@ class DataOptimizationConfig:
     # Batch processing settings
     BATCH_PROCESSING_SIZE: int = 100
     BATCH_PROCESSING_INTERVAL: int = 60  # 1 minute
+    WRITE_BEHIND_MAX_PENDING: int = 10000  # Buffered records per table before backpressure
+    WRITE_BEHIND_JOURNAL_DIR: str = os.getenv("WRITE_BEHIND_JOURNAL_DIR", "data/write_behind")
+    WRITE_BEHIND_MAX_RETRIES: int = 5  # Consecutive failures before a chunk is dead-lettered
+    DATA_COLLECTION_DEADLINE_FRACTION: float = 0.8  # Share of the sampling interval a polling cycle may use
+    LIVE_RING_BUFFER_SIZE: int = 65536  # Ticks kept in memory per instrument
+    ORDER_BOOK_MAX_INSTRUMENTS: int = 4096  # Rows in the shared top-of-book array
+    ORDER_BOOK_INITIAL_LEVELS: int = 64  # Price levels preallocated per book side, doubled when full
+    
+    # Adaptive sampling (per-symbol intervals scaled from the session rate)
+    SAMPLING_DAILY_BUDGET: int = 100000  # Polled data points per day across all symbols
+    SAMPLING_ACTIVITY_WINDOW: int = 20  # Observations in the short-horizon volatility reading
+    SAMPLING_BASELINE_HALFLIFE: float = 1800.0  # Seconds; how slowly the activity baselines follow the tape
+    SAMPLING_FAST_THRESHOLD: float = 2.0  # Activity / baseline ratio that speeds sampling up
+    SAMPLING_QUIET_THRESHOLD: float = 0.5  # Volatility and volume ratios below this slow sampling down
+    SAMPLING_FAST_FACTOR: float = 0.25
+    SAMPLING_QUIET_FACTOR: float = 4.0
+    SAMPLING_MIN_INTERVAL: float = 0.25  # Seconds
+    
+    # Columnar tick store
+    TICK_STORE_ENABLED: bool = True
+    TICK_STORE_DIR: str = os.getenv("TICK_STORE_DIR", "data/ticks")
+    TICK_STORE_RETENTION_DAYS: int = 365  # Local history kept for backtests and training
     
     # Data quality settings
     MAX_DATA_AGE_SECONDS: int = 300  # 5 minutes
     DATA_VALIDATION_ENABLED: bool = True
     OUTLIER_DETECTION_ENABLED: bool = True
+    QUALITY_WINDOW: int = 64  # Previous prices in the rolling median/MAD
+    QUALITY_MIN_HISTORY: int = 16  # Prices needed before outliers are rejected
+    QUALITY_OUTLIER_Z: float = 8.0  # Robust z-score (MAD-scaled) above which a price is rejected
+    QUALITY_MIN_SCALE_BPS: float = 1.0  # Floor on the MAD scale, so flat prices do not flag every tick
+    QUALITY_STALE_QUOTE_SECONDS: int = 30  # Unchanged quote with trades outside it is dropped
+    QUALITY_MAX_CLOCK_SKEW_SECONDS: int = 5  # Future timestamps tolerated
+    QUALITY_HISTORY_RESET_SECONDS: int = 3600  # Gap (overnight, halt) after which the price window restarts
 
 
 class CacheOptimizationConfig:
     """Configuration for cache optimization strategies."""
     
     # Cache hierarchy
-    L1_CACHE_SIZE: int = 100  # In-memory cache
+    L1_CACHE_MAX_BYTES: int = 16 * 1024 * 1024  # In-memory cache budget (16MB)
+    L1_CACHE_MAX_BYTES_LIMIT: int = 64 * 1024 * 1024  # Ceiling for adaptive growth
     L2_CACHE_SIZE: int = 1000  # Redis cache
     
     # Cache warming settings
@@ -198,6 +264,17 @@ class CacheOptimizationConfig:
     # Cache eviction settings
     CACHE_EVICTION_POLICY: str = "lru"  # Least Recently Used
     CACHE_MAX_MEMORY_POLICY: str = "allkeys-lru"
+    CACHE_KEY_FLOAT_DIGITS: int = 6  # Significant digits kept when hashing float arguments
+    
+    # Namespace clearing
+    CACHE_NAMESPACE_INDEX_ENABLED: bool = True  # Track keys per namespace in a Redis sorted set scored by expiry
+    CACHE_CLEAR_BATCH_SIZE: int = 500  # Keys per SCAN page and UNLINK
+    
+    # Cross-worker L1 invalidation
+    CACHE_INVALIDATION_ENABLED: bool = True
+    CACHE_INVALIDATION_CHANNEL: str = "smart0dte:cache-invalidations"
+    CACHE_INVALIDATION_DEBOUNCE_MS: int = 5  # Batch invalidations published within 5ms
+    CACHE_INVALIDATION_BATCH_SIZE: int = 256  # Publish early once this many keys are pending
     
     # Cache monitoring
     CACHE_HIT_RATE_THRESHOLD: float = 0.8  # 80% hit rate target
@@ -218,14 +295,26 @@ class AIOptimizationConfig:
     EARLY_STOPPING_PATIENCE: int = 3
     
     # Inference settings
-    INFERENCE_BATCH_SIZE: int = 10
+    INFERENCE_BATCH_SIZE: int = 256  # Rows per model pass; covers all underlyings and candidate strikes
     INFERENCE_TIMEOUT: int = 5  # 5 seconds
     MODEL_WARM_UP_ENABLED: bool = True
+    COMPILED_TREE_INFERENCE: bool = True  # Serve tree ensembles from flattened node arrays
+    COMPILED_TREE_TOLERANCE: float = 1e-9  # Largest allowed difference from sklearn on the probe batch
+    COMPILED_TREE_PROBE_ROWS: int = 256
+    
+    # Streaming feature store (minutes of one-minute returns)
+    FEATURE_VOLATILITY_WINDOW: int = 60
+    FEATURE_CORRELATION_WINDOW: int = 30
+    FEATURE_VIX_DELTA_MINUTES: int = 5
+    FEATURE_EWMA_LAMBDA: float = 0.94  # Decay of the EWMA volatility per minute
+    FEATURE_VOLUME_EWMA_ALPHA: float = 0.1  # Weight of the newest minute in the volume baseline
     
     # Model lifecycle
     MODEL_RETRAIN_INTERVAL: int = 86400  # Daily
     MODEL_VALIDATION_INTERVAL: int = 3600  # Hourly
     MODEL_BACKUP_ENABLED: bool = True
+    MODEL_REGISTRY_DIR: str = os.getenv("MODEL_REGISTRY_DIR", os.path.join(BACKEND_DIR, "data", "models"))  # Versioned model artifacts
+    MODEL_REGISTRY_KEEP_VERSIONS: int = 10  # Unpromoted versions kept besides the promoted ones
 
 
 # Global lean configuration instance
@@ -238,8 +327,14 @@ ai_optimization = AIOptimizationConfig()
 def get_sampling_rate() -> int:
     """Get appropriate sampling rate based on current market conditions."""
     from datetime import datetime, time
+    import pytz
+    
+    # Sessions are defined in exchange time, not server time
+    now = datetime.now(pytz.timezone("America/New_York"))
+    current_time = now.time()
     
-    current_time = datetime.now().time()
+    if now.weekday() >= 5:
+        return lean_config.SAMPLING_RATES["weekends"]
     
     # Market hours: 9:30 AM - 4:00 PM ET
     market_open = time(9, 30)
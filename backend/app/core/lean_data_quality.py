@@ -0,0 +1,299 @@
+"""
+Lean Data Quality for Smart-0DTE-System
+Vectorized validation of market data batches before they reach the cache or storage.
+
+Rules are applied per instrument to arrays of timestamps, prices and quotes:
+
+- invalid: non-positive prices, negative volume, or neither a price nor a quote
+- crossed: bid above ask (rejected); locked: bid equal to ask (counted only)
+- stale: older than ``MAX_DATA_AGE_SECONDS`` or too far in the future; only
+  checked when a reference time is given, i.e. not for history
+- stale_quote: bid/ask unchanged for ``QUALITY_STALE_QUOTE_SECONDS`` while the
+  trade price is outside it; the record is kept without its quote
+- out_of_order: timestamp behind the latest accepted one for the instrument
+- outlier: robust z-score against the median and MAD of the previous
+  ``QUALITY_WINDOW`` prices above ``QUALITY_OUTLIER_Z``; the window restarts
+  after a gap of ``QUALITY_HISTORY_RESET_SECONDS``
+
+``DATA_VALIDATION_ENABLED`` switches all rules and ``OUTLIER_DETECTION_ENABLED``
+the last one. State (last timestamp, last quote, recent prices) carries over
+between batches, so a stream can be checked in batches of any size.
+"""
+
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.core.lean_config import data_optimization
+
+logger = logging.getLogger(__name__)
+
+RULES = ("invalid", "crossed", "locked", "stale", "stale_quote", "out_of_order", "outlier")
+
+_MAD_TO_SIGMA = 1.4826  # MAD of a normal distribution times this is its standard deviation
+_NO_TIMESTAMP = np.iinfo(np.int64).min
+
+
+class _InstrumentState:
+    """What the rules remember about one instrument between batches."""
+    
+    __slots__ = ("prices", "price_ts", "last_ts", "bid", "ask", "quote_since")
+    
+    def __init__(self):
+        self.prices = np.empty(0)
+        self.price_ts = _NO_TIMESTAMP
+        self.last_ts = _NO_TIMESTAMP
+        self.bid = np.nan
+        self.ask = np.nan
+        self.quote_since = _NO_TIMESTAMP
+
+
+def _sorted_median(rows: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Median of the first ``counts[i]`` values of each sorted row."""
+    row_index = np.arange(len(rows))
+    return (rows[row_index, (counts - 1) // 2] + rows[row_index, counts // 2]) / 2
+
+
+def _as_ns(values: Any) -> np.ndarray:
+    return np.asarray(values).astype("datetime64[ns]").astype(np.int64)
+
+
+def _as_float(values: Any, count: int) -> np.ndarray:
+    if values is None:
+        return np.full(count, np.nan)
+    return np.asarray(values, dtype=np.float64)
+
+
+class DataQualityFilter:
+    """Per-instrument data quality rules with counters per rule."""
+    
+    def __init__(self, window: Optional[int] = None, outlier_z: Optional[float] = None):
+        self.validation_enabled = data_optimization.DATA_VALIDATION_ENABLED
+        self.outlier_enabled = data_optimization.OUTLIER_DETECTION_ENABLED
+        self.window = window or data_optimization.QUALITY_WINDOW
+        self.min_history = min(self.window, data_optimization.QUALITY_MIN_HISTORY)
+        self.outlier_z = outlier_z or data_optimization.QUALITY_OUTLIER_Z
+        self.min_scale = data_optimization.QUALITY_MIN_SCALE_BPS * 1e-4
+        self.stale_quote_ns = data_optimization.QUALITY_STALE_QUOTE_SECONDS * 1_000_000_000
+        self.max_age_ns = data_optimization.MAX_DATA_AGE_SECONDS * 1_000_000_000
+        self.max_skew_ns = data_optimization.QUALITY_MAX_CLOCK_SKEW_SECONDS * 1_000_000_000
+        self.reset_gap_ns = data_optimization.QUALITY_HISTORY_RESET_SECONDS * 1_000_000_000
+        self.instruments: Dict[str, _InstrumentState] = {}
+        
+        self.stats = {
+            "records": 0,
+            "accepted": 0,
+            "rejected": 0,
+            **{rule: 0 for rule in RULES},
+            "check_ns": 0
+        }
+    
+    def check(
+        self,
+        symbol: str,
+        timestamps: Any,
+        prices: Any,
+        bids: Any = None,
+        asks: Any = None,
+        volumes: Any = None,
+        now: Optional[datetime] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Mask of accepted rows and mask of accepted rows whose quote is stale.
+        
+        Prices and quotes may be NaN (quote-only or trade-only rows). ``now``
+        enables the age check; leave it out for historical data.
+        """
+        ts = _as_ns(timestamps)
+        count = len(ts)
+        if not self.validation_enabled or count == 0:
+            return np.ones(count, dtype=bool), np.zeros(count, dtype=bool)
+        
+        started = time.perf_counter_ns()
+        state = self.instruments.get(symbol)
+        if state is None:
+            state = self.instruments[symbol] = _InstrumentState()
+        
+        prices = _as_float(prices, count)
+        bids = _as_float(bids, count)
+        asks = _as_float(asks, count)
+        has_price = np.isfinite(prices)
+        has_quote = np.isfinite(bids) & np.isfinite(asks)
+        
+        hits = {
+            "invalid": (has_price & (prices <= 0)) | ~(has_price | has_quote),
+            "crossed": has_quote & (bids > asks),
+            "locked": has_quote & (bids == asks),
+        }
+        if volumes is not None:
+            hits["invalid"] |= np.asarray(volumes) < 0
+        if now is not None:
+            now_ns = int(np.datetime64(now, "ns").astype(np.int64))
+            hits["stale"] = (ts < now_ns - self.max_age_ns) | (ts > now_ns + self.max_skew_ns)
+        
+        rejected = hits["invalid"] | hits["crossed"] | hits.get("stale", False)
+        
+        # Non-decreasing timestamps, against the latest accepted so far
+        running = np.maximum.accumulate(np.where(rejected, _NO_TIMESTAMP, ts))
+        previous = np.maximum(np.concatenate(([state.last_ts], running[:-1])), state.last_ts)
+        hits["out_of_order"] = ~rejected & (ts < previous)
+        rejected |= hits["out_of_order"]
+        
+        if self.outlier_enabled:
+            hits["outlier"] = self._outliers(state, ts, prices, ~rejected & has_price)
+            rejected |= hits["outlier"]
+        
+        accepted = ~rejected
+        stale_quote = accepted & self._stale_quotes(state, ts, prices, bids, asks, has_quote & accepted)
+        hits["stale_quote"] = stale_quote
+        
+        if accepted.any():
+            state.last_ts = max(state.last_ts, int(ts[accepted].max()))
+        
+        for rule, mask in hits.items():
+            self.stats[rule] += int(np.count_nonzero(mask))
+        rejected_count = int(np.count_nonzero(rejected))
+        self.stats["records"] += count
+        self.stats["rejected"] += rejected_count
+        self.stats["accepted"] += count - rejected_count
+        self.stats["check_ns"] += time.perf_counter_ns() - started
+        return accepted, stale_quote
+    
+    def _outliers(
+        self,
+        state: _InstrumentState,
+        ts: np.ndarray,
+        prices: np.ndarray,
+        candidates: np.ndarray
+    ) -> np.ndarray:
+        """Prices far from the rolling median of the prices before them.
+        
+        Every candidate price enters the window, flagged or not: the median
+        ignores isolated bad prints, while a persistent level change becomes
+        the new median instead of being rejected forever. A gap longer than
+        ``QUALITY_HISTORY_RESET_SECONDS`` (overnight, halts) starts a new window.
+        """
+        flagged = np.zeros(len(prices), dtype=bool)
+        values, value_ts = prices[candidates], ts[candidates]
+        if len(values) == 0:
+            return flagged
+        
+        previous_ts = np.concatenate(([state.price_ts], value_ts[:-1]))
+        gaps = np.flatnonzero((previous_ts != _NO_TIMESTAMP) & (value_ts - previous_ts > self.reset_gap_ns))
+        
+        outliers = np.zeros(len(values), dtype=bool)
+        history = state.prices
+        for start, end in zip(np.concatenate(([0], gaps)), np.concatenate((gaps, [len(values)]))):
+            if start in gaps:
+                history = history[:0]
+            segment = values[start:end]
+            outliers[start:end] = self._segment_outliers(history, segment)
+            history = np.concatenate((history, segment))[-self.window:]
+        
+        state.prices, state.price_ts = history, int(value_ts[-1])
+        flagged[np.flatnonzero(candidates)] = outliers
+        return flagged
+    
+    def _segment_outliers(self, history: np.ndarray, values: np.ndarray) -> np.ndarray:
+        outliers = np.zeros(len(values), dtype=bool)
+        if len(values) == 0 or len(history) + len(values) <= self.min_history:
+            return outliers
+        
+        # Window i holds the ``window`` prices before value i, NaN-padded while
+        # warming up; sorting puts the NaNs last, so medians are taken by index
+        padding = np.full(self.window - len(history), np.nan)
+        windows = sliding_window_view(np.concatenate((padding, history, values)), self.window)[:len(values)]
+        counts = np.minimum(len(history) + np.arange(len(values)), self.window)
+        warm = counts >= self.min_history
+        windows, counts = windows[warm], counts[warm]
+        
+        median = _sorted_median(np.sort(windows, axis=1), counts)
+        mad = _sorted_median(np.sort(np.abs(windows - median[:, None]), axis=1), counts)
+        
+        scale = np.maximum(_MAD_TO_SIGMA * mad, median * self.min_scale)
+        outliers[warm] = np.abs(values[warm] - median) / scale > self.outlier_z
+        return outliers
+    
+    def _stale_quotes(
+        self,
+        state: _InstrumentState,
+        ts: np.ndarray,
+        prices: np.ndarray,
+        bids: np.ndarray,
+        asks: np.ndarray,
+        has_quote: np.ndarray
+    ) -> np.ndarray:
+        """Quotes unchanged for too long while trades print outside them."""
+        quote_ts, quote_bids, quote_asks = ts[has_quote], bids[has_quote], asks[has_quote]
+        stale = np.zeros(len(ts), dtype=bool)
+        if len(quote_ts) == 0:
+            return stale
+        
+        changed = (quote_bids != np.concatenate(([state.bid], quote_bids[:-1]))) | \
+                  (quote_asks != np.concatenate(([state.ask], quote_asks[:-1])))
+        last_change = np.maximum.accumulate(np.where(changed, np.arange(len(quote_ts)), -1))
+        since = np.where(last_change >= 0, quote_ts[np.maximum(last_change, 0)], state.quote_since)
+        state.bid, state.ask, state.quote_since = quote_bids[-1], quote_asks[-1], int(since[-1])
+        
+        quote_prices = prices[has_quote]
+        outside = (quote_prices < quote_bids) | (quote_prices > quote_asks)
+        stale[has_quote] = outside & (since != _NO_TIMESTAMP) & (quote_ts - since > self.stale_quote_ns)
+        return stale
+    
+    def filter_columns(self, symbol: str, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Accepted rows of tick store columns for one symbol; stale quotes become NaN."""
+        accepted, stale_quote = self.check(
+            symbol, columns["timestamp"], columns.get("price"),
+            columns.get("bid"), columns.get("ask"), columns.get("volume")
+        )
+        filtered = {name: values[accepted] for name, values in columns.items()}
+        if stale_quote.any():
+            for name in ("bid", "ask"):
+                if name in filtered:
+                    filtered[name] = np.where(stale_quote[accepted], np.nan, filtered[name])
+        return filtered
+    
+    def filter_records(self, records: List[Dict[str, Any]], now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Accepted market data dicts, in order; stale quotes are set to None."""
+        by_symbol: Dict[str, List[int]] = {}
+        for index, record in enumerate(records):
+            by_symbol.setdefault(record['symbol'], []).append(index)
+        
+        keep = np.zeros(len(records), dtype=bool)
+        drop_quote = np.zeros(len(records), dtype=bool)
+        for symbol, indexes in by_symbol.items():
+            rows = [records[i] for i in indexes]
+            accepted, stale_quote = self.check(
+                symbol,
+                [row['timestamp'] for row in rows],
+                [np.nan if row.get('price') is None else row['price'] for row in rows],
+                [np.nan if row.get('bid') is None else row['bid'] for row in rows],
+                [np.nan if row.get('ask') is None else row['ask'] for row in rows],
+                [row.get('volume') or 0 for row in rows],
+                now=now
+            )
+            keep[indexes] = accepted
+            drop_quote[indexes] = stale_quote
+        
+        return [
+            {**record, 'bid': None, 'ask': None} if drop_quote[i] else record
+            for i, record in enumerate(records) if keep[i]
+        ]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        records = self.stats["records"]
+        return {
+            "enabled": self.validation_enabled,
+            "outlier_detection": self.outlier_enabled,
+            **{name: value for name, value in self.stats.items() if name != "check_ns"},
+            "rejection_rate": round(self.stats["rejected"] / records, 6) if records else 0.0,
+            "avg_check_us_per_record": round(self.stats["check_ns"] / records / 1000, 3) if records else 0.0,
+            "instruments": len(self.instruments)
+        }
+
+
+# Global data quality filter for the live ingest path
+data_quality_filter = DataQualityFilter()
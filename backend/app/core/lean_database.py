@@ -6,41 +6,69 @@ Optimized database operations for cost-effective deployment.
 import asyncio
 import logging
 import json
-import gzip
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Union
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Any, Union, NamedTuple, Sequence, Tuple
 from contextlib import asynccontextmanager
 import asyncpg
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Index
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, LargeBinary, Index, UniqueConstraint, insert
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import text
-import msgpack
 
 from app.core.lean_config import lean_config, data_optimization, get_optimal_batch_size
+from app.core.lean_codecs import codec_registry
+from app.core.lean_metering import usage_meter
 from app.models.market_data_models import MarketDataSnapshot, OptionsChain, VIXData
 
 logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+_PARTITION_NAME_PATTERN = re.compile(r"_p(\d{8})$")
+
+# Codec-encoded blob columns, formerly hex-encoded Text, now bytea
+_BLOB_COLUMNS = {
+    "lean_market_data": "compressed_data",
+    "lean_signal_data": "compressed_metadata",
+}
+_LEGACY_BLOB_SUFFIX = "_hex"
+
+# Advisory lock keys (class, object) coordinating the blob migration across workers
+_BLOB_LOCK_CLASS = 0x4C45414E  # "LEAN"
+_BLOB_SCHEMA_LOCK = 1  # Rename and add columns, exclusive per transaction
+_BLOB_BACKFILL_LOCK = 2  # One worker converts rows at a time
+_BLOB_READERS_LOCK = 3  # Shared while a worker reads the legacy columns; the drop takes it exclusively
+
+
+def _partition_options() -> Dict[str, Any]:
+    """Table options for daily range partitioning on ``timestamp``.
+    
+    PostgreSQL requires the partition key in every unique constraint, so the
+    partitioned models use (id, timestamp) as their primary key.
+    """
+    if not lean_config.DATABASE_PARTITIONING_ENABLED:
+        return {}
+    return {"postgresql_partition_by": "RANGE (timestamp)"}
+
 
 class LeanMarketData(Base):
     """Optimized market data model for lean deployment."""
     __tablename__ = "lean_market_data"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     symbol = Column(String(10), nullable=False, index=True)
-    timestamp = Column(DateTime, nullable=False, index=True)
+    timestamp = Column(DateTime, primary_key=True, nullable=False, index=True)
     price = Column(Float, nullable=False)
     volume = Column(Integer, nullable=False)
-    compressed_data = Column(Text)  # Compressed additional data
+    compressed_data = Column(LargeBinary)  # Compressed additional data
     
     # Composite index for efficient queries
     __table_args__ = (
         Index('idx_symbol_timestamp', 'symbol', 'timestamp'),
         Index('idx_timestamp_symbol', 'timestamp', 'symbol'),
+        _partition_options(),
     )
 
 
@@ -48,10 +76,10 @@ class LeanOptionsData(Base):
     """Optimized options data model for lean deployment."""
     __tablename__ = "lean_options_data"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     underlying_symbol = Column(String(10), nullable=False, index=True)
     option_symbol = Column(String(50), nullable=False, index=True)
-    timestamp = Column(DateTime, nullable=False, index=True)
+    timestamp = Column(DateTime, primary_key=True, nullable=False, index=True)
     strike = Column(Float, nullable=False)
     expiry = Column(DateTime, nullable=False)
     option_type = Column(String(4), nullable=False)  # CALL or PUT
@@ -70,6 +98,7 @@ class LeanOptionsData(Base):
         Index('idx_underlying_timestamp', 'underlying_symbol', 'timestamp'),
         Index('idx_option_symbol_timestamp', 'option_symbol', 'timestamp'),
         Index('idx_strike_expiry', 'strike', 'expiry'),
+        _partition_options(),
     )
 
 
@@ -77,23 +106,53 @@ class LeanSignalData(Base):
     """Optimized signal data model for lean deployment."""
     __tablename__ = "lean_signal_data"
     
-    id = Column(Integer, primary_key=True, index=True)
-    signal_id = Column(String(50), nullable=False, unique=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    signal_id = Column(String(50), nullable=False, index=True)
     symbol = Column(String(10), nullable=False, index=True)
-    timestamp = Column(DateTime, nullable=False, index=True)
+    timestamp = Column(DateTime, primary_key=True, nullable=False, index=True)
     signal_type = Column(String(20), nullable=False)
     confidence = Column(Float, nullable=False)
     strategy = Column(String(30), nullable=False)
-    compressed_metadata = Column(Text)  # Compressed signal metadata
+    compressed_metadata = Column(LargeBinary)  # Compressed signal metadata
     executed = Column(Boolean, default=False, index=True)
     result = Column(Float)  # P&L result if executed
     
     __table_args__ = (
-        Index('idx_symbol_timestamp', 'symbol', 'timestamp'),
+        UniqueConstraint('signal_id', 'timestamp', name='uq_signal_id_timestamp'),
+        Index('idx_signal_symbol_timestamp', 'symbol', 'timestamp'),
         Index('idx_executed_timestamp', 'executed', 'timestamp'),
+        _partition_options(),
     )
 
 
+class MarketDataRow(NamedTuple):
+    """Column layout of one lean_market_data row for bulk writes."""
+    symbol: str
+    timestamp: datetime
+    price: float
+    volume: int
+    compressed_data: Optional[bytes]
+
+
+class OptionsDataRow(NamedTuple):
+    """Column layout of one lean_options_data row for bulk writes."""
+    underlying_symbol: str
+    option_symbol: str
+    timestamp: datetime
+    strike: float
+    expiry: datetime
+    option_type: str
+    bid: float
+    ask: float
+    volume: int
+    open_interest: int
+    implied_volatility: Optional[float]
+    delta: Optional[float]
+    gamma: Optional[float]
+    theta: Optional[float]
+    vega: Optional[float]
+
+
 class LeanDatabaseManager:
     """Optimized database manager for lean deployment."""
     
@@ -101,8 +160,17 @@ class LeanDatabaseManager:
         self.engine = None
         self.async_session_maker = None
         self.connection_pool = None
-        self.compression_enabled = data_optimization.COMPRESSION_ALGORITHM
+        self.compression_enabled = data_optimization.COMPRESSION_ALGORITHM != "none"
+        self.codec = codec_registry.get_codec(
+            "msgpack", data_optimization.COMPRESSION_ALGORITHM, on_encode=usage_meter.observe_compression
+        )
         self.batch_size = get_optimal_batch_size("market_data")
+        self.bulk_copy_enabled = lean_config.DATABASE_BULK_COPY_ENABLED
+        self.bulk_write_stats = {"copy_batches": 0, "insert_batches": 0, "rows_written": 0}
+        self.partitioned_tables: List[str] = []
+        self.legacy_blob_columns: Dict[str, str] = {}  # Table -> hex column still being migrated
+        self._blob_migration_task: Optional[asyncio.Task] = None
+        self._blob_reader_conn = None  # Holds the shared readers lock while legacy columns are read
         
     async def initialize(self) -> None:
         """Initialize database connection with optimized settings."""
@@ -137,6 +205,12 @@ class LeanDatabaseManager:
             async with self.engine.begin() as conn:
                 await conn.run_sync(Base.metadata.create_all)
             
+            # Move hex-encoded Text blobs to bytea, backfilling in the background
+            await self._prepare_blob_columns()
+            
+            # Create partitions for the retention window and the next few days
+            await self.maintain_partitions()
+            
             # Optimize database settings
             await self._optimize_database_settings()
             
@@ -185,51 +259,299 @@ class LeanDatabaseManager:
             finally:
                 await session.close()
     
-    def _compress_data(self, data: Dict[str, Any]) -> str:
+    def _compress_data(self, data: Dict[str, Any]) -> Optional[bytes]:
         """Compress data using configured algorithm."""
         if not data:
-            return ""
+            return None
         
         try:
-            # Use msgpack for efficient serialization
-            packed_data = msgpack.packb(data)
-            
-            # Compress with gzip
-            if self.compression_enabled:
-                compressed_data = gzip.compress(packed_data)
-                return compressed_data.hex()
-            else:
-                return packed_data.hex()
+            # msgpack with the configured compressor and a codec header
+            return self.codec.encode(data, compress=self.compression_enabled)
                 
         except Exception as e:
             logger.error(f"Failed to compress data: {e}")
-            return json.dumps(data)  # Fallback to JSON
+            return json.dumps(data, default=str).encode("utf-8")  # Fallback to JSON
     
-    def _decompress_data(self, compressed_data: str) -> Dict[str, Any]:
+    def _decompress_data(self, compressed_data: Optional[bytes]) -> Dict[str, Any]:
         """Decompress data using configured algorithm."""
-        if not compressed_data:
-            return {}
+        return self._decompress_many([compressed_data])[0]
+    
+    def _decompress_many(self, blobs: Sequence[Optional[bytes]]) -> List[Dict[str, Any]]:
+        """Decode a column of blobs in one pass; rows written before the codec
+        header existed (raw or gzip-compressed msgpack, or JSON) are decoded
+        by the codec's legacy path."""
+        return [value or {} for value in self.codec.decode_many(blobs)]
+    
+    def _blob_select(self, table_name: str) -> str:
+        """SELECT expression for a table's blob column, reading both the bytea
+        column and, while a migration is running, its legacy hex column."""
+        column = _BLOB_COLUMNS[table_name]
+        legacy = self.legacy_blob_columns.get(table_name)
+        if not legacy:
+            return column
+        return f"COALESCE({column}, {self._hex_to_bytea(legacy)}) AS {column}"
+    
+    @staticmethod
+    def _hex_to_bytea(legacy: str) -> str:
+        # Hex rows decode to the original bytes; JSON fallback rows are kept as UTF-8
+        return (
+            f"CASE WHEN {legacy} ~ '^([0-9a-f]{{2}})+$' THEN decode({legacy}, 'hex') "
+            f"ELSE convert_to({legacy}, 'UTF8') END"
+        )
+    
+    async def _advisory_lock(self, key: int, shared: bool = False) -> Any:
+        """Connection holding a session-level advisory lock (waits for it);
+        release it with ``_advisory_unlock``.
+        """
+        conn = await self.engine.connect()
+        try:
+            await conn.execute(
+                text(f"SELECT pg_advisory_lock{'_shared' if shared else ''}(:lock_class, :key)"),
+                {"lock_class": _BLOB_LOCK_CLASS, "key": key}
+            )
+            await conn.commit()
+        except BaseException:
+            await conn.close()
+            raise
+        return conn
+    
+    @staticmethod
+    async def _advisory_unlock(conn: Any, key: int, shared: bool = False) -> None:
+        # Pooled connections keep session locks, so unlock before handing it back
+        try:
+            await conn.execute(
+                text(f"SELECT pg_advisory_unlock{'_shared' if shared else ''}(:lock_class, :key)"),
+                {"lock_class": _BLOB_LOCK_CLASS, "key": key}
+            )
+            await conn.commit()
+        finally:
+            await conn.close()
+    
+    async def _release_blob_readers_lock(self) -> None:
+        conn, self._blob_reader_conn = self._blob_reader_conn, None
+        if conn is not None:
+            await self._advisory_unlock(conn, _BLOB_READERS_LOCK, shared=True)
+    
+    async def _prepare_blob_columns(self) -> None:
+        """Switch hex-encoded Text blob columns to bytea without a table rewrite.
         
+        The Text column is renamed to ``<column>_hex`` and an empty bytea
+        column takes its place, both catalog-only changes, so new rows are
+        written as raw bytes immediately. Existing rows are converted by
+        ``migrate_blob_columns`` in small batches; reads coalesce both
+        columns until it finishes. An interrupted migration resumes on the
+        next start.
+        
+        Every worker runs this at startup, so the schema change is serialized
+        with a transaction-level advisory lock, and a worker that reads the
+        legacy columns holds a shared advisory lock so none is dropped under it.
+        """
         try:
-            # Convert from hex
-            data_bytes = bytes.fromhex(compressed_data)
+            self._blob_reader_conn = await self._advisory_lock(_BLOB_READERS_LOCK, shared=True)
+            
+            async with self.engine.begin() as conn:
+                await conn.execute(
+                    text("SELECT pg_advisory_xact_lock(:lock_class, :key)"),
+                    {"lock_class": _BLOB_LOCK_CLASS, "key": _BLOB_SCHEMA_LOCK}
+                )
+                for table_name, column in _BLOB_COLUMNS.items():
+                    legacy = column + _LEGACY_BLOB_SUFFIX
+                    result = await conn.execute(
+                        text("""
+                            SELECT column_name, data_type
+                            FROM information_schema.columns
+                            WHERE table_name = :table_name AND column_name = ANY(:columns)
+                        """),
+                        {"table_name": table_name, "columns": [column, legacy]}
+                    )
+                    column_types = {row.column_name: row.data_type for row in result}
+                    
+                    if column_types.get(column) == "text":
+                        await conn.execute(text(f"ALTER TABLE {table_name} RENAME COLUMN {column} TO {legacy}"))
+                        await conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column} bytea"))
+                        self.legacy_blob_columns[table_name] = legacy
+                    elif legacy in column_types:
+                        self.legacy_blob_columns[table_name] = legacy
             
-            # Decompress if needed
-            if self.compression_enabled:
-                decompressed_data = gzip.decompress(data_bytes)
+            if self.legacy_blob_columns:
+                logger.info(f"Migrating hex blob columns to bytea: {self.legacy_blob_columns}")
+                self._blob_migration_task = asyncio.create_task(self.migrate_blob_columns())
             else:
-                decompressed_data = data_bytes
+                await self._release_blob_readers_lock()
+                
+        except Exception as e:
+            logger.error(f"Failed to prepare blob column migration: {e}")
+    
+    async def migrate_blob_columns(self, batch_size: Optional[int] = None) -> int:
+        """Backfill bytea blob columns from their legacy hex columns.
+        
+        Rows are converted in keyset-ordered batches of ``batch_size``, each
+        in its own short transaction, by one worker at a time; workers that
+        wait find nothing left to convert. A legacy column is dropped once
+        empty and no worker still reads it.
+        """
+        batch_size = batch_size or lean_config.DATABASE_BLOB_MIGRATION_BATCH_SIZE
+        migrated = 0
+        finished = []
+        
+        try:
+            lock_conn = await self._advisory_lock(_BLOB_BACKFILL_LOCK)
+            try:
+                for table_name, legacy in list(self.legacy_blob_columns.items()):
+                    column = _BLOB_COLUMNS[table_name]
+                    last_timestamp, last_id = datetime(1970, 1, 1), 0
+                    
+                    while True:
+                        async with self.engine.begin() as conn:
+                            result = await conn.execute(
+                                text(f"""
+                                    WITH batch AS (
+                                        SELECT id, timestamp FROM {table_name}
+                                        WHERE {legacy} IS NOT NULL
+                                        AND (timestamp, id) > (:last_timestamp, :last_id)
+                                        ORDER BY timestamp, id
+                                        LIMIT :batch_size
+                                    )
+                                    UPDATE {table_name} AS t
+                                    SET {column} = COALESCE(t.{column}, {self._hex_to_bytea("t." + legacy)}),
+                                        {legacy} = NULL
+                                    FROM batch
+                                    WHERE t.id = batch.id AND t.timestamp = batch.timestamp
+                                    RETURNING t.timestamp, t.id
+                                """),
+                                {"last_timestamp": last_timestamp, "last_id": last_id, "batch_size": batch_size}
+                            )
+                            keys = result.fetchall()
+                        
+                        if not keys:
+                            break
+                        
+                        migrated += len(keys)
+                        last_timestamp, last_id = max((row.timestamp, row.id) for row in keys)
+                        await asyncio.sleep(0)  # Let request handlers in between batches
+                    
+                    # Every row is bytea now, so reads no longer need the legacy column
+                    del self.legacy_blob_columns[table_name]
+                    finished.append((table_name, legacy))
+                    logger.info(f"Migrated {table_name}.{column} to bytea")
+            finally:
+                await self._advisory_unlock(lock_conn, _BLOB_BACKFILL_LOCK)
             
-            # Unpack with msgpack
-            return msgpack.unpackb(decompressed_data, raw=False)
+            if self.legacy_blob_columns:
+                return migrated
+            await self._release_blob_readers_lock()
             
-        except Exception as e:
-            logger.error(f"Failed to decompress data: {e}")
+            # Waits until every worker has stopped reading the legacy columns
+            drop_conn = await self._advisory_lock(_BLOB_READERS_LOCK)
             try:
-                # Fallback to JSON
-                return json.loads(compressed_data)
-            except:
-                return {}
+                for table_name, legacy in finished:
+                    await drop_conn.execute(text(f"ALTER TABLE {table_name} DROP COLUMN IF EXISTS {legacy}"))
+                await drop_conn.commit()
+            finally:
+                await self._advisory_unlock(drop_conn, _BLOB_READERS_LOCK)
+                
+        except Exception as e:
+            logger.error(f"Blob column migration stopped after {migrated} rows, resuming on next start: {e}")
+        
+        return migrated
+    
+    async def bulk_write(self, table: Any, rows: Sequence[NamedTuple]) -> int:
+        """Bulk write typed row tuples into a table.
+        
+        Uses asyncpg's binary COPY (``copy_records_to_table``) when the engine
+        runs on asyncpg. Otherwise, or if COPY fails, it falls back to a
+        multi-row ``INSERT ... VALUES`` sent with executemany.
+        """
+        if not rows:
+            return 0
+        
+        columns = list(rows[0]._fields)
+        table_name = table.__tablename__
+        
+        async with self.engine.begin() as conn:
+            if self.bulk_copy_enabled:
+                raw_connection = await conn.get_raw_connection()
+                driver_connection = getattr(raw_connection, "driver_connection", None)
+                
+                if hasattr(driver_connection, "copy_records_to_table"):
+                    # Savepoint so a failed COPY does not abort the fallback INSERT
+                    savepoint = await conn.begin_nested()
+                    try:
+                        await driver_connection.copy_records_to_table(
+                            table_name, records=rows, columns=columns
+                        )
+                        await savepoint.commit()
+                        self.bulk_write_stats["copy_batches"] += 1
+                        self.bulk_write_stats["rows_written"] += len(rows)
+                        return len(rows)
+                    except Exception as e:
+                        await savepoint.rollback()
+                        logger.warning(f"COPY into {table_name} failed, falling back to INSERT: {e}")
+            
+            await conn.execute(insert(table), [row._asdict() for row in rows])
+            self.bulk_write_stats["insert_batches"] += 1
+            self.bulk_write_stats["rows_written"] += len(rows)
+            return len(rows)
+    
+    def _market_data_rows(self, market_data_list: List[MarketDataSnapshot]) -> List[MarketDataRow]:
+        """Filter snapshots and convert them into lean_market_data rows."""
+        rows = []
+        
+        for data in market_data_list:
+            # Filter out low-volume or insignificant data
+            if (data.volume < data_optimization.MIN_VOLUME_THRESHOLD or
+                abs(data.change_percent) < data_optimization.MIN_PRICE_CHANGE_THRESHOLD):
+                continue
+            
+            # Compress additional data
+            additional_data = {
+                "change": round(data.change, data_optimization.PRICE_PRECISION),
+                "change_percent": round(data.change_percent, data_optimization.PERCENTAGE_PRECISION),
+                "high": round(data.high, data_optimization.PRICE_PRECISION),
+                "low": round(data.low, data_optimization.PRICE_PRECISION),
+                "open": round(data.open, data_optimization.PRICE_PRECISION),
+                "vwap": round(data.vwap, data_optimization.PRICE_PRECISION) if data.vwap else None
+            }
+            
+            rows.append(MarketDataRow(
+                symbol=data.symbol,
+                timestamp=data.timestamp,
+                price=round(data.price, data_optimization.PRICE_PRECISION),
+                volume=int(data.volume),
+                compressed_data=self._compress_data(additional_data)
+            ))
+        
+        return rows
+    
+    def _options_data_rows(self, options_data_list: List[OptionsChain]) -> List[OptionsDataRow]:
+        """Filter option quotes and convert them into lean_options_data rows."""
+        rows = []
+        
+        for options_chain in options_data_list:
+            for option in options_chain.options:
+                # Filter out low-volume options
+                if option.volume < data_optimization.MIN_VOLUME_THRESHOLD:
+                    continue
+                
+                rows.append(OptionsDataRow(
+                    underlying_symbol=options_chain.symbol,
+                    option_symbol=option.symbol,
+                    timestamp=options_chain.timestamp,
+                    strike=round(option.strike, data_optimization.PRICE_PRECISION),
+                    expiry=option.expiry,
+                    option_type=option.option_type,
+                    bid=round(option.bid, data_optimization.PRICE_PRECISION),
+                    ask=round(option.ask, data_optimization.PRICE_PRECISION),
+                    volume=int(option.volume),
+                    open_interest=int(option.open_interest),
+                    implied_volatility=round(option.implied_volatility, 4) if option.implied_volatility else None,
+                    delta=round(option.delta, 4) if option.delta else None,
+                    gamma=round(option.gamma, 6) if option.gamma else None,
+                    theta=round(option.theta, 4) if option.theta else None,
+                    vega=round(option.vega, 4) if option.vega else None
+                ))
+        
+        return rows
     
     async def store_market_data_batch(self, market_data_list: List[MarketDataSnapshot]) -> None:
         """Store market data in optimized batches."""
@@ -237,40 +559,12 @@ class LeanDatabaseManager:
             return
         
         try:
-            async with self.get_session() as session:
-                batch_data = []
-                
-                for data in market_data_list:
-                    # Filter out low-volume or insignificant data
-                    if (data.volume < data_optimization.MIN_VOLUME_THRESHOLD or
-                        abs(data.change_percent) < data_optimization.MIN_PRICE_CHANGE_THRESHOLD):
-                        continue
-                    
-                    # Compress additional data
-                    additional_data = {
-                        "change": round(data.change, data_optimization.PRICE_PRECISION),
-                        "change_percent": round(data.change_percent, data_optimization.PERCENTAGE_PRECISION),
-                        "high": round(data.high, data_optimization.PRICE_PRECISION),
-                        "low": round(data.low, data_optimization.PRICE_PRECISION),
-                        "open": round(data.open, data_optimization.PRICE_PRECISION),
-                        "vwap": round(data.vwap, data_optimization.PRICE_PRECISION) if data.vwap else None
-                    }
-                    
-                    lean_data = LeanMarketData(
-                        symbol=data.symbol,
-                        timestamp=data.timestamp,
-                        price=round(data.price, data_optimization.PRICE_PRECISION),
-                        volume=int(data.volume),
-                        compressed_data=self._compress_data(additional_data)
-                    )
-                    batch_data.append(lean_data)
-                
-                # Batch insert for efficiency
-                if batch_data:
-                    session.add_all(batch_data)
-                    await session.commit()
-                    
-                    logger.debug(f"Stored {len(batch_data)} market data records")
+            rows = self._market_data_rows(market_data_list)
+            
+            # Bulk insert for efficiency
+            if rows:
+                await self.bulk_write(LeanMarketData, rows)
+                logger.debug(f"Stored {len(rows)} market data records")
                 
         except Exception as e:
             logger.error(f"Failed to store market data batch: {e}")
@@ -282,40 +576,12 @@ class LeanDatabaseManager:
             return
         
         try:
-            async with self.get_session() as session:
-                batch_data = []
-                
-                for options_chain in options_data_list:
-                    for option in options_chain.options:
-                        # Filter out low-volume options
-                        if option.volume < data_optimization.MIN_VOLUME_THRESHOLD:
-                            continue
-                        
-                        lean_option = LeanOptionsData(
-                            underlying_symbol=options_chain.symbol,
-                            option_symbol=option.symbol,
-                            timestamp=options_chain.timestamp,
-                            strike=round(option.strike, data_optimization.PRICE_PRECISION),
-                            expiry=option.expiry,
-                            option_type=option.option_type,
-                            bid=round(option.bid, data_optimization.PRICE_PRECISION),
-                            ask=round(option.ask, data_optimization.PRICE_PRECISION),
-                            volume=int(option.volume),
-                            open_interest=int(option.open_interest),
-                            implied_volatility=round(option.implied_volatility, 4) if option.implied_volatility else None,
-                            delta=round(option.delta, 4) if option.delta else None,
-                            gamma=round(option.gamma, 6) if option.gamma else None,
-                            theta=round(option.theta, 4) if option.theta else None,
-                            vega=round(option.vega, 4) if option.vega else None
-                        )
-                        batch_data.append(lean_option)
-                
-                # Batch insert for efficiency
-                if batch_data:
-                    session.add_all(batch_data)
-                    await session.commit()
-                    
-                    logger.debug(f"Stored {len(batch_data)} options data records")
+            rows = self._options_data_rows(options_data_list)
+            
+            # Bulk insert for efficiency
+            if rows:
+                await self.bulk_write(LeanOptionsData, rows)
+                logger.debug(f"Stored {len(rows)} options data records")
                 
         except Exception as e:
             logger.error(f"Failed to store options data batch: {e}")
@@ -328,8 +594,8 @@ class LeanDatabaseManager:
                 cutoff_time = datetime.utcnow() - timedelta(minutes=minutes)
                 
                 result = await session.execute(
-                    text("""
-                        SELECT symbol, timestamp, price, volume, compressed_data
+                    text(f"""
+                        SELECT symbol, timestamp, price, volume, {self._blob_select("lean_market_data")}
                         FROM lean_market_data
                         WHERE symbol = :symbol AND timestamp >= :cutoff_time
                         ORDER BY timestamp DESC
@@ -337,11 +603,13 @@ class LeanDatabaseManager:
                     """),
                     {"symbol": symbol, "cutoff_time": cutoff_time}
                 )
+                rows = result.fetchall()
+                
+                # Decode the whole blob column at once instead of row by row
+                decoded = self._decompress_many([row.compressed_data for row in rows])
                 
                 market_data = []
-                for row in result:
-                    additional_data = self._decompress_data(row.compressed_data)
-                    
+                for row, additional_data in zip(rows, decoded):
                     data_point = {
                         "symbol": row.symbol,
                         "timestamp": row.timestamp,
@@ -404,40 +672,185 @@ class LeanDatabaseManager:
             logger.error(f"Failed to get options chain: {e}")
             return []
     
+    def _retention_policy(self) -> Dict[str, int]:
+        """Retention in days per time-series table."""
+        return {
+            LeanMarketData.__tablename__: lean_config.DATA_RETENTION_DAYS,
+            LeanOptionsData.__tablename__: lean_config.DATA_RETENTION_DAYS,
+            # Keep signals longer for learning
+            LeanSignalData.__tablename__: lean_config.DATA_RETENTION_DAYS * 2
+        }
+    
+    async def _detect_partitioned_tables(self) -> List[str]:
+        """Names of the time-series tables that are actually partitioned.
+        
+        Tables created before partitioning was enabled stay plain tables
+        and keep row-by-row retention until they are migrated.
+        """
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                text("""
+                    SELECT c.relname
+                    FROM pg_partitioned_table p
+                    JOIN pg_class c ON c.oid = p.partrelid
+                    WHERE c.relname = ANY(:tables)
+                """),
+                {"tables": list(self._retention_policy())}
+            )
+            partitioned = [row.relname for row in result]
+        
+        for table_name in self._retention_policy():
+            if table_name not in partitioned:
+                logger.warning(f"{table_name} is not partitioned, retention falls back to DELETE")
+        
+        return partitioned
+    
+    async def _list_partitions(self, table_name: str) -> Dict[date, str]:
+        """Daily partitions of a table keyed by the day they cover."""
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                text("""
+                    SELECT child.relname
+                    FROM pg_inherits i
+                    JOIN pg_class parent ON parent.oid = i.inhparent
+                    JOIN pg_class child ON child.oid = i.inhrelid
+                    WHERE parent.relname = :table_name
+                """),
+                {"table_name": table_name}
+            )
+            partitions = {}
+            for row in result:
+                match = _PARTITION_NAME_PATTERN.search(row.relname)
+                if match:
+                    partitions[datetime.strptime(match.group(1), "%Y%m%d").date()] = row.relname
+            return partitions
+    
+    async def _create_partitions(self, table_name: str, first_day: date, last_day: date) -> int:
+        """Create daily partitions (and a default partition) for a date range."""
+        existing = await self._list_partitions(table_name)
+        created = 0
+        
+        async with self.engine.begin() as conn:
+            # Catches rows outside the premade range, e.g. old backfills
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {table_name}_default PARTITION OF {table_name} DEFAULT"
+            ))
+        
+        day = first_day
+        while day <= last_day:
+            if day not in existing:
+                partition_name = f"{table_name}_p{day:%Y%m%d}"
+                bounds = {"first": datetime.combine(day, datetime.min.time()),
+                          "last": datetime.combine(day + timedelta(days=1), datetime.min.time())}
+                try:
+                    # Attaching fails while the default partition holds rows for
+                    # the day, so they are moved into the new table first; the
+                    # whole step is one transaction
+                    async with self.engine.begin() as conn:
+                        await conn.execute(text(
+                            f"CREATE TABLE IF NOT EXISTS {partition_name} "
+                            f"(LIKE {table_name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+                        ))
+                        moved = await conn.execute(
+                            text(f"""
+                                WITH moved AS (
+                                    DELETE FROM {table_name}_default
+                                    WHERE timestamp >= :first AND timestamp < :last
+                                    RETURNING *
+                                )
+                                INSERT INTO {partition_name} SELECT * FROM moved
+                            """),
+                            bounds
+                        )
+                        await conn.execute(text(
+                            f"ALTER TABLE {table_name} ATTACH PARTITION {partition_name} "
+                            f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+                        ))
+                    if moved.rowcount:
+                        logger.info(f"Moved {moved.rowcount} rows of {day} from {table_name}_default to {partition_name}")
+                    created += 1
+                except Exception as e:
+                    logger.warning(f"Could not create partition {partition_name}: {e}")
+            day += timedelta(days=1)
+        
+        return created
+    
+    async def _expire_partitions(self, table_name: str, cutoff_time: datetime) -> int:
+        """Drop (or detach) daily partitions that lie entirely before the cutoff."""
+        expired = 0
+        
+        for day, partition_name in sorted((await self._list_partitions(table_name)).items()):
+            if datetime.combine(day + timedelta(days=1), datetime.min.time()) > cutoff_time:
+                break
+            
+            async with self.engine.begin() as conn:
+                await conn.execute(text(f"ALTER TABLE {table_name} DETACH PARTITION {partition_name}"))
+                if lean_config.DATABASE_PARTITION_RETENTION_ACTION == "drop":
+                    await conn.execute(text(f"DROP TABLE {partition_name}"))
+            expired += 1
+        
+        # Rows that landed in the default partition are few; delete them directly
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text(f"DELETE FROM {table_name}_default WHERE timestamp < :cutoff_time"),
+                {"cutoff_time": cutoff_time}
+            )
+        
+        return expired
+    
+    async def maintain_partitions(self) -> None:
+        """Create partitions from the retention cutoff to a few days ahead."""
+        if not lean_config.DATABASE_PARTITIONING_ENABLED:
+            return
+        
+        try:
+            self.partitioned_tables = await self._detect_partitioned_tables()
+            today = datetime.utcnow().date()
+            last_day = today + timedelta(days=lean_config.DATABASE_PARTITION_PREMAKE_DAYS)
+            
+            for table_name in self.partitioned_tables:
+                retention_days = self._retention_policy()[table_name]
+                created = await self._create_partitions(table_name, today - timedelta(days=retention_days), last_day)
+                if created:
+                    logger.info(f"Created {created} partitions for {table_name}")
+                    
+        except Exception as e:
+            logger.error(f"Failed to maintain partitions: {e}")
+    
     async def cleanup_old_data(self) -> None:
-        """Clean up old data to manage storage costs."""
+        """Clean up old data to manage storage costs.
+        
+        Partitioned tables expire whole days by dropping partitions, which
+        does not touch rows or leave bloat behind. Plain tables fall back to
+        DELETE followed by VACUUM, which must run outside a transaction.
+        """
         try:
-            async with self.get_session() as session:
-                cutoff_time = datetime.utcnow() - timedelta(days=lean_config.DATA_RETENTION_DAYS)
-                
-                # Clean up old market data
-                await session.execute(
-                    text("DELETE FROM lean_market_data WHERE timestamp < :cutoff_time"),
-                    {"cutoff_time": cutoff_time}
-                )
-                
-                # Clean up old options data
-                await session.execute(
-                    text("DELETE FROM lean_options_data WHERE timestamp < :cutoff_time"),
-                    {"cutoff_time": cutoff_time}
-                )
-                
-                # Clean up old signal data (keep longer for learning)
-                signal_cutoff = datetime.utcnow() - timedelta(days=lean_config.DATA_RETENTION_DAYS * 2)
-                await session.execute(
-                    text("DELETE FROM lean_signal_data WHERE timestamp < :cutoff_time"),
-                    {"cutoff_time": signal_cutoff}
-                )
-                
-                await session.commit()
-                
-                # Vacuum tables to reclaim space
-                await session.execute(text("VACUUM ANALYZE lean_market_data"))
-                await session.execute(text("VACUUM ANALYZE lean_options_data"))
-                await session.execute(text("VACUUM ANALYZE lean_signal_data"))
-                
-                logger.info("Completed data cleanup and vacuum")
+            await self.maintain_partitions()
+            
+            vacuum_tables = []
+            for table_name, retention_days in self._retention_policy().items():
+                cutoff_time = datetime.utcnow() - timedelta(days=retention_days)
                 
+                if table_name in self.partitioned_tables:
+                    expired = await self._expire_partitions(table_name, cutoff_time)
+                    logger.info(f"Expired {expired} partitions of {table_name}")
+                else:
+                    async with self.engine.begin() as conn:
+                        await conn.execute(
+                            text(f"DELETE FROM {table_name} WHERE timestamp < :cutoff_time"),
+                            {"cutoff_time": cutoff_time}
+                        )
+                    vacuum_tables.append(table_name)
+            
+            # Vacuum tables to reclaim space
+            if vacuum_tables:
+                async with self.engine.connect() as conn:
+                    conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                    for table_name in vacuum_tables:
+                        await conn.execute(text(f"VACUUM ANALYZE {table_name}"))
+            
+            logger.info("Completed data cleanup")
+            
         except Exception as e:
             logger.error(f"Failed to cleanup old data: {e}")
     
@@ -490,6 +903,15 @@ class LeanDatabaseManager:
     
     async def close(self) -> None:
         """Close database connections."""
+        if self._blob_migration_task and not self._blob_migration_task.done():
+            self._blob_migration_task.cancel()
+        
+        if self._blob_reader_conn is not None:
+            try:
+                await self._release_blob_readers_lock()
+            except Exception as e:
+                logger.debug(f"Could not release the blob readers lock: {e}")
+        
         if self.engine:
             await self.engine.dispose()
             logger.info("Database connections closed")
@@ -0,0 +1,360 @@
+"""
+Lean DBN Decoding for Smart-0DTE-System
+Decode DBN files and streams into structured NumPy record batches.
+
+DBN records are fixed-layout little-endian C structs, so a run of records of
+the same type is already a valid NumPy structured array. ``DBNReader`` finds
+such runs by checking the length and rtype bytes at every record stride and
+returns ``ndarray.view`` slices over the raw bytes: no Python object per
+record and no per-field copy.
+
+Uncompressed files are memory-mapped, so batches are views of the page cache
+that stay valid while the reader is open. Zstandard input is decompressed
+into one reused buffer, so each batch is only valid until the next one is
+requested; copy it to keep it.
+"""
+
+import logging
+import struct
+from io import BytesIO
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.core.lean_live_feed import PRICE_SCALE, UNDEF_PRICE
+
+try:
+    import databento_dbn as dbn
+except ImportError:
+    dbn = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+DBN_MAGIC = b"DBN"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+DEFAULT_BATCH_SIZE = 65536  # Records per batch
+
+_RECORD_HEADER = [
+    ("length", "u1"),         # Record size in 4-byte words
+    ("rtype", "u1"),
+    ("publisher_id", "u2"),
+    ("instrument_id", "u4"),
+    ("ts_event", "u8"),
+]
+
+MBO_DTYPE = np.dtype(_RECORD_HEADER + [
+    ("order_id", "u8"),
+    ("price", "i8"),
+    ("size", "u4"),
+    ("flags", "u1"),
+    ("channel_id", "u1"),
+    ("action", "S1"),
+    ("side", "S1"),
+    ("ts_recv", "u8"),
+    ("ts_in_delta", "i4"),
+    ("sequence", "u4"),
+])
+
+TRADE_DTYPE = np.dtype(_RECORD_HEADER + [
+    ("price", "i8"),
+    ("size", "u4"),
+    ("action", "S1"),
+    ("side", "S1"),
+    ("flags", "u1"),
+    ("depth", "u1"),
+    ("ts_recv", "u8"),
+    ("ts_in_delta", "i4"),
+    ("sequence", "u4"),
+])
+
+# MBP-1 and TBBO
+MBP1_DTYPE = np.dtype(TRADE_DTYPE.descr + [
+    ("bid_px_00", "i8"),
+    ("ask_px_00", "i8"),
+    ("bid_sz_00", "u4"),
+    ("ask_sz_00", "u4"),
+    ("bid_ct_00", "u4"),
+    ("ask_ct_00", "u4"),
+])
+
+OHLCV_DTYPE = np.dtype(_RECORD_HEADER + [
+    ("open", "i8"),
+    ("high", "i8"),
+    ("low", "i8"),
+    ("close", "i8"),
+    ("volume", "u8"),
+])
+
+# rtype -> record layout; other rtypes (symbol mappings, system messages,
+# definitions, ...) are skipped and counted
+RTYPE_DTYPES: Dict[int, np.dtype] = {
+    0x00: TRADE_DTYPE,   # MBP-0 (trades)
+    0x01: MBP1_DTYPE,
+    0xA0: MBO_DTYPE,
+    0x20: OHLCV_DTYPE,   # 1s
+    0x21: OHLCV_DTYPE,   # 1m
+    0x22: OHLCV_DTYPE,   # 1h
+    0x23: OHLCV_DTYPE,   # 1d
+    0x24: OHLCV_DTYPE,   # End of day
+}
+
+# Schema name -> rtype of its records, for typing empty results
+SCHEMA_RTYPES = {
+    "trades": 0x00,
+    "mbp-1": 0x01,
+    "tbbo": 0x01,
+    "mbo": 0xA0,
+    "ohlcv-1s": 0x20,
+    "ohlcv-1m": 0x21,
+    "ohlcv-1h": 0x22,
+    "ohlcv-1d": 0x23,
+}
+
+_PROBE_RECORDS = 64  # First stride window checked when looking for a run
+
+
+def to_price(values: np.ndarray) -> np.ndarray:
+    """Fixed-point DBN prices as floats, with undefined prices as NaN."""
+    return np.where(values == UNDEF_PRICE, np.nan, values * PRICE_SCALE)
+
+
+def to_record_batch(records: np.ndarray) -> "pa.RecordBatch":
+    """Arrow record batch of a structured batch; copies each field once."""
+    return pa.RecordBatch.from_arrays(
+        [pa.array(np.ascontiguousarray(records[name])) for name in records.dtype.names],
+        names=list(records.dtype.names)
+    )
+
+
+class _Prepended:
+    """File object that first returns bytes already read from ``raw``."""
+    
+    def __init__(self, head: bytes, raw: BinaryIO):
+        self._head = head
+        self._raw = raw
+    
+    def read(self, size: int = -1) -> bytes:
+        if not self._head:
+            return self._raw.read(size)
+        if size < 0:
+            data, self._head = self._head + self._raw.read(), b""
+            return data
+        data, self._head = self._head[:size], self._head[size:]
+        if len(data) < size:
+            data += self._raw.read(size - len(data))
+        return data
+    
+    def readinto(self, target: Any) -> int:
+        data = self.read(len(target))
+        target[:len(data)] = data
+        return len(data)
+
+
+class DBNReader:
+    """Streaming reader of DBN data as structured NumPy batches.
+    
+    ``source`` is a file path, a bytes object or a binary file object, either
+    uncompressed or Zstandard-compressed. Iterating yields one structured
+    array per run of same-type records, at most ``batch_size`` records each.
+    """
+    
+    def __init__(self, source: Union[str, Path, bytes, BinaryIO], batch_size: int = DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._mapped: Optional[np.ndarray] = None
+        self._stream: Optional[BinaryIO] = None
+        self._owned: Optional[BinaryIO] = None
+        self._dtypes: Dict[Tuple[int, int], Optional[np.dtype]] = {}
+        
+        self.stats = {
+            "records": 0,
+            "batches": 0,
+            "bytes": 0,
+            "skipped_records": 0,
+            "truncated_bytes": 0
+        }
+        
+        if isinstance(source, (str, Path)):
+            with open(source, "rb") as f:
+                compressed = f.read(4) == ZSTD_MAGIC
+            if compressed:
+                self._owned = open(source, "rb")
+                self._stream = self._decompress(self._owned)
+            elif Path(source).stat().st_size > 0:
+                self._mapped = np.memmap(source, dtype=np.uint8, mode="r")
+            else:
+                self._mapped = np.zeros(0, dtype=np.uint8)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            if bytes(source[:4]) == ZSTD_MAGIC:
+                self._stream = self._decompress(BytesIO(source))
+            else:
+                self._mapped = np.frombuffer(source, dtype=np.uint8)
+        else:
+            head = source.read(4)
+            self._owned = source
+            remainder = _Prepended(head, source)
+            self._stream = self._decompress(remainder) if head == ZSTD_MAGIC else remainder
+        
+        self._offset = 0
+        self.version, self.metadata = self._read_metadata()
+    
+    @staticmethod
+    def _decompress(raw: BinaryIO) -> BinaryIO:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read compressed DBN")
+        return zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+    
+    def _read_exact(self, count: int) -> bytes:
+        if self._mapped is not None:
+            data = self._mapped[self._offset:self._offset + count].tobytes()
+            self._offset += len(data)
+        else:
+            data = b""
+            while len(data) < count:
+                chunk = self._stream.read(count - len(data))
+                if not chunk:
+                    break
+                data += chunk
+        if len(data) < count:
+            raise ValueError("Truncated DBN header")
+        return data
+    
+    def _read_metadata(self) -> Tuple[int, Any]:
+        prefix = self._read_exact(8)
+        if prefix[:3] != DBN_MAGIC:
+            raise ValueError("Not DBN data")
+        length = struct.unpack("<I", prefix[4:8])[0]
+        encoded = prefix + self._read_exact(length)
+        metadata = dbn.Metadata.decode(encoded) if dbn is not None else None
+        return prefix[3], metadata
+    
+    @property
+    def schema(self) -> Optional[str]:
+        schema = getattr(self.metadata, "schema", None)
+        return str(schema) if schema is not None else None
+    
+    @property
+    def mappings(self) -> Dict[str, List[Dict[str, Any]]]:
+        return getattr(self.metadata, "mappings", None) or {}
+    
+    def _dtype(self, rtype: int, size: int) -> Optional[np.dtype]:
+        """Layout for a record type and size; None if it is not decoded."""
+        key = (rtype, size)
+        if key not in self._dtypes:
+            dtype = RTYPE_DTYPES.get(rtype)
+            if dtype is not None and size == dtype.itemsize + 8:
+                dtype = np.dtype(dtype.descr + [("ts_out", "u8")])  # Sent with ts_out
+            elif dtype is not None and size != dtype.itemsize:
+                logger.warning(f"Unexpected size {size} for rtype {rtype:#04x}, skipping")
+                dtype = None
+            self._dtypes[key] = dtype
+        return self._dtypes[key]
+    
+    def _run_length(self, raw: np.ndarray, size: int) -> int:
+        """Records at the start of ``raw`` sharing the first record's length and rtype."""
+        available = len(raw) // size
+        checked = 0
+        window = _PROBE_RECORDS
+        while checked < available:
+            stop = min(available, checked + window)
+            lengths = raw[checked * size:stop * size:size]
+            rtypes = raw[checked * size + 1:stop * size:size]
+            mismatch = np.flatnonzero((lengths != raw[0]) | (rtypes != raw[1]))
+            if len(mismatch):
+                return checked + int(mismatch[0])
+            checked = stop
+            window *= 2
+        return available
+    
+    def _split(self, raw: np.ndarray) -> Tuple[List[np.ndarray], int]:
+        """Structured views of the complete records in ``raw`` and bytes consumed."""
+        batches = []
+        consumed = 0
+        while len(raw) - consumed >= 2:
+            size = int(raw[consumed]) * 4
+            if size == 0:
+                raise ValueError(f"Corrupt DBN record at byte {consumed}")
+            count = self._run_length(raw[consumed:], size)
+            if count == 0:
+                break  # Partial record at the end
+            
+            end = consumed + count * size
+            dtype = self._dtype(int(raw[consumed + 1]), size)
+            if dtype is None:
+                self.stats["skipped_records"] += count
+            else:
+                batches.append(raw[consumed:end].view(dtype))
+                self.stats["records"] += count
+            consumed = end
+        return batches, consumed
+    
+    def _mapped_batches(self) -> Iterator[np.ndarray]:
+        data = self._mapped
+        while len(data) - self._offset >= 2:
+            size = int(data[self._offset]) * 4
+            region = data[self._offset:self._offset + self.batch_size * size]
+            batches, consumed = self._split(region)
+            if consumed == 0:
+                break
+            self._offset += consumed
+            self.stats["bytes"] += consumed
+            yield from batches
+        self.stats["truncated_bytes"] += len(data) - self._offset
+    
+    def _stream_batches(self) -> Iterator[np.ndarray]:
+        buffer = np.empty(self.batch_size * MBP1_DTYPE.itemsize, dtype=np.uint8)
+        filled = 0
+        while True:
+            if filled == len(buffer):
+                # A record larger than the buffer: grow it (only between batches)
+                buffer = np.concatenate([buffer, np.empty_like(buffer)])
+            read = self._stream.readinto(memoryview(buffer)[filled:])
+            filled += read or 0
+            batches, consumed = self._split(buffer[:filled])
+            self.stats["bytes"] += consumed
+            yield from batches
+            if not read:
+                self.stats["truncated_bytes"] += filled - consumed
+                return
+            buffer[:filled - consumed] = buffer[consumed:filled]
+            filled -= consumed
+    
+    def __iter__(self) -> Iterator[np.ndarray]:
+        batches = self._mapped_batches() if self._mapped is not None else self._stream_batches()
+        for batch in batches:
+            self.stats["batches"] += 1
+            yield batch
+    
+    def read_all(self) -> np.ndarray:
+        """All decoded records of the (single) record type as one array."""
+        batches = [batch.copy() if self._mapped is None else batch for batch in self]
+        if not batches:
+            dtype = RTYPE_DTYPES.get(SCHEMA_RTYPES.get(self.schema), MBP1_DTYPE)
+            return np.zeros(0, dtype=dtype)
+        if len({batch.dtype for batch in batches}) > 1:
+            raise ValueError("DBN data mixes record types; iterate batches instead")
+        return batches[0] if len(batches) == 1 else np.concatenate(batches)
+    
+    def close(self) -> None:
+        if self._owned is not None:
+            self._owned.close()
+        self._mapped = None
+    
+    def __enter__(self) -> "DBNReader":
+        return self
+    
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {"schema": self.schema, "version": self.version, **self.stats}
@@ -0,0 +1,446 @@
+"""
+Lean Feature Store for Smart-0DTE-System
+Streaming per-symbol model features with O(1) updates per tick.
+
+Every configured symbol (the supported tickers and VIX) owns one row of a
+preallocated feature matrix and a slot in ring buffers of one-minute closes
+and returns; ticks for other symbols are dropped. All symbols share one minute clock:
+a tick that starts a new minute closes the previous one for every symbol
+(carrying the last price forward when a symbol did not trade), so minute
+returns line up across symbols. Window statistics are updated by adding the
+newest minute and evicting the oldest instead of being recomputed:
+
+- price_change_1m/5m/15m: latest price against the close 1, 5 and 15 minutes back
+- volume_ratio: last minute's volume over its EWMA
+- volatility_1h: standard deviation of the last ``FEATURE_VOLATILITY_WINDOW``
+  minute returns (sliding Welford)
+- volatility_ewma: square root of an EWMA of squared minute returns
+  (``FEATURE_EWMA_LAMBDA``, RiskMetrics style)
+- correlation_spy_qqq/spy_iwm: correlation of minute returns over
+  ``FEATURE_CORRELATION_WINDOW`` minutes from sliding sums
+- vix_level/vix_change: last VIX print and its change over ``FEATURE_VIX_DELTA_MINUTES``
+- time_to_close (hours to 16:00 ET), market_regime (from VIX), momentum_score
+
+Reading a symbol's features returns a view of its row. Sums are recomputed
+from the rings each time the ring wraps, so rounding does not accumulate, and
+a gap longer than the ring (overnight) restarts the windows.
+"""
+
+import logging
+import math
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pytz
+
+from app.core.lean_config import lean_config, ai_optimization
+from app.core.lean_live_feed import PRICE_SCALE, UNDEF_PRICE
+
+try:
+    import databento as db
+except ImportError:
+    db = None
+
+logger = logging.getLogger(__name__)
+
+FEATURES = (
+    'price_change_1m', 'price_change_5m', 'price_change_15m',
+    'volume_ratio', 'volatility_1h', 'correlation_spy_qqq',
+    'correlation_spy_iwm', 'vix_level', 'vix_change',
+    'time_to_close', 'market_regime', 'momentum_score',
+    'volatility_ewma'
+)
+COLUMNS = {name: index for index, name in enumerate(FEATURES)}
+
+VIX_SYMBOL = "VIX"
+CORRELATION_PAIRS = (("SPY", "QQQ", "correlation_spy_qqq"), ("SPY", "IWM", "correlation_spy_iwm"))
+RETURN_LAGS = ((1, COLUMNS['price_change_1m']), (5, COLUMNS['price_change_5m']), (15, COLUMNS['price_change_15m']))
+# Columns describing the whole market, written to every row at once
+SHARED_COLUMNS = [COLUMNS[name] for name in (
+    'correlation_spy_qqq', 'correlation_spy_iwm', 'vix_level', 'vix_change', 'time_to_close', 'market_regime'
+)]
+
+_NS_PER_MINUTE = 60_000_000_000
+_EASTERN = pytz.timezone("America/New_York")
+
+
+def hours_to_close(timestamp: Any) -> float:
+    """Hours from ``timestamp`` (ns since the epoch or datetime, naive = UTC) to 16:00 ET, 0 after the close."""
+    moment = datetime.fromtimestamp(_to_ns(timestamp) / 1_000_000_000, _EASTERN)
+    market_close = moment.replace(hour=16, minute=0, second=0, microsecond=0)
+    return max(0.0, (market_close - moment).total_seconds() / 3600)
+
+
+def _to_ns(timestamp: Any) -> int:
+    """Nanoseconds since the epoch; naive datetimes are UTC."""
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return int(timestamp.timestamp() * 1_000_000_000)
+    return int(timestamp)
+
+
+class RollingFeatureStore:
+    """Incrementally maintained features for a set of symbols."""
+    
+    def __init__(self, symbols: Optional[Sequence[str]] = None):
+        self.volatility_window = ai_optimization.FEATURE_VOLATILITY_WINDOW
+        self.correlation_window = ai_optimization.FEATURE_CORRELATION_WINDOW
+        self.vix_delta_minutes = ai_optimization.FEATURE_VIX_DELTA_MINUTES
+        self.ewma_lambda = ai_optimization.FEATURE_EWMA_LAMBDA
+        self.volume_alpha = ai_optimization.FEATURE_VOLUME_EWMA_ALPHA
+        # One slot more than the longest lookback, so the evicted value is still there
+        self.capacity = max(self.volatility_window, self.correlation_window,
+                            self.vix_delta_minutes, RETURN_LAGS[-1][0]) + 1
+        
+        self.index: Dict[str, int] = {}
+        self.features = np.zeros((0, len(FEATURES)))
+        self.closes = np.zeros((0, self.capacity))
+        self.returns = np.zeros((0, self.capacity))
+        # Per-tick state stays in Python lists: scalar access to NumPy arrays costs more
+        self.last_price: List[float] = []
+        self.last_ts: List[int] = []
+        self.minute_volume: List[float] = []
+        self._lag_closes: List[tuple] = []  # Closes the tick path compares against, per symbol
+        self.volume_ewma = np.zeros(0)
+        self.ewma_variance = np.zeros(0)
+        # Sliding Welford state of the minute returns in the volatility window
+        self.count = np.zeros(0)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+        # Sliding sums per correlation pair: n, sx, sy, sxx, syy, sxy
+        self.pair_sums = np.zeros((len(CORRELATION_PAIRS), 6))
+        
+        self._lags = [lag for lag, _ in RETURN_LAGS] + [self.vix_delta_minutes]
+        self.minute = -1  # Minute (since the epoch) currently open
+        self.pos = 0  # Ring slot of the last closed minute
+        self.instruments = None  # Symbol lookup of an attached feed
+        self._lock = threading.Lock()
+        self.stats = {
+            "ticks": 0, "late_ticks": 0, "duplicate_ticks": 0, "unknown_symbol_ticks": 0,
+            "minutes_closed": 0, "resets": 0
+        }
+        
+        # Only configured symbols get a row; anything else (option contracts, typos) is rejected
+        for symbol in dict.fromkeys([*(symbols or lean_config.SUPPORTED_TICKERS), VIX_SYMBOL]):
+            self._add_row(symbol)
+    
+    def _add_row(self, symbol: str) -> None:
+        """Add a row for ``symbol``, growing every array."""
+        index = self.index[symbol] = len(self.index)
+        row = np.zeros((1, len(FEATURES)))
+        row[0, COLUMNS['volume_ratio']] = 1.0
+        if index:
+            row[0, SHARED_COLUMNS] = self.features[0, SHARED_COLUMNS]
+        else:
+            row[0, COLUMNS['vix_level']] = np.nan  # Unknown until the first VIX print
+        self.features = np.concatenate((self.features, row))
+        self.closes = np.concatenate((self.closes, np.full((1, self.capacity), np.nan)))
+        self.returns = np.concatenate((self.returns, np.full((1, self.capacity), np.nan)))
+        self.last_price.append(math.nan)
+        self.last_ts.append(-1)
+        self.minute_volume.append(0.0)
+        self._lag_closes.append((math.nan,) * len(self._lags))
+        for name in ("volume_ewma", "ewma_variance", "count", "mean", "m2"):
+            setattr(self, name, np.append(getattr(self, name), 0.0))
+    
+    def update(self, symbol: str, timestamp: Any, price: float, volume: float = 0.0) -> None:
+        """Apply one trade or price snapshot."""
+        ts = _to_ns(timestamp)
+        with self._lock:
+            index = self.index.get(symbol)
+            if index is None:
+                self.stats["unknown_symbol_ticks"] += 1
+                return
+            if ts <= self.last_ts[index]:
+                # Already applied, e.g. the polling path re-reading the live feed's last trade
+                self.stats["duplicate_ticks"] += 1
+                return
+            self.last_ts[index] = ts
+            
+            minute = ts // _NS_PER_MINUTE
+            if minute > self.minute:
+                self._advance(minute)
+            elif minute < self.minute:
+                self.stats["late_ticks"] += 1
+            
+            self.stats["ticks"] += 1
+            self.last_price[index] = price
+            self.minute_volume[index] += volume
+            
+            row = self.features[index]
+            closes = self._lag_closes[index]
+            momentum = 0.0
+            for (_, column), close in zip(RETURN_LAGS, closes):
+                change = price / close - 1 if close > 0 else 0.0
+                row[column] = change
+                momentum += change
+            row[COLUMNS['momentum_score']] = momentum
+            
+            if symbol == VIX_SYMBOL:
+                self._update_vix(price, closes[-1])
+    
+    def attach(self, pipeline: Any) -> None:
+        """Update from a feed's trades (trade and TBBO records) as they arrive."""
+        self.instruments = pipeline.instruments
+        if db is None:
+            logger.warning("databento is not installed, feature store not attached")
+            return
+        pipeline.add_listener(db.TradeMsg, self.on_trade)
+        pipeline.add_listener(db.MBP1Msg, self.on_trade)
+    
+    def on_trade(self, record: Any) -> None:
+        # MBP-1 records are only trades when the action is "T" (TBBO)
+        if getattr(record, "action", "T") != "T" or record.price == UNDEF_PRICE:
+            return
+        symbol = self.instruments.symbol(record.instrument_id)
+        if symbol is not None:
+            self.update(symbol, record.ts_event, record.price * PRICE_SCALE, record.size)
+    
+    def replay(self, ticks: Dict[str, Dict[str, np.ndarray]]) -> int:
+        """Apply ticks of several symbols (``timestamp``, ``price``, optional ``volume``
+        columns) in timestamp order; used to warm up from stored history.
+        """
+        parts = [
+            (np.full(len(columns["timestamp"]), symbol, dtype=object),
+             _timestamps_ns(columns["timestamp"]), np.asarray(columns["price"], dtype=np.float64),
+             np.asarray(columns.get("volume", np.zeros(len(columns["timestamp"]))), dtype=np.float64))
+            for symbol, columns in ticks.items() if len(columns["timestamp"])
+        ]
+        if not parts:
+            return 0
+        
+        symbols, ts, prices, volumes = (np.concatenate(column) for column in zip(*parts))
+        order = np.argsort(ts, kind="stable")
+        valid = np.isfinite(prices[order]) & (prices[order] > 0)
+        for i in order[valid]:
+            self.update(symbols[i], int(ts[i]), float(prices[i]), float(volumes[i]))
+        return int(valid.sum())
+    
+    def warm_up(self, store: Any, kind: str, symbols: Iterable[str], minutes: Optional[int] = None) -> int:
+        """Replay the last ``minutes`` of a tick store so windows start full."""
+        end = datetime.utcnow()
+        start = end - timedelta(minutes=minutes or self.capacity + 15)
+        ticks = {}
+        for symbol in symbols:
+            try:
+                ticks[symbol] = store.read(kind, symbol, start, end, columns=["price", "volume"])
+            except Exception as e:
+                logger.debug(f"No stored ticks to warm up {symbol}: {e}")
+        replayed = self.replay(ticks)
+        logger.info(f"Warmed up feature store with {replayed} ticks")
+        return replayed
+    
+    def _update_vix(self, price: float, close: float) -> None:
+        self.features[:, COLUMNS['vix_level']] = price
+        self.features[:, COLUMNS['vix_change']] = price - close if close > 0 else 0.0
+        self.features[:, COLUMNS['market_regime']] = 0 if price < 15 else (1 if price < 25 else 2)
+    
+    def _advance(self, minute: int) -> None:
+        """Close every minute from the open one up to ``minute``."""
+        if self.minute >= 0 and minute - self.minute <= self.capacity:
+            for closed in range(self.minute, minute):
+                self._close_minute(closed)
+        elif self.minute >= 0:
+            # Longer gap than the ring covers: start the windows over
+            self._reset_windows()
+        self.minute = minute
+    
+    def _close_minute(self, minute: int) -> None:
+        """Roll the rings one minute and update the window statistics, vectorized over symbols."""
+        last_price = np.array(self.last_price)
+        minute_volume = np.array(self.minute_volume)
+        previous = self.closes[:, self.pos]
+        self.pos = (self.pos + 1) % self.capacity
+        self.closes[:, self.pos] = last_price
+        self._refresh_lag_closes()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            minute_return = np.where(previous > 0, last_price / previous - 1, np.nan)
+        
+        # Volatility window: evict the return leaving it, add the new one
+        leaving = self.returns[:, (self.pos - self.volatility_window) % self.capacity]
+        corr_leaving = self.returns[:, (self.pos - self.correlation_window) % self.capacity].copy()
+        self.returns[:, self.pos] = minute_return
+        self._welford_remove(leaving)
+        self._welford_add(minute_return)
+        
+        added = np.isfinite(minute_return)
+        squared = np.where(added, minute_return, 0.0) ** 2
+        ewma = self.ewma_lambda * self.ewma_variance + (1 - self.ewma_lambda) * squared
+        self.ewma_variance = np.where(added, np.where(self.ewma_variance > 0, ewma, squared), self.ewma_variance)
+        
+        volume_ratio = np.where(self.volume_ewma > 0, minute_volume / np.maximum(self.volume_ewma, 1e-12), 1.0)
+        self.volume_ewma = np.where(self.volume_ewma > 0,
+                                    self.volume_ewma + self.volume_alpha * (minute_volume - self.volume_ewma),
+                                    minute_volume)
+        self.minute_volume = [0.0] * len(self.minute_volume)
+        
+        if self.pos == 0:
+            self._recompute_windows()
+        else:
+            self._update_pairs(minute_return, corr_leaving)
+        
+        features = self.features
+        features[:, COLUMNS['volume_ratio']] = volume_ratio
+        features[:, COLUMNS['volatility_1h']] = np.sqrt(np.where(self.count > 1, self.m2 / np.maximum(self.count - 1, 1), 0.0))
+        features[:, COLUMNS['volatility_ewma']] = np.sqrt(self.ewma_variance)
+        for (_, _, name), correlation in zip(CORRELATION_PAIRS, self._correlations()):
+            features[:, COLUMNS[name]] = correlation
+        
+        features[:, COLUMNS['time_to_close']] = hours_to_close((minute + 1) * _NS_PER_MINUTE)
+        self.stats["minutes_closed"] += 1
+    
+    def _refresh_lag_closes(self) -> None:
+        slots = [(self.pos - lag + 1) % self.capacity for lag in self._lags]
+        self._lag_closes = [tuple(row) for row in self.closes[:, slots].tolist()]
+    
+    def _welford_add(self, values: np.ndarray) -> None:
+        valid = np.isfinite(values)
+        x = np.where(valid, values, 0.0)
+        count = self.count + valid
+        delta = x - self.mean
+        mean = np.where(valid, self.mean + delta / np.maximum(count, 1), self.mean)
+        self.m2 = np.where(valid, self.m2 + delta * (x - mean), self.m2)
+        self.mean, self.count = mean, count
+    
+    def _welford_remove(self, values: np.ndarray) -> None:
+        valid = np.isfinite(values) & (self.count > 0)
+        x = np.where(valid, values, 0.0)
+        count = self.count - valid
+        mean = np.where(valid & (count > 0), (self.count * self.mean - x) / np.maximum(count, 1),
+                        np.where(count > 0, self.mean, 0.0))
+        m2 = np.where(valid, self.m2 - (x - self.mean) * (x - mean), self.m2)
+        self.m2 = np.where(count > 1, np.maximum(m2, 0.0), 0.0)
+        self.mean, self.count = mean, count
+    
+    def _pair_rows(self) -> List[Optional[tuple]]:
+        return [
+            (self.index[a], self.index[b]) if a in self.index and b in self.index else None
+            for a, b, _ in CORRELATION_PAIRS
+        ]
+    
+    def _update_pairs(self, added: np.ndarray, leaving: np.ndarray) -> None:
+        for sums, rows in zip(self.pair_sums, self._pair_rows()):
+            if rows is None:
+                continue
+            for values, sign in ((leaving, -1.0), (added, 1.0)):
+                x, y = values[rows[0]], values[rows[1]]
+                if math.isfinite(x) and math.isfinite(y):
+                    sums += sign * np.array((1.0, x, y, x * x, y * y, x * y))
+    
+    def _correlations(self) -> List[float]:
+        correlations = []
+        for n, sx, sy, sxx, syy, sxy in self.pair_sums:
+            cov = sxy - sx * sy / n if n > 2 else 0.0
+            var_x = sxx - sx * sx / n if n > 2 else 0.0
+            var_y = syy - sy * sy / n if n > 2 else 0.0
+            correlations.append(float(np.clip(cov / math.sqrt(var_x * var_y), -1.0, 1.0)) if var_x > 0 and var_y > 0 else 0.0)
+        return correlations
+    
+    def _window(self, length: int) -> np.ndarray:
+        """Returns of the last ``length`` minutes, oldest first."""
+        slots = (self.pos - np.arange(length - 1, -1, -1)) % self.capacity
+        return self.returns[:, slots]
+    
+    def _recompute_windows(self) -> None:
+        """Exact window statistics from the rings."""
+        window = self._window(self.volatility_window)
+        valid = np.isfinite(window)
+        self.count = valid.sum(axis=1).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean = np.where(self.count > 0, np.nansum(window, axis=1) / np.maximum(self.count, 1), 0.0)
+            self.m2 = np.where(self.count > 0, np.nansum((window - self.mean[:, None]) ** 2, axis=1), 0.0)
+        
+        window = self._window(self.correlation_window)
+        for sums, rows in zip(self.pair_sums, self._pair_rows()):
+            sums[:] = 0.0
+            if rows is None:
+                continue
+            x, y = window[rows[0]], window[rows[1]]
+            both = np.isfinite(x) & np.isfinite(y)
+            x, y = x[both], y[both]
+            sums[:] = (len(x), x.sum(), y.sum(), (x * x).sum(), (y * y).sum(), (x * y).sum())
+    
+    def _reset_windows(self) -> None:
+        self.closes[:] = np.nan
+        self.returns[:] = np.nan
+        self.count[:] = 0.0
+        self.mean[:] = 0.0
+        self.m2[:] = 0.0
+        self.ewma_variance[:] = 0.0
+        self.minute_volume = [0.0] * len(self.minute_volume)
+        self.pair_sums[:] = 0.0
+        self._refresh_lag_closes()
+        self.stats["resets"] += 1
+    
+    def vector(self, symbol: str) -> np.ndarray:
+        """Features of one configured symbol in ``FEATURES`` order (a view, not a copy)."""
+        with self._lock:
+            return self.features[self.index[symbol]]
+    
+    def revision(self, symbol: Optional[str] = None) -> tuple:
+        """State ``matrix`` rows depend on besides the prices passed to it: the
+        closed minutes and the last VIX print, plus ``symbol``'s last price
+        for rows read without one. Cheap enough to key caches on.
+        """
+        state = (self.minute, self.stats["minutes_closed"], self.last_price[self.index[VIX_SYMBOL]])
+        if symbol is None:
+            return state
+        index = self.index.get(symbol)
+        return (*state, self.last_price[index] if index is not None else None)
+    
+    def matrix(
+        self,
+        symbols: Sequence[str],
+        columns: Optional[Sequence[int]] = None,
+        prices: Optional[Sequence[float]] = None
+    ) -> np.ndarray:
+        """(len(symbols), F) features, one gather for the whole batch.
+        
+        Symbols that are not configured get only the market-wide columns.
+        With ``prices``, the price changes and momentum of each row are taken
+        against that price instead of the last tick (NaN keeps the stored value).
+        """
+        with self._lock:
+            rows = np.fromiter((self.index.get(symbol, -1) for symbol in symbols), dtype=np.intp, count=len(symbols))
+            known = rows >= 0
+            matrix = self.features[np.where(known, rows, 0)]
+            if not known.all():
+                matrix[~known] = 0.0
+                matrix[~known, COLUMNS['volume_ratio']] = 1.0
+                matrix[np.ix_(~known, SHARED_COLUMNS)] = self.features[0, SHARED_COLUMNS]
+            
+            if prices is not None:
+                prices = np.asarray(prices, dtype=np.float64)
+                repriced = np.flatnonzero(known & np.isfinite(prices) & (prices > 0))
+                if len(repriced):
+                    closes = np.array(self._lag_closes)[rows[repriced], :len(RETURN_LAGS)]
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        changes = np.where(closes > 0, prices[repriced, None] / closes - 1, 0.0)
+                    matrix[np.ix_(repriced, [column for _, column in RETURN_LAGS])] = changes
+                    matrix[repriced, COLUMNS['momentum_score']] = changes.sum(axis=1)
+        
+        return matrix if columns is None else matrix[:, np.asarray(columns, dtype=np.intp)]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "symbols": len(self.index),
+            "ring_minutes": self.capacity,
+            "open_minute": datetime.fromtimestamp(self.minute * 60, timezone.utc).isoformat() if self.minute >= 0 else None
+        }
+
+
+def _timestamps_ns(values: Any) -> np.ndarray:
+    values = np.asarray(values)
+    if values.dtype.kind == "M":
+        return values.astype("datetime64[ns]").astype(np.int64)
+    if values.dtype == object:
+        return np.array([_to_ns(value) for value in values], dtype=np.int64)
+    return values.astype(np.int64)
+
+
+# Global feature store fed by the market data service and read by the AI service
+feature_store = RollingFeatureStore()
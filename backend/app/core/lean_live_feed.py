@@ -0,0 +1,570 @@
+"""
+Lean Live Feed for Smart-0DTE-System
+Push-based Databento pipeline decoding DBN records into per-instrument ring buffers.
+
+Records arrive on the Databento client thread (live) or from a local DBN file
+(replay) and go through the same ``LiveFeedPipeline.on_record`` callback. Each
+instrument owns a preallocated structured NumPy ring buffer, so the hot path
+is one dtype conversion and one row assignment per record with no allocation.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.lean_config import lean_config, data_optimization
+
+try:
+    import databento as db
+except ImportError:
+    db = None
+
+logger = logging.getLogger(__name__)
+
+PRICE_SCALE = 1e-9  # DBN prices are fixed-point integers in units of 1e-9
+UNDEF_PRICE = 2 ** 63 - 1
+
+# Record kinds stored in the ring buffers
+KIND_REJECTED = 0  # Row failed the data quality check; readers skip it
+KIND_TRADE = 1
+KIND_QUOTE = 2
+KIND_BAR = 3
+
+TICK_DTYPE = np.dtype([
+    ("ts_event", "i8"),   # Exchange timestamp, ns since epoch
+    ("ts_recv", "i8"),    # Capture timestamp, ns since epoch
+    ("kind", "u1"),
+    ("price", "f8"),      # Trade price, or close for bars
+    ("size", "u8"),       # Trade size, or volume for bars
+    ("bid_px", "f8"),
+    ("ask_px", "f8"),
+    ("bid_sz", "u4"),
+    ("ask_sz", "u4"),
+])
+
+
+def _price(value: int) -> float:
+    return np.nan if value == UNDEF_PRICE else value * PRICE_SCALE
+
+
+class TickRingBuffer:
+    """Fixed-capacity ring of TICK_DTYPE rows for one instrument.
+    
+    Written by the feed thread and read from the event loop; the lock only
+    guards the write index, and reads return copies.
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.rows = np.zeros(capacity, dtype=TICK_DTYPE)
+        self.count = 0  # Rows ever appended
+        self.checked = 0  # Rows ever appended that have been quality checked
+        self._lock = threading.Lock()
+    
+    def append(self, row: Tuple) -> None:
+        with self._lock:
+            self.rows[self.count % self.capacity] = row
+            self.count += 1
+    
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+    
+    @property
+    def overwritten(self) -> int:
+        return max(0, self.count - self.capacity)
+    
+    def unchecked(self) -> Tuple[int, np.ndarray]:
+        """Copy of the rows appended since the last ``mark_checked`` that are
+        still buffered, with the append index of the first one.
+        """
+        with self._lock:
+            first = max(self.checked, self.count - self.capacity)
+            return first, self.rows[np.arange(first, self.count) % self.capacity]
+    
+    def mark_checked(self, first: int, rejected: np.ndarray, stale_quote: np.ndarray) -> None:
+        """Flag rejected rows and drop stale quotes of rows returned by ``unchecked``;
+        rows overwritten in the meantime are skipped.
+        """
+        with self._lock:
+            end = first + len(rejected)
+            live = max(first, self.count - self.capacity) - first
+            positions = (np.arange(first, end) % self.capacity)[live:]
+            self.rows["kind"][positions[rejected[live:]]] = KIND_REJECTED
+            stale = positions[stale_quote[live:]]
+            self.rows["bid_px"][stale] = np.nan
+            self.rows["ask_px"][stale] = np.nan
+            self.checked = max(self.checked, end)
+    
+    def latest(self, n: Optional[int] = None) -> np.ndarray:
+        """Copy of the newest ``n`` rows (all buffered rows by default), oldest first."""
+        with self._lock:
+            size = len(self)
+            n = size if n is None else min(n, size)
+            end = self.count % self.capacity
+            start = end - n
+            if start >= 0:
+                return self.rows[start:end].copy()
+            return np.concatenate((self.rows[start:], self.rows[:end]))
+
+
+class InstrumentRegistry:
+    """Two-way mapping between symbols and Databento instrument ids."""
+    
+    def __init__(self):
+        self.symbols_by_id: Dict[int, str] = {}
+        self.ids_by_symbol: Dict[str, int] = {}
+    
+    def add(self, instrument_id: int, symbol: str) -> None:
+        self.symbols_by_id[instrument_id] = symbol
+        self.ids_by_symbol[symbol] = instrument_id
+    
+    def add_mappings(self, mappings: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Load a DBN metadata mapping (raw symbol -> instrument id intervals)."""
+        for symbol, intervals in mappings.items():
+            for interval in intervals:
+                self.add(int(interval["symbol"]), symbol)
+    
+    def symbol(self, instrument_id: int) -> Optional[str]:
+        return self.symbols_by_id.get(instrument_id)
+    
+    def instrument_id(self, symbol: str) -> Optional[int]:
+        return self.ids_by_symbol.get(symbol)
+
+
+class ReplayWindow:
+    """Drops the records a replaying reconnect sends twice.
+    
+    Each stream remembers the last capture timestamp it saw and how many
+    records carried it. ``begin`` turns those into a boundary; until a stream
+    gets past its boundary, records captured before it, and the first
+    ``count`` captured exactly at it, are replays. Outside that window nothing
+    is dropped, so records sharing (ts_event, sequence), such as snapshot
+    records or the trade, fill and cancel of one match, all get through.
+    """
+    
+    def __init__(self):
+        self._last: Dict[Any, Tuple[int, int]] = {}  # stream -> (ts_recv, records at it)
+        self._boundaries: Dict[Any, Tuple[int, int]] = {}
+    
+    def begin(self) -> None:
+        """Open the window; call when a reconnect will replay from the last event."""
+        self._boundaries = dict(self._last)
+    
+    def is_replayed(self, stream: Any, ts_recv: int) -> bool:
+        if self._boundaries:
+            boundary = self._boundaries.get(stream)
+            if boundary is not None:
+                boundary_ts, remaining = boundary
+                if ts_recv < boundary_ts:
+                    return True
+                if ts_recv == boundary_ts and remaining > 0:
+                    self._boundaries[stream] = (boundary_ts, remaining - 1)
+                    return True
+                del self._boundaries[stream]
+        
+        last = self._last.get(stream)
+        if last is not None and last[0] == ts_recv:
+            self._last[stream] = (ts_recv, last[1] + 1)
+        else:
+            self._last[stream] = (ts_recv, 1)
+        return False
+
+
+class LiveFeedPipeline:
+    """Decode DBN records into ring buffers and track feed health.
+    
+    After a reconnect the gateway replays from the last event timestamp seen;
+    a ``ReplayWindow`` drops that overlap, which makes the replay safe without
+    dropping distinct records that share a (ts_event, sequence). Other consumers (e.g. an order book)
+    can subscribe to raw records with ``add_listener``.
+    
+    With a ``quality`` filter (lean_data_quality.DataQualityFilter), the ticks
+    that arrived since the last read of a symbol are checked as one batch
+    before ``snapshot`` uses them; rejected rows stay in the ring flagged as
+    KIND_REJECTED. Bars are not checked, since their ts_event is the bar open.
+    """
+    
+    def __init__(self, ring_capacity: Optional[int] = None, quality: Any = None):
+        self.ring_capacity = ring_capacity or data_optimization.LIVE_RING_BUFFER_SIZE
+        self.quality = quality
+        self.instruments = InstrumentRegistry()
+        self.rings: Dict[int, TickRingBuffer] = {}
+        self.listeners: Dict[type, List[Callable[[Any], None]]] = {}
+        # Replay windows of this pipeline's consumers, opened on every reconnect
+        self._replay = ReplayWindow()
+        self.replay_windows: List[ReplayWindow] = [self._replay]
+        
+        self.last_ts_event = 0
+        self.last_record_monotonic = time.monotonic()
+        self.gaps: List[Dict[str, Any]] = []
+        self.stats = {
+            "records": 0,
+            "trades": 0,
+            "quotes": 0,
+            "bars": 0,
+            "book_events": 0,
+            "duplicates": 0,
+            "unmapped": 0,
+            "heartbeats": 0,
+            "errors": 0,
+            "reconnects": 0
+        }
+        
+        self._handlers: Dict[type, Callable[[Any], None]] = {}
+        if db is not None:
+            self._handlers = {
+                db.TradeMsg: self._on_trade,
+                db.MBP1Msg: self._on_quote,  # Also TBBO
+                db.OHLCVMsg: self._on_bar,
+                db.MBOMsg: self._on_book_event,
+                db.SymbolMappingMsg: self._on_symbol_mapping,
+                db.SystemMsg: self._on_system,
+                db.ErrorMsg: self._on_error,
+            }
+    
+    def add_listener(self, record_type: type, callback: Callable[[Any], None]) -> None:
+        """Receive every record of ``record_type`` after it has been processed."""
+        self.listeners.setdefault(record_type, []).append(callback)
+    
+    def begin_replay(self) -> None:
+        """Called before reconnecting with a replay from the last event seen."""
+        self.stats["reconnects"] += 1
+        for window in self.replay_windows:
+            window.begin()
+    
+    def on_record(self, record: Any) -> None:
+        """Record callback shared by the live client and the file replayer."""
+        self.stats["records"] += 1
+        self.last_record_monotonic = time.monotonic()
+        
+        handler = self._handlers.get(type(record))
+        if handler is not None:
+            handler(record)
+        
+        for listener in self.listeners.get(type(record), ()):
+            listener(record)
+    
+    def _ring(self, record: Any) -> Optional[TickRingBuffer]:
+        """Ring for a market record, or None if it is a duplicate or unmapped."""
+        instrument_id = record.instrument_id
+        # OHLCV bars carry no capture timestamp; their ts_event is unique per stream
+        ts_recv = getattr(record, "ts_recv", record.ts_event)
+        
+        if self._replay.is_replayed((type(record), instrument_id), ts_recv):
+            self.stats["duplicates"] += 1
+            return None
+        self.last_ts_event = max(self.last_ts_event, record.ts_event)
+        
+        ring = self.rings.get(instrument_id)
+        if ring is None:
+            if instrument_id not in self.instruments.symbols_by_id:
+                self.stats["unmapped"] += 1
+            ring = self.rings[instrument_id] = TickRingBuffer(self.ring_capacity)
+        return ring
+    
+    def _on_trade(self, record: Any) -> None:
+        ring = self._ring(record)
+        if ring is None:
+            return
+        ring.append((
+            record.ts_event, record.ts_recv, KIND_TRADE,
+            _price(record.price), record.size, np.nan, np.nan, 0, 0
+        ))
+        self.stats["trades"] += 1
+    
+    def _on_quote(self, record: Any) -> None:
+        ring = self._ring(record)
+        if ring is None:
+            return
+        # TBBO records are trades carrying the book top just before the trade
+        is_trade = record.action == "T"
+        ring.append((
+            record.ts_event, record.ts_recv, KIND_TRADE if is_trade else KIND_QUOTE,
+            _price(record.price) if is_trade else np.nan, record.size if is_trade else 0,
+            _price(record.bid_px_00), _price(record.ask_px_00), record.bid_sz_00, record.ask_sz_00
+        ))
+        self.stats["trades" if is_trade else "quotes"] += 1
+    
+    def _on_bar(self, record: Any) -> None:
+        ring = self._ring(record)
+        if ring is None:
+            return
+        ring.append((
+            record.ts_event, record.ts_event, KIND_BAR,
+            _price(record.close), record.volume, np.nan, np.nan, 0, 0
+        ))
+        self.stats["bars"] += 1
+    
+    def _on_book_event(self, record: Any) -> None:
+        # Order-level events are consumed by listeners, not stored as ticks
+        self.last_ts_event = max(self.last_ts_event, record.ts_event)
+        self.stats["book_events"] += 1
+    
+    def _on_symbol_mapping(self, record: Any) -> None:
+        self.instruments.add(record.instrument_id, record.stype_in_symbol)
+    
+    def _on_system(self, record: Any) -> None:
+        if record.is_heartbeat():
+            self.stats["heartbeats"] += 1
+        else:
+            logger.info(f"Databento system message: {record.msg}")
+    
+    def _on_error(self, record: Any) -> None:
+        self.stats["errors"] += 1
+        logger.error(f"Databento gateway error: {record.err}")
+    
+    def record_gap(self, start_ns: int, end_ns: int, reason: str) -> None:
+        self.gaps = self.gaps[-99:] + [{
+            "start": datetime.utcfromtimestamp(start_ns / 1e9) if start_ns else None,
+            "end": datetime.utcfromtimestamp(end_ns / 1e9),
+            "reason": reason
+        }]
+    
+    def latest(self, symbol: str, n: Optional[int] = None) -> np.ndarray:
+        """Newest rows for a symbol, oldest first."""
+        instrument_id = self.instruments.instrument_id(symbol)
+        ring = self.rings.get(instrument_id) if instrument_id is not None else None
+        if ring is None:
+            return np.zeros(0, dtype=TICK_DTYPE)
+        return ring.latest(n)
+    
+    def check_quality(self, symbol: str) -> None:
+        """Run the quality filter over the symbol's ticks not checked yet."""
+        instrument_id = self.instruments.instrument_id(symbol)
+        ring = self.rings.get(instrument_id) if instrument_id is not None else None
+        if ring is None or self.quality is None:
+            return
+        
+        first, rows = ring.unchecked()
+        if len(rows) == 0:
+            return
+        ticks = rows["kind"] != KIND_BAR
+        accepted, stale_quote = self.quality.check(
+            symbol, rows["ts_event"][ticks], rows["price"][ticks], rows["bid_px"][ticks], rows["ask_px"][ticks]
+        )
+        rejected = np.zeros(len(rows), dtype=bool)
+        rejected[ticks] = ~accepted
+        stale = np.zeros(len(rows), dtype=bool)
+        stale[ticks] = stale_quote
+        ring.mark_checked(first, rejected, stale)
+    
+    def snapshot(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Market data dict for a symbol built from its buffered ticks."""
+        self.check_quality(symbol)
+        rows = self.latest(symbol)
+        if len(rows) == 0:
+            return None
+        
+        # Session statistics over today's buffered trades and bars
+        day_start = np.datetime64(datetime.utcnow().date(), "ns").astype(np.int64)
+        kind = rows["kind"]
+        priced = rows[((kind == KIND_TRADE) | (kind == KIND_BAR)) & (rows["ts_event"] >= day_start)]
+        quotes = rows[(kind != KIND_REJECTED) & ~np.isnan(rows["bid_px"])]
+        if len(priced) == 0:
+            return None
+        
+        prices = priced["price"]
+        last_price = float(prices[-1])
+        open_price = float(prices[0])
+        volume = int(priced["size"].sum())
+        precision = data_optimization.PRICE_PRECISION
+        
+        return {
+            'symbol': symbol,
+            'price': round(last_price, precision),
+            'volume': volume,
+            'timestamp': datetime.utcfromtimestamp(int(priced["ts_event"][-1]) / 1e9),
+            'change': round(last_price - open_price, 4),
+            'change_percent': round((last_price - open_price) / open_price * 100, 4) if open_price else 0,
+            'bid': round(float(quotes["bid_px"][-1]), precision) if len(quotes) else None,
+            'ask': round(float(quotes["ask_px"][-1]), precision) if len(quotes) else None,
+            'high': round(float(prices.max()), precision),
+            'low': round(float(prices.min()), precision),
+            'open': round(open_price, precision),
+            'vwap': round(float((prices * priced["size"]).sum() / volume), precision) if volume else None
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "instruments": len(self.rings),
+            "last_ts_event": datetime.utcfromtimestamp(self.last_ts_event / 1e9) if self.last_ts_event else None,
+            "seconds_since_last_record": round(time.monotonic() - self.last_record_monotonic, 3),
+            "overwritten_rows": sum(ring.overwritten for ring in self.rings.values()),
+            "recent_gaps": self.gaps[-10:]
+        }
+
+
+class DatabentoLiveSource:
+    """Databento Live subscription with stall detection and replaying reconnects.
+    
+    The gateway sends a heartbeat every ``heartbeat_interval`` seconds, so a
+    stream that is silent for ``stall_timeout`` seconds is considered dead.
+    On disconnect or stall the client is rebuilt and every subscription is
+    re-sent with ``start`` set to the last event timestamp seen, so the
+    gateway replays the gap; the pipeline drops the overlap.
+    """
+    
+    def __init__(
+        self,
+        pipeline: LiveFeedPipeline,
+        subscriptions: Sequence[Tuple[str, str, List[str]]],
+        key: Optional[str] = None,
+        meter: Any = None
+    ):
+        self.pipeline = pipeline
+        self.subscriptions = list(subscriptions)  # (dataset, schema, symbols)
+        self.key = key or lean_config.DATABENTO_API_KEY
+        # Usage meter (lean_metering.UsageMeter); records count under their subscribed schema
+        self.meter = meter
+        self._schemas = meter.rtype_schemas(schema for _, schema, _ in self.subscriptions) if meter else {}
+        self.heartbeat_interval = lean_config.DATABENTO_HEARTBEAT_INTERVAL
+        self.stall_timeout = lean_config.DATABENTO_STALL_TIMEOUT
+        
+        self.is_running = False
+        self.client = None
+    
+    def _connect(self, replay_from: Optional[int]) -> Any:
+        client = db.Live(key=self.key, heartbeat_interval_s=self.heartbeat_interval)
+        for dataset, schema, symbols in self.subscriptions:
+            client.subscribe(
+                dataset=dataset,
+                schema=schema,
+                symbols=symbols,
+                stype_in="raw_symbol",
+                start=replay_from
+            )
+            if self.meter:
+                self.meter.add("live", schema, requests=1)
+        client.add_callback(self._on_record if self.meter else self.pipeline.on_record, self._on_callback_error)
+        client.start()
+        return client
+    
+    def _on_record(self, record: Any) -> None:
+        self.meter.add("live", self._schemas.get(record.rtype, "control"), 1, record.record_size())
+        self.pipeline.on_record(record)
+    
+    def _on_callback_error(self, error: Exception) -> None:
+        self.pipeline.stats["errors"] += 1
+        logger.error(f"Live record callback failed: {error}")
+    
+    async def run(self) -> None:
+        """Stream until stopped, reconnecting with backoff."""
+        self.is_running = True
+        replay_from = None
+        backoff = 1.0
+        
+        while self.is_running:
+            reason = "closed"
+            try:
+                self.client = self._connect(replay_from)
+                self.pipeline.last_record_monotonic = time.monotonic()
+                logger.info(f"Databento live feed connected (replay from {replay_from})")
+                reason = await self._watch(self.client)
+                backoff = 1.0
+            except Exception as e:
+                reason = f"error: {e}"
+                logger.error(f"Databento live feed failed: {e}")
+            finally:
+                self._close_client()
+            
+            if not self.is_running:
+                break
+            
+            # Resume from the last event seen so the gateway replays the gap
+            replay_from = self.pipeline.last_ts_event or None
+            self.pipeline.begin_replay()
+            self.pipeline.record_gap(self.pipeline.last_ts_event, time.time_ns(), reason)
+            logger.warning(f"Databento live feed {reason}, reconnecting in {backoff:.0f}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+    
+    async def _watch(self, client: Any) -> str:
+        """Wait until the session closes or stalls; return the reason."""
+        close_task = asyncio.ensure_future(client.wait_for_close())
+        try:
+            while self.is_running:
+                done, _ = await asyncio.wait({close_task}, timeout=1.0)
+                if done:
+                    close_task.result()
+                    return "closed"
+                if time.monotonic() - self.pipeline.last_record_monotonic > self.stall_timeout:
+                    return "stalled"
+            return "stopped"
+        finally:
+            if not close_task.done():
+                close_task.cancel()
+    
+    def _close_client(self) -> None:
+        if self.client is None:
+            return
+        try:
+            self.client.terminate()
+        except Exception as e:
+            logger.debug(f"Error terminating live client: {e}")
+        self.client = None
+    
+    async def stop(self) -> None:
+        self.is_running = False
+        self._close_client()
+
+
+class DBNFileReplayer:
+    """Feed a local DBN file through the pipeline as a stand-in for the live feed.
+    
+    With ``speed`` > 0 records are paced by their event timestamps (2.0 is
+    twice real time); with 0 they are pushed as fast as possible, yielding to
+    the event loop every ``yield_every`` records.
+    """
+    
+    def __init__(
+        self,
+        pipeline: LiveFeedPipeline,
+        path: str,
+        speed: Optional[float] = None,
+        yield_every: int = 10000
+    ):
+        self.pipeline = pipeline
+        self.path = path
+        self.speed = lean_config.DATABENTO_REPLAY_SPEED if speed is None else speed
+        self.yield_every = yield_every
+        self.is_running = False
+    
+    async def run(self) -> int:
+        """Replay the file once; returns the number of records fed."""
+        self.is_running = True
+        store = db.DBNStore.from_file(self.path)
+        self.pipeline.instruments.add_mappings(store.mappings)
+        
+        first_ts = None
+        started = time.monotonic()
+        replayed = 0
+        
+        for record in store:
+            if not self.is_running:
+                break
+            
+            ts_event = getattr(record, "ts_event", None)
+            if self.speed > 0 and ts_event:
+                if first_ts is None:
+                    first_ts = ts_event
+                delay = (ts_event - first_ts) / 1e9 / self.speed - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif replayed % self.yield_every == 0:
+                await asyncio.sleep(0)
+            
+            self.pipeline.on_record(record)
+            replayed += 1
+        
+        self.is_running = False
+        logger.info(f"Replayed {replayed} records from {self.path}")
+        return replayed
+    
+    async def stop(self) -> None:
+        self.is_running = False
@@ -0,0 +1,264 @@
+"""
+Lean Metering for Smart-0DTE-System
+Measured Databento usage: records, bytes, requests, latency and cost.
+
+Every path that pulls data from Databento reports what it received, keyed by
+feed (``live``, ``historical``, ``polling``) and schema: requests, records and
+uncompressed DBN bytes. Cost is bytes times the per-GB rate of the pricing
+table, taken when the usage is recorded. Usage that was served without the
+API (backfill cache hits, polls skipped by the sampler) is recorded as
+avoided, so savings are a ratio of measured quantities.
+
+Totals roll over at UTC midnight and are kept per day in a JSON file
+(``DATABENTO_METERING_FILE``) for ``DATABENTO_METERING_RETENTION_DAYS``, so
+they survive restarts. Latency histograms per request kind are in memory.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from app.core.lean_config import lean_config
+from app.core.lean_dbn_decode import RTYPE_DTYPES, SCHEMA_RTYPES
+from app.core.lean_metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("requests", "records", "bytes", "cost_usd", "avoided_requests", "avoided_bytes", "avoided_cost_usd")
+
+# USD per GB of uncompressed DBN by feed and schema, "*" for the rest of the
+# feed. Flat placeholders: set the rates of the actual plan and datasets
+# through DATABENTO_PRICING_FILE (same layout, merged over these).
+DEFAULT_PRICING: Dict[str, Dict[str, float]] = {
+    "live": {"*": 1.0},
+    "historical": {"*": 1.0},
+    "polling": {"*": 1.0},
+}
+
+_BYTES_PER_GB = 1e9
+_SECONDS_PER_DAY = 86400
+
+
+def record_size(schema: str) -> int:
+    """Bytes of one DBN record of ``schema``, 0 if the layout is unknown."""
+    dtype = RTYPE_DTYPES.get(SCHEMA_RTYPES.get(schema))
+    return dtype.itemsize if dtype is not None else 0
+
+
+def load_pricing(path: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """Default pricing with the rates of a JSON pricing file merged over it."""
+    pricing = {feed: dict(rates) for feed, rates in DEFAULT_PRICING.items()}
+    if not path:
+        return pricing
+    
+    try:
+        with open(path) as f:
+            overrides = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to load pricing table {path}, using defaults: {e}")
+        return pricing
+    
+    for feed, rates in overrides.items():
+        pricing.setdefault(feed, {}).update({schema: float(rate) for schema, rate in rates.items()})
+    return pricing
+
+
+def _empty_totals() -> Dict[str, float]:
+    return {field: 0 for field in FIELDS}
+
+
+class UsageMeter:
+    """Per-day usage counters by feed and schema, plus request latency."""
+    
+    def __init__(self, path: Optional[str] = None, pricing: Optional[Dict[str, Dict[str, float]]] = None):
+        self.path = Path(path or lean_config.DATABENTO_METERING_FILE)
+        self.pricing_source = lean_config.DATABENTO_PRICING_FILE or "defaults"
+        self.pricing = pricing or load_pricing(lean_config.DATABENTO_PRICING_FILE)
+        self.retention_days = lean_config.DATABENTO_METERING_RETENTION_DAYS
+        
+        # day (ISO) -> "feed/schema" -> totals
+        self.days: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self.request_errors: Dict[str, int] = {}
+        self.compression = {"raw_bytes": 0, "compressed_bytes": 0}
+        
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._day = ""
+        self._day_end = 0.0
+        self._today: Dict[str, Dict[str, float]] = {}
+        self._load()
+    
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                self.days = json.load(f).get("days", {})
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load usage totals from {self.path}: {e}")
+    
+    def _current_day(self) -> Dict[str, Dict[str, float]]:
+        """Today's totals, rolling over (and pruning old days) at UTC midnight."""
+        now = time.time()
+        if now >= self._day_end:
+            today = datetime.fromtimestamp(now, timezone.utc).date()
+            self._day = today.isoformat()
+            self._day_end = (now // _SECONDS_PER_DAY + 1) * _SECONDS_PER_DAY
+            self._today = self.days.setdefault(self._day, {})
+            
+            oldest = (today - timedelta(days=self.retention_days - 1)).isoformat()
+            for day in [day for day in self.days if day < oldest]:
+                del self.days[day]
+        return self._today
+    
+    @staticmethod
+    def rtype_schemas(schemas: Iterable[str]) -> Dict[int, str]:
+        """rtype -> schema for a set of subscribed schemas, to meter records by schema."""
+        return {SCHEMA_RTYPES[schema]: schema for schema in schemas if schema in SCHEMA_RTYPES}
+    
+    def rate(self, feed: str, schema: str) -> float:
+        """USD per GB for a feed and schema."""
+        rates = self.pricing.get(feed, {})
+        return rates.get(schema, rates.get("*", 0.0))
+    
+    def cost(self, feed: str, schema: str, nbytes: int) -> float:
+        return nbytes / _BYTES_PER_GB * self.rate(feed, schema)
+    
+    def add(self, feed: str, schema: str, records: int = 0, nbytes: int = 0, requests: int = 0) -> None:
+        """Count usage received from Databento."""
+        cost = self.cost(feed, schema, nbytes)
+        with self._lock:
+            totals = self._current_day().get(f"{feed}/{schema}")
+            if totals is None:
+                totals = self._today[f"{feed}/{schema}"] = _empty_totals()
+            totals["requests"] += requests
+            totals["records"] += records
+            totals["bytes"] += nbytes
+            totals["cost_usd"] += cost
+            self._dirty = True
+    
+    def avoid(self, feed: str, schema: str, nbytes: int = 0, requests: int = 1) -> None:
+        """Count usage that was served without calling Databento."""
+        cost = self.cost(feed, schema, nbytes)
+        with self._lock:
+            totals = self._current_day().get(f"{feed}/{schema}")
+            if totals is None:
+                totals = self._today[f"{feed}/{schema}"] = _empty_totals()
+            totals["avoided_requests"] += requests
+            totals["avoided_bytes"] += nbytes
+            totals["avoided_cost_usd"] += cost
+            self._dirty = True
+    
+    @contextmanager
+    def request(self, kind: str) -> Iterator[None]:
+        """Time one API request of ``kind``; exceptions are counted and re-raised."""
+        histogram = self.latency.get(kind)
+        if histogram is None:
+            histogram = self.latency[kind] = LatencyHistogram()
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.request_errors[kind] = self.request_errors.get(kind, 0) + 1
+            raise
+        finally:
+            histogram.observe((time.perf_counter() - started) * 1000)
+    
+    def observe_compression(self, raw_bytes: int, compressed_bytes: int) -> None:
+        """Serialized vs stored size of one payload written by the database or cache."""
+        with self._lock:
+            self.compression["raw_bytes"] += raw_bytes
+            self.compression["compressed_bytes"] += compressed_bytes
+    
+    def flush(self) -> bool:
+        """Write the daily totals if they changed; returns whether a write happened."""
+        with self._lock:
+            if not self._dirty:
+                return False
+            self._current_day()
+            payload = json.dumps({"days": self.days}, sort_keys=True)
+            self._dirty = False
+        
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(payload)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self._dirty = True
+            logger.error(f"Failed to persist usage totals to {self.path}: {e}")
+            return False
+        return True
+    
+    def daily_totals(self, days: int = 30) -> List[Dict[str, Any]]:
+        """Totals per day (newest first) over all feeds and schemas."""
+        with self._lock:
+            self._current_day()
+            recent = sorted(self.days.items(), reverse=True)[:days]
+            return [
+                {"date": day, **{field: sum(totals[field] for totals in keys.values()) for field in FIELDS}}
+                for day, keys in recent
+            ]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            today = {key: dict(totals) for key, totals in self._current_day().items()}
+            day = self._day
+        
+        totals = {field: sum(values[field] for values in today.values()) for field in FIELDS}
+        paid_and_avoided = totals["cost_usd"] + totals["avoided_cost_usd"]
+        raw, compressed = self.compression["raw_bytes"], self.compression["compressed_bytes"]
+        return {
+            "date": day,
+            "today": {key: {**values, "cost_usd": round(values["cost_usd"], 6),
+                            "avoided_cost_usd": round(values["avoided_cost_usd"], 6)}
+                      for key, values in sorted(today.items())},
+            "totals_today": {**totals, "cost_usd": round(totals["cost_usd"], 6),
+                             "avoided_cost_usd": round(totals["avoided_cost_usd"], 6)},
+            "cost_savings_percent": round(totals["avoided_cost_usd"] / paid_and_avoided * 100, 2) if paid_and_avoided else 0.0,
+            "compression_ratio": round(compressed / raw, 4) if raw else None,
+            "request_latency": {kind: histogram.to_dict() for kind, histogram in sorted(self.latency.items())},
+            "request_errors": dict(self.request_errors),
+            "pricing_source": self.pricing_source,
+            "days_kept": len(self.days)
+        }
+    
+    def to_prometheus(self) -> str:
+        """Today's totals and request latency in the Prometheus text format."""
+        with self._lock:
+            today = {key: dict(totals) for key, totals in self._current_day().items()}
+        
+        lines = []
+        for field in FIELDS:
+            name = f"lean_databento_{field}_today"
+            lines.append(f"# TYPE {name} gauge")
+            for key, totals in sorted(today.items()):
+                feed, schema = key.split("/", 1)
+                lines.append(f'{name}{{feed="{feed}",schema="{schema}"}} {totals[field]:g}')
+        
+        name = "lean_databento_request_latency_seconds"
+        lines.append(f"# TYPE {name} histogram")
+        for kind, histogram in sorted(self.latency.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.bounds_ms, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{kind="{kind}",le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{kind="{kind}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{kind="{kind}"}} {histogram.sum_ms / 1000:g}')
+            lines.append(f'{name}_count{{kind="{kind}"}} {histogram.count}')
+        
+        lines.append("# TYPE lean_databento_request_errors_total counter")
+        for kind, errors in sorted(self.request_errors.items()):
+            lines.append(f'lean_databento_request_errors_total{{kind="{kind}"}} {errors}')
+        return "\n".join(lines) + "\n"
+
+
+# Global usage meter shared by the live, polling and backfill paths
+usage_meter = UsageMeter()
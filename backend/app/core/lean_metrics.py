@@ -0,0 +1,73 @@
+"""
+Lean Metrics for Smart-0DTE-System
+Lightweight in-process instruments for timing the data paths.
+"""
+
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
+
+# Upper bucket bounds in milliseconds, roughly 1-2.5-5 per decade up to a minute
+DEFAULT_LATENCY_BOUNDS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram.
+    
+    Recording is a binary search and a counter increment, so it is cheap
+    enough for per-request timing. Percentiles are estimated as the upper
+    bound of the bucket they fall in, capped at the largest value seen.
+    """
+    
+    def __init__(self, bounds_ms: Optional[Sequence[float]] = None):
+        self.bounds_ms = tuple(bounds_ms or DEFAULT_LATENCY_BOUNDS_MS)
+        self.reset()
+    
+    def reset(self) -> None:
+        self.counts: List[int] = [0] * (len(self.bounds_ms) + 1)  # Last bucket is overflow
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+    
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect_left(self.bounds_ms, value_ms)] += 1
+        self.count += 1
+        self.sum_ms += value_ms
+        self.last_ms = value_ms
+        if value_ms > self.max_ms:
+            self.max_ms = value_ms
+    
+    def percentile(self, q: float) -> float:
+        """Estimated ``q`` quantile (0-1) in milliseconds."""
+        if self.count == 0:
+            return 0.0
+        
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank and bucket_count:
+                if index == len(self.bounds_ms):
+                    return self.max_ms
+                return min(self.bounds_ms[index], self.max_ms)
+        return self.max_ms
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary plus cumulative bucket counts (``le`` = less than or equal)."""
+        buckets = {}
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds_ms, self.counts):
+            cumulative += bucket_count
+            buckets[f"le_{bound:g}ms"] = cumulative
+        buckets["le_inf"] = self.count
+        
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum_ms / self.count, 3) if self.count else 0.0,
+            "last_ms": round(self.last_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p90_ms": round(self.percentile(0.9), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "buckets": buckets
+        }
@@ -0,0 +1,281 @@
+"""
+Lean Model Registry for Smart-0DTE-System
+Versioned model artifacts on local disk with atomic promotion and rollback.
+
+Each saved version is a directory of one joblib file per model plus a
+``manifest.json`` (model classes, file digests, metrics, feature names,
+library versions). Files are written uncompressed so ``joblib.load`` can
+memory-map the NumPy arrays inside them, and models are loaded one at a time
+on first use. Versions are written under a temporary name and renamed into
+place, so a reader never sees a partial version. ``CURRENT`` names the
+promoted version and is switched with an atomic rename; ``history.json``
+records promotions, which is what ``rollback`` walks back.
+
+Layout::
+
+    <MODEL_REGISTRY_DIR>/
+        CURRENT
+        history.json
+        versions/<version>/manifest.json
+        versions/<version>/<model>.joblib
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+
+from app.core.lean_config import ai_optimization
+
+try:
+    import sklearn
+except ImportError:
+    sklearn = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+HISTORY_LIMIT = 100
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """Versioned, memory-mapped model artifacts with a promoted version."""
+    
+    def __init__(self, root: Optional[str] = None, keep_versions: Optional[int] = None):
+        self.root = Path(root or ai_optimization.MODEL_REGISTRY_DIR).resolve()
+        self.versions_dir = self.root / "versions"
+        self.keep_versions = keep_versions or ai_optimization.MODEL_REGISTRY_KEEP_VERSIONS
+        
+        # (version, model) -> loaded model
+        self._loaded: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "versions_saved": 0,
+            "unchanged_saves": 0,
+            "promotions": 0,
+            "rollbacks": 0,
+            "loads": 0,
+            "load_ms": 0.0,
+            "versions_pruned": 0
+        }
+    
+    def _version_dir(self, version: str) -> Path:
+        return self.versions_dir / version
+    
+    def current_version(self) -> Optional[str]:
+        """Promoted version, or None if nothing was promoted yet."""
+        try:
+            version = (self.root / "CURRENT").read_text().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+    
+    def manifest(self, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        version = version or self.current_version()
+        if version is None:
+            return None
+        try:
+            return json.loads((self._version_dir(version) / MANIFEST).read_text())
+        except FileNotFoundError:
+            return None
+    
+    def versions(self) -> List[Dict[str, Any]]:
+        """Manifests of every saved version, newest first."""
+        if not self.versions_dir.exists():
+            return []
+        manifests = [self.manifest(path.name) for path in self.versions_dir.iterdir()
+                     if path.is_dir() and not path.name.startswith(".")]
+        return sorted((m for m in manifests if m), key=lambda m: m["created_at"], reverse=True)
+    
+    def history(self) -> List[str]:
+        """Promoted versions, oldest first."""
+        try:
+            return json.loads((self.root / "history.json").read_text())
+        except FileNotFoundError:
+            return []
+    
+    def save(
+        self,
+        models: Dict[str, Any],
+        metrics: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        promote: bool = True
+    ) -> str:
+        """Write a new version of ``models`` (name -> estimator, None entries skipped).
+        
+        If the artifacts are byte-identical to the current version, nothing is
+        written and the current version is returned.
+        """
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+        staging = self.versions_dir / f".staging-{uuid.uuid4().hex}"
+        staging.mkdir()
+        try:
+            entries = {}
+            for name, model in models.items():
+                if model is None:
+                    continue
+                path = staging / f"{name}.joblib"
+                # Uncompressed, so the arrays can be memory-mapped on load
+                joblib.dump(model, path, compress=0)
+                entries[name] = {
+                    "file": path.name,
+                    "class": f"{type(model).__module__}.{type(model).__qualname__}",
+                    "sha256": _file_digest(path),
+                    "bytes": path.stat().st_size
+                }
+            
+            content_hash = hashlib.sha256(
+                json.dumps({name: entry["sha256"] for name, entry in entries.items()}, sort_keys=True).encode()
+            ).hexdigest()
+            current = self.manifest()
+            if current and current.get("content_hash") == content_hash:
+                self.stats["unchanged_saves"] += 1
+                return current["version"]
+            
+            created_at = datetime.utcnow()
+            version = f"{created_at:%Y%m%dT%H%M%S}-{content_hash[:8]}"
+            manifest = {
+                "version": version,
+                "created_at": created_at.isoformat(),
+                "content_hash": content_hash,
+                "parent": current["version"] if current else None,
+                "models": entries,
+                "metrics": metrics or {},
+                "libraries": {
+                    "sklearn": sklearn.__version__ if sklearn else None,
+                    "joblib": joblib.__version__,
+                    "numpy": np.__version__
+                },
+                **(metadata or {})
+            }
+            (staging / MANIFEST).write_text(json.dumps(manifest, indent=2, sort_keys=True, default=str))
+            os.rename(staging, self._version_dir(version))
+        finally:
+            if staging.exists():
+                shutil.rmtree(staging, ignore_errors=True)
+        
+        self.stats["versions_saved"] += 1
+        logger.info(f"Saved model version {version} ({', '.join(entries)})")
+        if promote:
+            self.promote(version)
+        self.prune()
+        return version
+    
+    def _set_current(self, version: str, history: List[str]) -> None:
+        _write_atomic(self.root / "history.json", json.dumps(history[-HISTORY_LIMIT:]))
+        _write_atomic(self.root / "CURRENT", version)
+    
+    def promote(self, version: str) -> None:
+        """Make ``version`` the current one."""
+        if self.manifest(version) is None:
+            raise ValueError(f"Unknown model version: {version}")
+        history = self.history()
+        if history[-1:] != [version]:
+            history.append(version)
+        self._set_current(version, history)
+        self.stats["promotions"] += 1
+        logger.info(f"Promoted model version {version}")
+    
+    def rollback(self) -> str:
+        """Promote the version that was current before the current one."""
+        history = self.history()
+        current = self.current_version()
+        while history and history[-1] == current:
+            history.pop()
+        while history and self.manifest(history[-1]) is None:
+            history.pop()  # Pruned or removed by hand
+        if not history:
+            raise ValueError("No earlier model version to roll back to")
+        
+        self._set_current(history[-1], history)
+        self.stats["rollbacks"] += 1
+        logger.warning(f"Rolled back model version {current} -> {history[-1]}")
+        return history[-1]
+    
+    def load(self, name: str, version: Optional[str] = None) -> Any:
+        """One model of a version (default: current), memory-mapped; None if absent."""
+        version = version or self.current_version()
+        if version is None:
+            return None
+        
+        with self._lock:
+            key = (version, name)
+            if key in self._loaded:
+                return self._loaded[key]
+            
+            entry = (self.manifest(version) or {}).get("models", {}).get(name)
+            if entry is None:
+                return None
+            
+            started = time.perf_counter()
+            model = joblib.load(self._version_dir(version) / entry["file"], mmap_mode="r")
+            self.stats["loads"] += 1
+            self.stats["load_ms"] += (time.perf_counter() - started) * 1000
+            
+            # Only the newest loaded version is kept in memory
+            for loaded_key in [k for k in self._loaded if k[0] != version]:
+                del self._loaded[loaded_key]
+            self._loaded[key] = model
+            return model
+    
+    def verify(self, version: Optional[str] = None) -> bool:
+        """Whether every artifact of a version matches its manifest digest."""
+        manifest = self.manifest(version)
+        if manifest is None:
+            return False
+        directory = self._version_dir(manifest["version"])
+        return all(
+            (directory / entry["file"]).exists() and _file_digest(directory / entry["file"]) == entry["sha256"]
+            for entry in manifest["models"].values()
+        )
+    
+    def prune(self) -> int:
+        """Delete the oldest versions beyond ``keep_versions``, never a promoted one."""
+        protected = set(self.history()) | {self.current_version()}
+        removable = [m["version"] for m in self.versions() if m["version"] not in protected]
+        pruned = 0
+        for version in removable[self.keep_versions:]:
+            shutil.rmtree(self._version_dir(version), ignore_errors=True)
+            pruned += 1
+        self.stats["versions_pruned"] += pruned
+        return pruned
+    
+    def get_stats(self) -> Dict[str, Any]:
+        manifest = self.manifest()
+        return {
+            **self.stats,
+            "load_ms": round(self.stats["load_ms"], 3),
+            "root": str(self.root),
+            "current_version": manifest["version"] if manifest else None,
+            "current_metrics": manifest["metrics"] if manifest else {},
+            "versions": len(self.versions()),
+            "loaded_models": sorted(name for _, name in self._loaded)
+        }
+
+
+# Global model registry shared by the AI services
+model_registry = ModelRegistry()
@@ -0,0 +1,145 @@
+"""
+Lean Options Chain for Smart-0DTE-System
+Columnar options chain: one NumPy array per field instead of a dict per contract.
+
+Filtering a chain is a handful of vectorized comparisons, and the chain is
+only turned into per-contract dicts (or a pydantic ``OptionsChain``) where it
+leaves the service.
+"""
+
+from dataclasses import dataclass, fields, replace
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Column name -> dtype, in the order used by ``to_dicts``
+_NUMERIC_COLUMNS = {
+    "strike": np.float64,
+    "bid": np.float64,
+    "ask": np.float64,
+    "volume": np.int64,
+    "open_interest": np.int64,
+    "implied_volatility": np.float64,
+    "delta": np.float64,
+    "gamma": np.float64,
+    "theta": np.float64,
+    "vega": np.float64,
+}
+
+
+@dataclass
+class ColumnarOptionsChain:
+    """Options chain for one underlying with one array per contract field."""
+    symbol: str
+    underlying_price: float
+    timestamp: datetime
+    expiry: np.ndarray  # datetime64[s]
+    is_call: np.ndarray  # bool; False = put
+    strike: np.ndarray
+    bid: np.ndarray
+    ask: np.ndarray
+    volume: np.ndarray
+    open_interest: np.ndarray
+    implied_volatility: np.ndarray
+    delta: np.ndarray
+    gamma: np.ndarray
+    theta: np.ndarray
+    vega: np.ndarray
+    
+    def __len__(self) -> int:
+        return len(self.strike)
+    
+    def _array_fields(self) -> List[str]:
+        return [f.name for f in fields(self) if isinstance(getattr(self, f.name), np.ndarray)]
+    
+    def take(self, index: np.ndarray) -> "ColumnarOptionsChain":
+        """Chain restricted to a boolean mask or index array."""
+        return replace(self, **{name: getattr(self, name)[index] for name in self._array_fields()})
+    
+    def filter_mask(
+        self,
+        min_volume: Optional[int] = None,
+        moneyness_band: Optional[float] = None,
+        expiry_date: Optional[date] = None
+    ) -> np.ndarray:
+        """Contracts with enough volume, strikes within ``moneyness_band``
+        (a fraction of the underlying price) and the given expiry date.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if min_volume is not None:
+            mask &= self.volume >= min_volume
+        if moneyness_band is not None and self.underlying_price > 0:
+            mask &= np.abs(self.strike - self.underlying_price) <= self.underlying_price * moneyness_band
+        if expiry_date is not None:
+            mask &= self.expiry.astype("datetime64[D]") == np.datetime64(expiry_date, "D")
+        return mask
+    
+    @property
+    def mid(self) -> np.ndarray:
+        return (self.bid + self.ask) / 2
+    
+    @property
+    def spread(self) -> np.ndarray:
+        return self.ask - self.bid
+    
+    def contract_symbols(self) -> List[str]:
+        expiries = self.expiry.astype("datetime64[D]").astype(datetime).tolist()
+        return [
+            f"{self.symbol}{expiry:%y%m%d}{'C' if is_call else 'P'}{int(strike):08d}"
+            for expiry, is_call, strike in zip(expiries, self.is_call.tolist(), self.strike.tolist())
+        ]
+    
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Per-contract dicts in the shape of the ``OptionsChain.options`` entries."""
+        columns = {name: getattr(self, name).tolist() for name in _NUMERIC_COLUMNS}
+        expiries = self.expiry.astype("datetime64[us]").astype(datetime).tolist()
+        option_types = np.where(self.is_call, "CALL", "PUT").tolist()
+        
+        return [
+            {
+                'symbol': contract_symbol,
+                'underlying_symbol': self.symbol,
+                'expiry': expiry,
+                'option_type': option_type,
+                **dict(zip(_NUMERIC_COLUMNS, values))
+            }
+            for contract_symbol, expiry, option_type, *values in zip(
+                self.contract_symbols(), expiries, option_types, *columns.values()
+            )
+        ]
+    
+    def to_chain_data(self, expiry: datetime) -> Dict[str, Any]:
+        """Keyword arguments for ``OptionsChain``."""
+        return {
+            'symbol': self.symbol,
+            'timestamp': self.timestamp,
+            'expiry': expiry,
+            'options': self.to_dicts()
+        }
+    
+    @classmethod
+    def from_dicts(
+        cls,
+        symbol: str,
+        options: Sequence[Dict[str, Any]],
+        underlying_price: float = 0.0,
+        timestamp: Optional[datetime] = None
+    ) -> "ColumnarOptionsChain":
+        """Build a chain from per-contract dicts (e.g. an API response)."""
+        columns = {
+            name: np.array([option.get(name) or 0 for option in options], dtype=dtype)
+            for name, dtype in _NUMERIC_COLUMNS.items()
+        }
+        expiries = [option['expiry'] for option in options]
+        return cls(
+            symbol=symbol,
+            underlying_price=underlying_price,
+            timestamp=timestamp or datetime.utcnow(),
+            expiry=np.array(
+                [datetime.fromisoformat(e) if isinstance(e, str) else e for e in expiries],
+                dtype="datetime64[s]"
+            ),
+            is_call=np.array([str(option.get('option_type', '')).upper() == 'CALL' for option in options], dtype=bool),
+            **columns
+        )
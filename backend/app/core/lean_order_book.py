@@ -0,0 +1,380 @@
+"""
+Lean Order Book for Smart-0DTE-System
+Incremental per-instrument top-of-book and L2 state fed by MBO and MBP-1/TBBO records.
+
+Each book side keeps its price levels in preallocated NumPy arrays sorted so
+the best level is the last row. Levels are found with a binary search, and
+inserts and removals shift only the rows between the touched level and the
+top of book, which is where nearly all activity happens. After every event
+the book publishes its top of book into one shared structured array with a
+row per instrument, so readers get mid, spread, microprice and imbalance as
+single array reads without locking or copying.
+"""
+
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.lean_config import data_optimization
+from app.core.lean_live_feed import InstrumentRegistry, LiveFeedPipeline, PRICE_SCALE, ReplayWindow, UNDEF_PRICE
+
+try:
+    import databento as db
+except ImportError:
+    db = None
+
+logger = logging.getLogger(__name__)
+
+F_LAST = 0x80  # Last record of an exchange event; the book is consistent after it
+
+TOP_DTYPE = np.dtype([
+    ("ts_event", "i8"),
+    ("bid_px", "f8"),
+    ("ask_px", "f8"),
+    ("bid_sz", "u8"),
+    ("ask_sz", "u8"),
+    ("mid", "f8"),
+    ("spread", "f8"),
+    ("microprice", "f8"),
+    ("imbalance", "f8"),  # (bid_sz - ask_sz) / (bid_sz + ask_sz), in [-1, 1]
+])
+
+
+class BookSide:
+    """Aggregated price levels for one side of a book.
+    
+    ``keys`` holds fixed-point prices (negated for asks) in ascending order,
+    so the best level of either side is at index ``count - 1``.
+    """
+    
+    def __init__(self, is_bid: bool, capacity: int):
+        self.sign = 1 if is_bid else -1
+        self.keys = np.zeros(capacity, dtype=np.int64)
+        self.prices = np.zeros(capacity, dtype=np.float64)
+        self.sizes = np.zeros(capacity, dtype=np.int64)
+        self.orders = np.zeros(capacity, dtype=np.int32)
+        self.count = 0
+    
+    def clear(self) -> None:
+        self.count = 0
+    
+    def _grow(self) -> None:
+        capacity = len(self.keys) * 2
+        for name in ("keys", "prices", "sizes", "orders"):
+            grown = np.zeros(capacity, dtype=getattr(self, name).dtype)
+            grown[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, grown)
+    
+    def update(self, price: int, size_delta: int, order_delta: int) -> None:
+        """Add ``size_delta`` (and ``order_delta`` orders) at a fixed-point price."""
+        n = self.count
+        key = price * self.sign
+        i = int(np.searchsorted(self.keys[:n], key))
+        
+        if i < n and self.keys[i] == key:
+            size = self.sizes[i] + size_delta
+            if size > 0:
+                self.sizes[i] = size
+                self.orders[i] += order_delta
+                return
+            # Level emptied: shift the better levels down over it
+            for array in (self.keys, self.prices, self.sizes, self.orders):
+                array[i:n - 1] = array[i + 1:n]
+            self.count = n - 1
+            return
+        
+        if size_delta <= 0:
+            return
+        if n == len(self.keys):
+            self._grow()
+        # New level: shift the better levels up to make room
+        for array in (self.keys, self.prices, self.sizes, self.orders):
+            array[i + 1:n + 1] = array[i:n]
+        self.keys[i] = key
+        self.prices[i] = price * PRICE_SCALE
+        self.sizes[i] = size_delta
+        self.orders[i] = max(order_delta, 1)
+        self.count = n + 1
+    
+    def set_top(self, price: int, size: int) -> None:
+        """Replace the side with a single level (MBP-1 and TBBO books)."""
+        self.count = 0
+        if price != UNDEF_PRICE and size > 0:
+            self.update(price, size, 1)
+    
+    def best(self) -> Tuple[float, int]:
+        if self.count == 0:
+            return np.nan, 0
+        return self.prices[self.count - 1], int(self.sizes[self.count - 1])
+    
+    def levels(self, depth: int) -> Dict[str, np.ndarray]:
+        """Views of the best ``depth`` levels, best first.
+        
+        The arrays alias the live book, so copy them to keep a stable snapshot.
+        """
+        n = self.count
+        start = max(0, n - depth)
+        return {
+            "price": self.prices[start:n][::-1],
+            "size": self.sizes[start:n][::-1],
+            "orders": self.orders[start:n][::-1]
+        }
+
+
+class OrderBook:
+    """Book for one instrument, built from MBO orders or set from MBP-1 tops."""
+    
+    def __init__(self, instrument_id: int, levels: int):
+        self.instrument_id = instrument_id
+        self.bids = BookSide(True, levels)
+        self.asks = BookSide(False, levels)
+        # order_id -> (is_bid, price, size), for MBO books only
+        self.orders: Dict[int, Tuple[bool, int, int]] = {}
+        self.has_depth = False  # True once MBO records have been applied
+        self.ts_event = 0
+    
+    def _side(self, is_bid: bool) -> BookSide:
+        return self.bids if is_bid else self.asks
+    
+    def clear(self) -> None:
+        self.bids.clear()
+        self.asks.clear()
+        self.orders.clear()
+    
+    def apply_mbo(self, record: Any) -> None:
+        """Apply one MBO event. Trades and fills leave the book unchanged;
+        the venue follows them with the cancel or modify that removes size.
+        """
+        self.has_depth = True
+        self.ts_event = record.ts_event
+        action = record.action
+        
+        if action == "R":
+            self.clear()
+            return
+        
+        if action == "A":
+            if record.side == "N" or record.price == UNDEF_PRICE:
+                return
+            is_bid = record.side == "B"
+            self.orders[record.order_id] = (is_bid, record.price, record.size)
+            self._side(is_bid).update(record.price, record.size, 1)
+            
+        elif action == "C":
+            order = self.orders.get(record.order_id)
+            if order is None:
+                return
+            is_bid, price, size = order
+            removed = min(record.size, size)
+            self._side(is_bid).update(price, -removed, -1 if removed == size else 0)
+            if removed == size:
+                del self.orders[record.order_id]
+            else:
+                self.orders[record.order_id] = (is_bid, price, size - removed)
+                
+        elif action == "M":
+            order = self.orders.get(record.order_id)
+            if order is None:
+                # Modify of an order we never saw added: treat it as an add
+                if record.side != "N" and record.price != UNDEF_PRICE and record.size > 0:
+                    is_bid = record.side == "B"
+                    self.orders[record.order_id] = (is_bid, record.price, record.size)
+                    self._side(is_bid).update(record.price, record.size, 1)
+                return
+            is_bid, price, size = order
+            side = self._side(is_bid)
+            if record.price == price:
+                side.update(price, record.size - size, 0 if record.size else -1)
+            else:
+                side.update(price, -size, -1)
+                side.update(record.price, record.size, 1)
+            if record.size > 0:
+                self.orders[record.order_id] = (is_bid, record.price, record.size)
+            else:
+                del self.orders[record.order_id]
+    
+    def apply_top(self, record: Any) -> None:
+        """Set the top of book from an MBP-1 or TBBO record."""
+        self.ts_event = record.ts_event
+        self.bids.set_top(record.bid_px_00, record.bid_sz_00)
+        self.asks.set_top(record.ask_px_00, record.ask_sz_00)
+
+
+class OrderBookEngine:
+    """Books for every instrument on the feed plus a shared top-of-book array.
+    
+    Records arrive on the feed thread and are applied there; ``top`` is
+    preallocated and never reallocated, so views handed to readers stay valid.
+    A row is written with a single assignment once an exchange event is
+    complete, so a reader never sees half of an update in one row. Instruments
+    with MBO depth ignore MBP-1/TBBO tops so two sources never fight.
+    """
+    
+    def __init__(
+        self,
+        pipeline: Optional[LiveFeedPipeline] = None,
+        max_instruments: Optional[int] = None,
+        levels: Optional[int] = None
+    ):
+        self.levels = levels or data_optimization.ORDER_BOOK_INITIAL_LEVELS
+        self.top = np.zeros(max_instruments or data_optimization.ORDER_BOOK_MAX_INSTRUMENTS, dtype=TOP_DTYPE)
+        for name in ("bid_px", "ask_px", "mid", "spread", "microprice", "imbalance"):
+            self.top[name] = np.nan
+        # Per-field views of ``top``, so a metric read is one index into a column
+        self.columns = {name: self.top[name] for name in TOP_DTYPE.names}
+        
+        self.books: Dict[int, OrderBook] = {}
+        self.slots: Dict[int, int] = {}  # instrument_id -> row in ``top``
+        self.instruments = InstrumentRegistry()
+        self.replay = ReplayWindow()
+        
+        self.stats = {
+            "mbo_events": 0,
+            "top_updates": 0,
+            "duplicates": 0,
+            "publishes": 0,
+            "dropped_instruments": 0
+        }
+        
+        if pipeline is not None:
+            self.attach(pipeline)
+    
+    def attach(self, pipeline: LiveFeedPipeline) -> None:
+        """Subscribe to a feed's MBO and MBP-1/TBBO records and share its symbols."""
+        self.instruments = pipeline.instruments
+        pipeline.replay_windows.append(self.replay)
+        if db is None:
+            logger.warning("databento is not installed, order book engine not attached")
+            return
+        pipeline.add_listener(db.MBOMsg, self.on_mbo)
+        pipeline.add_listener(db.MBP1Msg, self.on_top)
+    
+    def _book(self, record: Any) -> Optional[OrderBook]:
+        """Book for a record, or None if the record is a duplicate or has no row."""
+        instrument_id = record.instrument_id
+        book = self.books.get(instrument_id)
+        if book is None:
+            if len(self.slots) >= len(self.top):
+                self.stats["dropped_instruments"] += 1
+                return None
+            self.slots[instrument_id] = len(self.slots)
+            book = self.books[instrument_id] = OrderBook(instrument_id, self.levels)
+        
+        # Only the overlap a reconnect replays is dropped; records may share a ts_event and sequence
+        if self.replay.is_replayed((type(record), instrument_id), record.ts_recv):
+            self.stats["duplicates"] += 1
+            return None
+        return book
+    
+    def on_mbo(self, record: Any) -> None:
+        book = self._book(record)
+        if book is None:
+            return
+        book.apply_mbo(record)
+        self.stats["mbo_events"] += 1
+        if record.flags & F_LAST:
+            self._publish(book)
+    
+    def on_top(self, record: Any) -> None:
+        book = self._book(record)
+        if book is None or book.has_depth:
+            return
+        book.apply_top(record)
+        self.stats["top_updates"] += 1
+        self._publish(book)
+    
+    def _publish(self, book: OrderBook) -> None:
+        bid_px, bid_sz = book.bids.best()
+        ask_px, ask_sz = book.asks.best()
+        
+        if bid_sz and ask_sz:
+            total = bid_sz + ask_sz
+            mid = (bid_px + ask_px) / 2
+            spread = ask_px - bid_px
+            # Size-weighted toward the side more likely to be hit next
+            microprice = (bid_px * ask_sz + ask_px * bid_sz) / total
+            imbalance = (bid_sz - ask_sz) / total
+        else:
+            mid = spread = microprice = imbalance = np.nan
+        
+        self.top[self.slots[book.instrument_id]] = (
+            book.ts_event, bid_px, ask_px, bid_sz, ask_sz, mid, spread, microprice, imbalance
+        )
+        self.stats["publishes"] += 1
+    
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    
+    def _slot(self, symbol: str) -> Optional[int]:
+        instrument_id = self.instruments.instrument_id(symbol)
+        return self.slots.get(instrument_id) if instrument_id is not None else None
+    
+    def _field(self, symbol: str, name: str) -> Optional[float]:
+        slot = self._slot(symbol)
+        if slot is None:
+            return None
+        value = float(self.columns[name][slot])
+        return None if value != value else value  # NaN until both sides are quoted
+    
+    def microprice(self, symbol: str) -> Optional[float]:
+        return self._field(symbol, "microprice")
+    
+    def mid(self, symbol: str) -> Optional[float]:
+        return self._field(symbol, "mid")
+    
+    def spread(self, symbol: str) -> Optional[float]:
+        return self._field(symbol, "spread")
+    
+    def imbalance(self, symbol: str) -> Optional[float]:
+        return self._field(symbol, "imbalance")
+    
+    def top_of_book(self, symbol: str) -> Optional[np.void]:
+        """The symbol's row of ``top`` (a view; ``.copy()`` it to keep it)."""
+        slot = self._slot(symbol)
+        return self.top[slot] if slot is not None else None
+    
+    def depth(self, symbol: str, depth: int = 10) -> Optional[Dict[str, Dict[str, np.ndarray]]]:
+        """Views of the best ``depth`` levels per side; read on the feed thread
+        or copy them, since later events shift the underlying arrays.
+        """
+        instrument_id = self.instruments.instrument_id(symbol)
+        book = self.books.get(instrument_id) if instrument_id is not None else None
+        if book is None:
+            return None
+        return {"bids": book.bids.levels(depth), "asks": book.asks.levels(depth)}
+    
+    def quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Top of book and derived metrics for a symbol as plain floats."""
+        row = self.top_of_book(symbol)
+        if row is None:
+            return None
+        
+        row = row.copy()
+        if np.isnan(row["mid"]):
+            return None
+        precision = data_optimization.PRICE_PRECISION
+        return {
+            'bid': round(float(row["bid_px"]), precision),
+            'ask': round(float(row["ask_px"]), precision),
+            'bid_size': int(row["bid_sz"]),
+            'ask_size': int(row["ask_sz"]),
+            'mid': round(float(row["mid"]), precision),
+            'spread': round(float(row["spread"]), precision),
+            'microprice': round(float(row["microprice"]), precision),
+            'imbalance': round(float(row["imbalance"]), 4),
+            'ts_event': int(row["ts_event"])
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "books": len(self.books),
+            "depth_books": sum(1 for book in self.books.values() if book.has_depth),
+            "resting_orders": sum(len(book.orders) for book in self.books.values())
+        }
+
+
+# Global order book engine, attached to the market data feed by LeanDatabentoService
+order_book_engine = OrderBookEngine()
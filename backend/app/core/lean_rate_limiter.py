@@ -0,0 +1,236 @@
+"""
+Lean Rate Limiter for Smart-0DTE-System
+Weighted GCRA limiter for Databento requests, shared across workers through Redis.
+
+The per-minute limit is a generic cell rate algorithm: one timestamp (the
+theoretical arrival time, TAT) per bucket replaces a token count and a refill
+timer, so tokens drip back continuously instead of all at once at the top of
+the minute. A request of weight ``w`` is admitted if moving TAT forward by
+``w`` emission intervals keeps it within the burst tolerance. A daily budget
+is checked in the same Lua script so both are updated atomically.
+
+Priority lanes see a smaller bucket: a lane with a 20% reserve is refused
+once the bucket is 80% drained, so trading-critical requests still find
+tokens while dashboard refreshes are turned away.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.lean_config import lean_config
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(Enum):
+    CRITICAL = "critical"      # Trading decisions and position management
+    NORMAL = "normal"          # Scheduled data collection
+    BACKGROUND = "background"  # Dashboard refreshes, backfills
+
+
+# KEYS: GCRA timestamp, daily counter
+# ARGV: emission interval (us), burst tolerance (us), weight, daily limit, daily key ttl (s)
+# Returns: {allowed, retry_after_us (-1 when the daily budget is spent), daily used}
+_GCRA_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000000 + tonumber(now_parts[2])
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local weight = tonumber(ARGV[3])
+local daily_limit = tonumber(ARGV[4])
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval * weight
+local allow_at = new_tat - tolerance
+if allow_at > now then
+    return {0, allow_at - now, tonumber(redis.call('GET', KEYS[2]) or 0)}
+end
+
+local used = tonumber(redis.call('GET', KEYS[2]) or 0)
+if used + weight > daily_limit then
+    return {0, -1, used}
+end
+
+-- Format explicitly: default number conversion keeps only 14 significant digits
+redis.call('SET', KEYS[1], string.format('%.0f', new_tat), 'PX', math.ceil((new_tat - now) / 1000) + 1)
+used = redis.call('INCRBY', KEYS[2], weight)
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[5]))
+return {1, 0, used}
+"""
+
+
+class DatabentoRateLimiter:
+    """Weighted, prioritized limiter for Databento API requests.
+    
+    Uses the cache manager's Redis connection when it is available, so every
+    worker draws from the same budgets. Without Redis (or when a call fails)
+    the same algorithm runs in process, which limits each worker separately.
+    """
+    
+    def __init__(
+        self,
+        name: str = "databento",
+        per_minute: Optional[int] = None,
+        daily_budget: Optional[int] = None,
+        weights: Optional[Dict[str, int]] = None,
+        redis_client: Any = None
+    ):
+        self.name = name
+        self.capacity = per_minute or lean_config.DATABENTO_RATE_LIMIT
+        self.daily_budget = daily_budget or lean_config.DATABENTO_DAILY_BUDGET
+        self.weights = weights or lean_config.DATABENTO_REQUEST_WEIGHTS
+        self.emission_interval_us = 60_000_000 // self.capacity
+        self._redis_client = redis_client
+        self._script = None
+        
+        # In-process fallback state
+        self._local_tat_us = 0
+        self._local_day = ""
+        self._local_used = 0
+        
+        self.stats = {
+            "admitted": 0,
+            "admitted_weight": 0,
+            "throttled": 0,
+            "daily_exhausted": 0,
+            "waits": 0,
+            "redis_errors": 0,
+            **{f"{lane.value}_throttled": 0 for lane in Priority}
+        }
+    
+    @property
+    def redis_client(self) -> Any:
+        if self._redis_client is not None:
+            return self._redis_client
+        from app.core.lean_cache import lean_cache_manager
+        return lean_cache_manager.redis_client
+    
+    def _keys(self) -> Tuple[str, str]:
+        day = datetime.utcnow().strftime("%Y%m%d")
+        return f"ratelimit:{self.name}:minute", f"ratelimit:{self.name}:day:{day}"
+    
+    def _lane_limits(self, priority: Priority) -> Tuple[int, int]:
+        """Burst tolerance (us) and daily limit a lane may use."""
+        reserve = lean_config.DATABENTO_LANE_RESERVE.get(priority.value, 0.0)
+        tolerance = int(self.capacity * (1 - reserve) * self.emission_interval_us)
+        return tolerance, int(self.daily_budget * (1 - reserve))
+    
+    def weight(self, request_type: str) -> int:
+        weight = self.weights.get(request_type, 1)
+        if weight > self.capacity:
+            raise ValueError(f"Request weight {weight} for '{request_type}' exceeds the bucket size {self.capacity}")
+        return weight
+    
+    async def _try_acquire(self, weight: int, priority: Priority) -> Tuple[bool, float]:
+        """One admission attempt; returns (admitted, seconds until a retry can succeed)."""
+        tolerance, daily_limit = self._lane_limits(priority)
+        client = self.redis_client
+        
+        if client is not None:
+            try:
+                if self._script is None:
+                    self._script = client.register_script(_GCRA_SCRIPT)
+                allowed, retry_after_us, _ = await self._script(
+                    keys=list(self._keys()),
+                    args=[self.emission_interval_us, tolerance, weight, daily_limit, 2 * 86400],
+                    client=client
+                )
+                return bool(allowed), retry_after_us / 1e6 if retry_after_us >= 0 else -1.0
+            except Exception as e:
+                self.stats["redis_errors"] += 1
+                logger.warning(f"Shared rate limit unavailable, limiting in process: {e}")
+        
+        return self._try_acquire_local(weight, tolerance, daily_limit)
+    
+    def _try_acquire_local(self, weight: int, tolerance: int, daily_limit: int) -> Tuple[bool, float]:
+        now = time.monotonic_ns() // 1000
+        day = datetime.utcnow().strftime("%Y%m%d")
+        if day != self._local_day:
+            self._local_day, self._local_used = day, 0
+        
+        new_tat = max(self._local_tat_us, now) + self.emission_interval_us * weight
+        allow_at = new_tat - tolerance
+        if allow_at > now:
+            return False, (allow_at - now) / 1e6
+        if self._local_used + weight > daily_limit:
+            return False, -1.0
+        
+        self._local_tat_us = new_tat
+        self._local_used += weight
+        return True, 0.0
+    
+    async def acquire(
+        self,
+        request_type: str,
+        priority: Optional[Priority] = None,
+        max_wait: Optional[float] = None
+    ) -> bool:
+        """Take tokens for one request, waiting up to the lane's max wait.
+        
+        ``priority`` defaults to the normal lane. Returns False if the request
+        should not be made.
+        """
+        priority = priority or Priority.NORMAL
+        weight = self.weight(request_type)
+        if max_wait is None:
+            max_wait = lean_config.DATABENTO_LANE_MAX_WAIT.get(priority.value, 0.0)
+        deadline = time.monotonic() + max_wait
+        
+        while True:
+            admitted, retry_after = await self._try_acquire(weight, priority)
+            if admitted:
+                self.stats["admitted"] += 1
+                self.stats["admitted_weight"] += weight
+                return True
+            
+            if retry_after < 0:
+                self.stats["daily_exhausted"] += 1
+                logger.warning(f"Daily {self.name} budget exhausted for {priority.value} requests")
+                return False
+            if time.monotonic() + retry_after > deadline:
+                self.stats["throttled"] += 1
+                self.stats[f"{priority.value}_throttled"] += 1
+                return False
+            
+            self.stats["waits"] += 1
+            await asyncio.sleep(retry_after)
+    
+    async def get_status(self) -> Dict[str, Any]:
+        """Tokens available now and weight used today (shared values when on Redis)."""
+        now_us = time.monotonic_ns() // 1000
+        tat_us, used = self._local_tat_us, self._local_used
+        client = self.redis_client
+        
+        if client is not None:
+            try:
+                minute_key, day_key = self._keys()
+                (now_s, now_frac), tat, day_used = await asyncio.gather(
+                    client.time(), client.get(minute_key), client.get(day_key)
+                )
+                now_us = now_s * 1_000_000 + now_frac
+                tat_us, used = int(tat or 0), int(day_used or 0)
+            except Exception as e:
+                self.stats["redis_errors"] += 1
+                logger.debug(f"Could not read shared rate limit state: {e}")
+        
+        available = self.capacity - max(0, tat_us - now_us) / self.emission_interval_us
+        return {
+            "limit_per_minute": self.capacity,
+            "remaining": max(0, int(available)),
+            "daily_budget": self.daily_budget,
+            "daily_used": used,
+            "daily_remaining": max(0, self.daily_budget - used),
+            "shared": client is not None,
+            **self.stats
+        }
+
+
+# Global Databento rate limiter instance
+databento_rate_limiter = DatabentoRateLimiter()
@@ -0,0 +1,216 @@
+"""
+Lean Adaptive Sampling for Smart-0DTE-System
+Per-symbol polling intervals driven by market activity instead of the wall clock.
+
+The base interval comes from the current market session. Each symbol's
+interval is then shortened while the tape is active and stretched while it is
+quiet. Activity is measured as the ratio of a short-horizon reading to its own
+slowly moving baseline, for three inputs:
+
+- realized variance per second of log returns
+- bid/ask spread
+- traded volume per second
+
+A ratio above ``SAMPLING_FAST_THRESHOLD`` on any input samples faster. Volatility
+and volume ratios both below ``SAMPLING_QUIET_THRESHOLD`` sample slower (a
+tight spread alone says nothing about how quiet the tape is). Baselines decay
+with a half-life in seconds, so sampling faster does not make them adapt faster. A daily data-point
+budget sets a floor on the interval, so bursts cannot overspend it.
+"""
+
+import logging
+import math
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.core.lean_config import lean_config, data_optimization
+
+logger = logging.getLogger(__name__)
+
+# MarketHoursService session value -> key in lean_config.SAMPLING_RATES
+_SESSION_RATES = {
+    "regular": "market_hours",
+    "pre_market": "pre_market",
+    "after_hours": "after_hours",
+    "closed": "weekends",
+    "weekend": "weekends",
+}
+
+REGIME_FAST = "fast"
+REGIME_NORMAL = "normal"
+REGIME_QUIET = "quiet"
+
+
+class _SymbolActivity:
+    """Short-horizon activity readings for one symbol and their baselines."""
+    
+    def __init__(self, window: int):
+        self.variance_rates: Deque[float] = deque(maxlen=window)
+        self.variance_baseline: Optional[float] = None
+        self.spread_baseline: Optional[float] = None
+        self.volume_rate_baseline: Optional[float] = None
+        self.last_price: Optional[float] = None
+        self.last_volume: Optional[float] = None
+        self.last_observed: Optional[float] = None
+        self.last_sampled = -math.inf
+        self.ratios = {"volatility": 1.0, "spread": 1.0, "volume": 1.0}
+        self.regime = REGIME_NORMAL
+
+
+def _ewma(baseline: Optional[float], value: float, alpha: float) -> float:
+    """Move ``baseline`` a fraction ``alpha`` of the way to ``value``."""
+    return value if baseline is None else baseline + alpha * (value - baseline)
+
+
+def _ratio(value: float, baseline: Optional[float]) -> float:
+    return value / baseline if baseline else 1.0
+
+
+class AdaptiveSampler:
+    """Decide per symbol when the next data point is worth paying for.
+    
+    ``market_hours`` is the MarketHoursService that supplies ET sessions.
+    """
+    
+    def __init__(self, market_hours: Any, daily_budget: Optional[int] = None):
+        self.market_hours = market_hours
+        self.daily_budget = daily_budget or data_optimization.SAMPLING_DAILY_BUDGET
+        self.window = data_optimization.SAMPLING_ACTIVITY_WINDOW
+        self.halflife = data_optimization.SAMPLING_BASELINE_HALFLIFE
+        self.symbols: Dict[str, _SymbolActivity] = {}
+        
+        self._budget_day = None
+        self.samples_today = 0
+        self.stats = {
+            "sampled": 0,
+            "skipped": 0,
+            "fast_decisions": 0,
+            "quiet_decisions": 0,
+            "budget_limited": 0
+        }
+    
+    def _activity(self, symbol: str) -> _SymbolActivity:
+        activity = self.symbols.get(symbol)
+        if activity is None:
+            activity = self.symbols[symbol] = _SymbolActivity(self.window)
+        return activity
+    
+    def session_interval(self, now: Optional[datetime] = None) -> float:
+        """Base interval (seconds) for the current market session."""
+        session = self.market_hours.get_market_session(now)
+        return float(lean_config.SAMPLING_RATES[_SESSION_RATES[session.value]])
+    
+    def observe(self, symbol: str, data: Dict[str, Any], now: Optional[float] = None) -> None:
+        """Update a symbol's activity readings from a market data point."""
+        now = time.monotonic() if now is None else now
+        activity = self._activity(symbol)
+        price = data.get('price')
+        volume = data.get('volume')
+        bid, ask = data.get('bid'), data.get('ask')
+        elapsed = now - activity.last_observed if activity.last_observed is not None else None
+        
+        alpha = 1.0 - 0.5 ** (elapsed / self.halflife) if elapsed and elapsed > 0 else 1.0
+        
+        if price and activity.last_price and elapsed and elapsed > 0:
+            variance_rate = math.log(price / activity.last_price) ** 2 / elapsed
+            activity.variance_rates.append(variance_rate)
+            short_variance = sum(activity.variance_rates) / len(activity.variance_rates)
+            activity.ratios["volatility"] = math.sqrt(_ratio(short_variance, activity.variance_baseline))
+            activity.variance_baseline = _ewma(activity.variance_baseline, variance_rate, alpha)
+        
+        if bid and ask and ask >= bid:
+            spread = ask - bid
+            activity.ratios["spread"] = _ratio(spread, activity.spread_baseline)
+            activity.spread_baseline = _ewma(activity.spread_baseline, spread, alpha)
+        
+        # Volume is cumulative for the session; a drop means a new session
+        if volume is not None and activity.last_volume is not None and elapsed and volume >= activity.last_volume:
+            volume_rate = (volume - activity.last_volume) / elapsed
+            activity.ratios["volume"] = _ratio(volume_rate, activity.volume_rate_baseline)
+            activity.volume_rate_baseline = _ewma(activity.volume_rate_baseline, volume_rate, alpha)
+        
+        activity.last_price = price or activity.last_price
+        activity.last_volume = volume
+        activity.last_observed = now
+    
+    def _budget_floor(self, now: datetime) -> float:
+        """Smallest interval per symbol that keeps today's samples within budget."""
+        if self._budget_day != now.date():
+            self._budget_day = now.date()
+            self.samples_today = 0
+        
+        remaining = self.daily_budget - self.samples_today
+        if remaining <= 0:
+            return float(lean_config.SAMPLING_RATES["weekends"])
+        
+        seconds_left = (datetime.combine(now.date() + timedelta(days=1), datetime.min.time(),
+                                         tzinfo=now.tzinfo) - now).total_seconds()
+        return max(1, len(self.symbols)) * seconds_left / remaining
+    
+    def _decide(self, symbol: str, now: Optional[datetime] = None) -> Tuple[float, str, bool]:
+        """Interval (seconds), activity regime and whether the budget set the interval."""
+        now = now or self.market_hours.get_current_et_time()
+        base = self.session_interval(now)
+        ratios = self._activity(symbol).ratios
+        
+        if max(ratios.values()) >= data_optimization.SAMPLING_FAST_THRESHOLD:
+            regime, interval = REGIME_FAST, base * data_optimization.SAMPLING_FAST_FACTOR
+        elif max(ratios["volatility"], ratios["volume"]) <= data_optimization.SAMPLING_QUIET_THRESHOLD:
+            regime, interval = REGIME_QUIET, base * data_optimization.SAMPLING_QUIET_FACTOR
+        else:
+            regime, interval = REGIME_NORMAL, base
+        
+        interval = max(interval, data_optimization.SAMPLING_MIN_INTERVAL)
+        floor = self._budget_floor(now)
+        return max(interval, floor), regime, floor > interval
+    
+    def interval(self, symbol: str) -> float:
+        """Seconds between samples for a symbol right now."""
+        return self._decide(symbol)[0]
+    
+    def should_sample(self, symbol: str, now: Optional[float] = None) -> bool:
+        """True (and the sample is counted) if the symbol is due for a data point."""
+        now = time.monotonic() if now is None else now
+        activity = self._activity(symbol)
+        interval, activity.regime, budget_limited = self._decide(symbol)
+        
+        if now - activity.last_sampled < interval:
+            self.stats["skipped"] += 1
+            return False
+        
+        activity.last_sampled = now
+        self.samples_today += 1
+        self.stats["sampled"] += 1
+        if budget_limited:
+            self.stats["budget_limited"] += 1
+        if activity.regime == REGIME_FAST:
+            self.stats["fast_decisions"] += 1
+        elif activity.regime == REGIME_QUIET:
+            self.stats["quiet_decisions"] += 1
+        return True
+    
+    def cycle_interval(self) -> float:
+        """How often a polling loop should check symbols: the shortest interval."""
+        if not self.symbols:
+            return max(self.session_interval() * data_optimization.SAMPLING_FAST_FACTOR,
+                       data_optimization.SAMPLING_MIN_INTERVAL)
+        return min(self.interval(symbol) for symbol in self.symbols)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "session": self.market_hours.get_market_session().value,
+            "session_interval_seconds": self.session_interval(),
+            "samples_today": self.samples_today,
+            "daily_budget": self.daily_budget,
+            "symbols": {
+                symbol: {
+                    "regime": activity.regime,
+                    "interval_seconds": round(self.interval(symbol), 3),
+                    **{f"{name}_ratio": round(value, 3) for name, value in activity.ratios.items()}
+                }
+                for symbol, activity in self.symbols.items()
+            }
+        }
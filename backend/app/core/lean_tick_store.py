@@ -0,0 +1,359 @@
+"""
+Lean Tick Store for Smart-0DTE-System
+Local columnar storage of ticks and option quotes for history scans.
+
+Data is laid out as ``{root}/{kind}/symbol={SYMBOL}/date={YYYY-MM-DD}/*.arrow``.
+Every file is an uncompressed Arrow IPC file holding one record batch, so it
+can be memory-mapped and its numeric columns viewed as NumPy arrays without
+copying or decoding. The ingest path appends one file per flushed batch;
+past days are compacted into a single file sorted by timestamp.
+"""
+
+import logging
+import os
+import shutil
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.lean_config import data_optimization
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+MARKET_DATA = "market_data"
+OPTIONS_DATA = "options_data"
+
+# Column name -> Arrow type name, and the record field holding the symbol
+_LAYOUTS: Dict[str, Tuple[List[Tuple[str, str]], str]] = {
+    MARKET_DATA: ([
+        ("timestamp", "timestamp"),
+        ("price", "float64"),
+        ("volume", "int64"),
+        ("bid", "float64"),
+        ("ask", "float64"),
+        ("high", "float64"),
+        ("low", "float64"),
+        ("open", "float64"),
+        ("vwap", "float64"),
+        ("change", "float64"),
+        ("change_percent", "float64"),
+    ], "symbol"),
+    OPTIONS_DATA: ([
+        ("timestamp", "timestamp"),
+        ("option_symbol", "string"),
+        ("strike", "float64"),
+        ("expiry", "timestamp"),
+        ("option_type", "string"),
+        ("bid", "float64"),
+        ("ask", "float64"),
+        ("volume", "int64"),
+        ("open_interest", "int64"),
+        ("implied_volatility", "float64"),
+        ("delta", "float64"),
+        ("gamma", "float64"),
+        ("theta", "float64"),
+        ("vega", "float64"),
+    ], "underlying_symbol"),
+}
+
+
+def _to_datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    return datetime.fromisoformat(str(value))
+
+
+def _column(values: List[Any], type_name: str) -> "pa.Array":
+    """Build an Arrow column; missing floats become NaN so reads stay zero-copy."""
+    if type_name == "timestamp":
+        return pa.array([_to_datetime(value) for value in values], type=pa.timestamp("us"))
+    if type_name == "float64":
+        return pa.array([np.nan if value is None else float(value) for value in values], type=pa.float64())
+    if type_name == "int64":
+        return pa.array([0 if value is None else int(value) for value in values], type=pa.int64())
+    return pa.array(["" if value is None else str(value) for value in values], type=pa.string())
+
+
+class TickStore:
+    """Append-only columnar store partitioned by kind, symbol and day."""
+    
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or data_optimization.TICK_STORE_DIR)
+        self.enabled = data_optimization.TICK_STORE_ENABLED and pa is not None
+        
+        if data_optimization.TICK_STORE_ENABLED and pa is None:
+            logger.warning("pyarrow is not installed, tick store disabled")
+        
+        self.stats = {
+            "files_written": 0,
+            "rows_written": 0,
+            "bytes_written": 0,
+            "files_read": 0,
+            "rows_read": 0,
+            "days_compacted": 0,
+            "days_pruned": 0
+        }
+    
+    def _day_dir(self, kind: str, symbol: str, day: date) -> Path:
+        return self.root / kind / f"symbol={symbol}" / f"date={day.isoformat()}"
+    
+    def _day_files(self, kind: str, symbol: str, day: date) -> List[Path]:
+        day_dir = self._day_dir(kind, symbol, day)
+        if not day_dir.exists():
+            return []
+        return sorted(day_dir.glob("*.arrow"))
+    
+    def days(self, kind: str, symbol: str) -> List[date]:
+        """Days with stored data for a symbol, oldest first."""
+        symbol_dir = self.root / kind / f"symbol={symbol}"
+        if not symbol_dir.exists():
+            return []
+        return sorted(
+            date.fromisoformat(path.name.split("=", 1)[1])
+            for path in symbol_dir.glob("date=*") if path.is_dir()
+        )
+    
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    
+    def append(self, kind: str, records: Sequence[Dict[str, Any]]) -> int:
+        """Append records, writing one file per (symbol, day) they span."""
+        if not self.enabled or not records:
+            return 0
+        
+        fields, symbol_field = _LAYOUTS[kind]
+        groups: Dict[Tuple[str, date], List[Dict[str, Any]]] = {}
+        for record in records:
+            day = _to_datetime(record["timestamp"]).date()
+            groups.setdefault((record[symbol_field], day), []).append(record)
+        
+        for (symbol, day), group in groups.items():
+            table = pa.table({
+                name: _column([record.get(name) for record in group], type_name)
+                for name, type_name in fields
+            })
+            self._write_file(self._day_dir(kind, symbol, day), table)
+        
+        return len(records)
+    
+    def append_columns(
+        self,
+        kind: str,
+        symbol: str,
+        columns: Dict[str, np.ndarray],
+        name: Optional[str] = None
+    ) -> int:
+        """Append column arrays for one symbol, writing one file per day they span.
+        
+        Layout columns missing from ``columns`` are written as NaN, 0 or "".
+        With ``name`` the files are named ``{name}.arrow``, so writing the same
+        batch again replaces them instead of duplicating rows.
+        """
+        timestamps = np.asarray(columns["timestamp"]).astype("datetime64[us]")
+        if not self.enabled or len(timestamps) == 0:
+            return 0
+        
+        fields, _ = _LAYOUTS[kind]
+        days = timestamps.astype("datetime64[D]")
+        file_name = f"{name}.arrow" if name else None
+        
+        for day in np.unique(days):
+            mask = days == day
+            arrays = {}
+            for field_name, type_name in fields:
+                values = timestamps if field_name == "timestamp" else columns.get(field_name)
+                if values is None:
+                    arrays[field_name] = _column([None] * int(mask.sum()), type_name)
+                elif type_name == "timestamp":
+                    arrays[field_name] = pa.array(np.asarray(values).astype("datetime64[us]")[mask])
+                elif type_name == "string":
+                    arrays[field_name] = pa.array(np.asarray(values)[mask].astype(str))
+                else:
+                    arrays[field_name] = pa.array(np.asarray(values)[mask].astype(type_name))
+            self._write_file(self._day_dir(kind, symbol, day.astype(date)), pa.table(arrays), name=file_name)
+        
+        return len(timestamps)
+    
+    def _write_file(self, day_dir: Path, table: "pa.Table", name: Optional[str] = None) -> Path:
+        """Write a table as a single-batch IPC file, atomically."""
+        day_dir.mkdir(parents=True, exist_ok=True)
+        path = day_dir / (name or f"{time.time_ns():020d}-{os.getpid()}.arrow")
+        tmp_path = path.with_suffix(".tmp")
+        
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa_ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=max(1, table.num_rows))
+        os.replace(tmp_path, path)
+        
+        self.stats["files_written"] += 1
+        self.stats["rows_written"] += table.num_rows
+        self.stats["bytes_written"] += path.stat().st_size
+        return path
+    
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    
+    def _read_file(self, path: Path, columns: Optional[List[str]]) -> "pa.Table":
+        table = pa_ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+        self.stats["files_read"] += 1
+        self.stats["rows_read"] += table.num_rows
+        return table.select(columns) if columns else table
+    
+    def scan(
+        self,
+        kind: str,
+        symbol: str,
+        start: datetime,
+        end: datetime,
+        columns: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """Yield one dict of column arrays per file within [start, end).
+        
+        Numeric columns of files entirely inside the range are views into the
+        memory-mapped file. Only files straddling a range boundary are masked,
+        which copies them. Rows within a file are in write order, so call
+        ``compact`` first if sorted output is needed.
+        """
+        if not self.enabled:
+            return
+        
+        read_columns = None
+        if columns:
+            read_columns = list(dict.fromkeys(["timestamp", *columns]))
+        start_ts = np.datetime64(start, "us")
+        end_ts = np.datetime64(end, "us")
+        
+        for day in self.days(kind, symbol):
+            if day < start.date() or day > end.date():
+                continue
+            
+            for path in self._day_files(kind, symbol, day):
+                table = self._read_file(path, read_columns)
+                if table.num_rows == 0:
+                    continue
+                
+                arrays = {name: table.column(name).to_numpy() for name in table.column_names}
+                timestamps = arrays["timestamp"]
+                if timestamps.min() < start_ts or timestamps.max() >= end_ts:
+                    mask = (timestamps >= start_ts) & (timestamps < end_ts)
+                    if not mask.any():
+                        continue
+                    arrays = {name: values[mask] for name, values in arrays.items()}
+                
+                if columns:
+                    arrays = {name: arrays[name] for name in columns}
+                yield arrays
+    
+    def read(
+        self,
+        kind: str,
+        symbol: str,
+        start: datetime,
+        end: datetime,
+        columns: Optional[List[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """Read [start, end) into one array per column, sorted by timestamp."""
+        names = columns or [name for name, _ in _LAYOUTS[kind][0]]
+        scan_columns = list(dict.fromkeys(["timestamp", *names]))
+        chunks = list(self.scan(kind, symbol, start, end, scan_columns))
+        
+        if not chunks:
+            return {name: np.array([]) for name in names}
+        
+        order = np.argsort(np.concatenate([chunk["timestamp"] for chunk in chunks]), kind="stable")
+        return {name: np.concatenate([chunk[name] for chunk in chunks])[order] for name in names}
+    
+    def tail(self, kind: str, symbol: str, column: str, count: int, lookback_days: int = 5) -> np.ndarray:
+        """Last ``count`` values of a column from the most recent days."""
+        if not self.enabled:
+            return np.array([])
+        
+        recent_days = [day for day in self.days(kind, symbol)
+                       if day >= datetime.utcnow().date() - timedelta(days=lookback_days)]
+        values: List[np.ndarray] = []
+        collected = 0
+        
+        for day in reversed(recent_days):
+            for path in reversed(self._day_files(kind, symbol, day)):
+                chunk = self._read_file(path, [column]).column(column).to_numpy()
+                values.append(chunk)
+                collected += len(chunk)
+                if collected >= count:
+                    return np.concatenate(values[::-1])[-count:]
+        
+        return np.concatenate(values[::-1]) if values else np.array([])
+    
+    def export_parquet(self, kind: str, symbol: str, start: datetime, end: datetime, path: str) -> int:
+        """Write [start, end) to a Parquet file for archiving or external tools."""
+        arrays = self.read(kind, symbol, start, end)
+        table = pa.table(arrays)
+        pq.write_table(table, path, compression="zstd")
+        return table.num_rows
+    
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+    
+    def compact(self, kind: str, symbol: str, day: date) -> bool:
+        """Merge a day's files into one file sorted by timestamp.
+        
+        Meant for days that no longer receive writes; files appended while
+        compacting are left alone and picked up by the next compaction.
+        """
+        files = self._day_files(kind, symbol, day)
+        if len(files) < 2:
+            return False
+        
+        tables = [pa_ipc.open_file(pa.memory_map(str(path), "r")).read_all() for path in files]
+        merged = pa.concat_tables(tables).sort_by("timestamp")
+        
+        # Replace the oldest file so file order still follows write order
+        self._write_file(files[0].parent, merged, name=files[0].name)
+        for path in files[1:]:
+            path.unlink(missing_ok=True)
+        
+        self.stats["days_compacted"] += 1
+        return True
+    
+    def maintain(self, retention_days: Optional[int] = None) -> None:
+        """Compact past days and drop days older than the retention window."""
+        if not self.enabled or not self.root.exists():
+            return
+        
+        today = datetime.utcnow().date()
+        cutoff = today - timedelta(days=retention_days or data_optimization.TICK_STORE_RETENTION_DAYS)
+        
+        for kind in _LAYOUTS:
+            kind_dir = self.root / kind
+            if not kind_dir.exists():
+                continue
+            
+            for symbol_dir in kind_dir.glob("symbol=*"):
+                symbol = symbol_dir.name.split("=", 1)[1]
+                for day in self.days(kind, symbol):
+                    if day < cutoff:
+                        shutil.rmtree(self._day_dir(kind, symbol, day), ignore_errors=True)
+                        self.stats["days_pruned"] += 1
+                    elif day < today:
+                        self.compact(kind, symbol, day)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "root": str(self.root), **self.stats}
+
+
+# Global tick store instance
+tick_store = TickStore()
@@ -0,0 +1,251 @@
+"""
+Lean Tree Compiler for Smart-0DTE-System
+Fitted tree ensembles flattened into NumPy node arrays for batch inference.
+
+``compile_ensemble`` exports every tree of a random forest, extra-trees or
+gradient boosting regressor (or a single decision tree) into one set of
+contiguous arrays: split feature, threshold, first child, NaN direction and
+leaf value per node. Nodes are renumbered breadth first so the children of a
+node are adjacent; one step of the traversal is then
+``left[node] + (x > threshold[node])`` for every (row, tree) pair at once.
+Leaves point at themselves with an infinite threshold, so the walk runs a
+fixed number of steps (the depth of the deepest tree) without branching.
+
+Inputs are compared as float32, like sklearn's own trees, so predictions
+match sklearn up to the order of floating point sums. ``max_abs_error``
+measures that; ``TreeCompiler`` compiles each model once, checks it against
+sklearn on a probe batch and falls back to the model if they disagree.
+"""
+
+import logging
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.ensemble import (
+    ExtraTreesClassifier, ExtraTreesRegressor, GradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor
+)
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+
+from app.core.lean_config import ai_optimization
+
+logger = logging.getLogger(__name__)
+
+_LEAF = -1  # sklearn's TREE_LEAF
+_FORESTS = (RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, ExtraTreesRegressor)
+_TREES = (DecisionTreeClassifier, DecisionTreeRegressor)  # Includes the ExtraTree* subclasses
+
+
+def _flatten_tree(tree: Any) -> Tuple[np.ndarray, ...]:
+    """One sklearn ``tree_`` renumbered breadth first: (feature, threshold, left, nan_right, value)."""
+    children_left, children_right = tree.children_left, tree.children_right
+    order = [0]
+    for node in order:
+        if children_left[node] != _LEAF:
+            order.extend((children_left[node], children_right[node]))
+    order = np.array(order, dtype=np.intp)
+    position = np.empty(tree.node_count, dtype=np.intp)
+    position[order] = np.arange(len(order))
+    
+    is_leaf = children_left[order] == _LEAF
+    feature = np.where(is_leaf, 0, tree.feature[order]).astype(np.intp)
+    threshold = np.where(is_leaf, np.inf, tree.threshold[order])
+    left = np.where(is_leaf, np.arange(len(order)), position[np.where(is_leaf, 0, children_left[order])])
+    missing_go_to_left = getattr(tree, "missing_go_to_left", None)
+    if missing_go_to_left is None:
+        nan_right = ~is_leaf
+    else:
+        nan_right = ~is_leaf & (np.asarray(missing_go_to_left)[order] == 0)
+    return feature, threshold, left, nan_right, tree.value[order][:, 0, :]
+
+
+class CompiledTreeEnsemble:
+    """Flat-array predictor with the ``predict``/``predict_proba`` interface of the source model."""
+    
+    def __init__(
+        self,
+        trees: List[Any],
+        n_features: int,
+        classes: Optional[np.ndarray] = None,
+        scale: float = 1.0,
+        offset: float = 0.0,
+        average: bool = True
+    ):
+        parts = [_flatten_tree(tree) for tree in trees]
+        sizes = [len(part[0]) for part in parts]
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.intp)
+        
+        self.feature = np.concatenate([part[0] for part in parts])
+        self.threshold = np.concatenate([part[1] for part in parts])
+        self.left = np.concatenate([part[2] + start for part, start in zip(parts, starts)])
+        self.nan_right = np.concatenate([part[3] for part in parts])
+        value = np.concatenate([part[4] for part in parts])
+        if classes is not None:
+            # Leaf class weights as probabilities, as sklearn's trees return them
+            value = value / np.maximum(value.sum(axis=1, keepdims=True), np.finfo(np.float64).tiny)
+        self.value = value * (scale / len(trees) if average else scale)
+        self.roots = starts
+        self.depth = max(tree.max_depth for tree in trees)
+        
+        self.n_trees = len(trees)
+        self.n_features_in_ = n_features
+        self.classes_ = classes
+        self.offset = offset
+    
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+    
+    def _leaves(self, X: Any) -> np.ndarray:
+        """(trees, rows) leaf node of every row in every tree; tree-major so the
+        per-tree values are summed over contiguous rows.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected (n, {self.n_features_in_}) features, got {X.shape}")
+        
+        rows = len(X)
+        flat = X.ravel()
+        base = np.tile(np.arange(rows, dtype=np.intp) * self.n_features_in_, self.n_trees)
+        node = np.repeat(self.roots, rows)
+        feature, threshold, left = self.feature, self.threshold, self.left
+        
+        if np.isnan(flat).any():
+            nan_right = self.nan_right
+            for _ in range(self.depth):
+                x = flat[base + feature[node]]
+                node = left[node] + ((x > threshold[node]) | (np.isnan(x) & nan_right[node]))
+        else:
+            for _ in range(self.depth):
+                node = left[node] + (flat[base + feature[node]] > threshold[node])
+        return node.reshape(self.n_trees, rows)
+    
+    def apply(self, X: Any) -> np.ndarray:
+        """(rows, trees) leaf node of every row in every tree."""
+        return self._leaves(X).T
+    
+    def _raw(self, X: Any) -> np.ndarray:
+        return self.value[self._leaves(X)].sum(axis=0) + self.offset
+    
+    def predict_proba(self, X: Any) -> np.ndarray:
+        if self.classes_ is None:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._raw(X)
+    
+    def predict(self, X: Any) -> np.ndarray:
+        raw = self._raw(X)
+        if self.classes_ is not None:
+            return self.classes_[raw.argmax(axis=1)]
+        return raw[:, 0]
+
+
+def compile_ensemble(model: Any) -> CompiledTreeEnsemble:
+    """Flatten a fitted single-output tree model; ValueError if it is not supported."""
+    if not hasattr(model, "n_features_in_"):
+        raise ValueError(f"{type(model).__name__} is not fitted")
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Only single-output models can be compiled")
+    classes = getattr(model, "classes_", None)
+    
+    if isinstance(model, _TREES):
+        return CompiledTreeEnsemble([model.tree_], model.n_features_in_, classes)
+    
+    if isinstance(model, _FORESTS):
+        return CompiledTreeEnsemble([estimator.tree_ for estimator in model.estimators_], model.n_features_in_, classes)
+    
+    if isinstance(model, GradientBoostingRegressor):
+        # Raw prediction: constant init estimate plus the shrunken sum of the stages
+        if isinstance(model.init_, str):  # "zero"
+            offset = 0.0
+        else:
+            offset = float(np.ravel(model.init_.predict(np.zeros((1, model.n_features_in_))))[0])
+        return CompiledTreeEnsemble(
+            [estimator.tree_ for estimator in model.estimators_[:, 0]], model.n_features_in_,
+            scale=model.learning_rate, offset=offset, average=False
+        )
+    
+    raise ValueError(f"{type(model).__name__} cannot be compiled")
+
+
+def max_abs_error(model: Any, compiled: CompiledTreeEnsemble, X: Any) -> float:
+    """Largest difference between sklearn and the compiled predictor on ``X``
+    (probabilities for classifiers, predictions for regressors); inf if a
+    classifier picks a different class where the top two are not tied.
+    """
+    if compiled.classes_ is not None:
+        expected, actual = model.predict_proba(X), compiled.predict_proba(X)
+        top_two = np.sort(expected, axis=1)[:, -2:] if expected.shape[1] > 1 else np.zeros((len(expected), 2))
+        decided = top_two[:, 1] - top_two[:, 0] > 1e-9
+        if not np.array_equal(expected.argmax(axis=1)[decided], actual.argmax(axis=1)[decided]):
+            return float("inf")
+    else:
+        expected, actual = model.predict(X), compiled.predict(X)
+    return float(np.max(np.abs(np.asarray(expected) - actual))) if len(actual) else 0.0
+
+
+class TreeCompiler:
+    """Compiles each fitted model once and serves the compiled form until it is refitted."""
+    
+    def __init__(self, tolerance: Optional[float] = None, probe_rows: Optional[int] = None):
+        self.tolerance = tolerance if tolerance is not None else ai_optimization.COMPILED_TREE_TOLERANCE
+        self.probe_rows = probe_rows or ai_optimization.COMPILED_TREE_PROBE_ROWS
+        # model -> (fitted trees the entry was built from, their fit signature, compiled or None)
+        self._compiled: "weakref.WeakKeyDictionary[Any, Tuple[Any, tuple, Optional[CompiledTreeEnsemble]]]" = weakref.WeakKeyDictionary()
+        self.stats = {
+            "compiled": 0,
+            "unsupported": 0,
+            "parity_failures": 0,
+            "compile_ms": 0.0
+        }
+    
+    def compiled(self, model: Any) -> Optional[CompiledTreeEnsemble]:
+        """Compiled form of ``model``, or None if it cannot be compiled or fails parity."""
+        if model is None or not hasattr(model, "n_features_in_"):
+            return None
+        
+        # Refitting replaces the trees, and a warm_start refit appends to the
+        # same estimators_ list, so both the object and its length are checked.
+        # The entry holds the fitted object, so its id is not reused meanwhile.
+        fitted = getattr(model, "estimators_", None)
+        if fitted is not None:
+            signature = (id(fitted), len(fitted))
+        else:
+            fitted = getattr(model, "tree_", None)
+            signature = (id(fitted), getattr(fitted, "node_count", 0))
+        entry = self._compiled.get(model)
+        if entry is not None and entry[1] == signature:
+            return entry[2]
+        
+        started = time.perf_counter()
+        try:
+            compiled = compile_ensemble(model)
+        except ValueError as e:
+            logger.debug(f"Not compiling {type(model).__name__}: {e}")
+            self.stats["unsupported"] += 1
+            compiled = None
+        
+        if compiled is not None:
+            probe = np.random.default_rng(0).normal(size=(self.probe_rows, compiled.n_features_in_))
+            error = max_abs_error(model, compiled, probe)
+            if error > self.tolerance:
+                logger.warning(f"Compiled {type(model).__name__} differs from sklearn by {error}, not using it")
+                self.stats["parity_failures"] += 1
+                compiled = None
+            else:
+                self.stats["compiled"] += 1
+        
+        self.stats["compile_ms"] += (time.perf_counter() - started) * 1000
+        self._compiled[model] = (fitted, signature, compiled)
+        return compiled
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "compile_ms": round(self.stats["compile_ms"], 3),
+            "models": len(self._compiled)
+        }
+
+
+# Global tree compiler used by the AI services
+tree_compiler = TreeCompiler()
@@ -0,0 +1,303 @@
+"""
+Lean Write-Behind Buffer for Smart-0DTE-System
+In-process batching of database writes with a crash-safe disk journal.
+"""
+
+import asyncio
+import logging
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.lean_config import data_optimization
+from app.core.lean_codecs import codec_registry
+
+logger = logging.getLogger(__name__)
+
+_RECORD_HEADER = struct.Struct("<I")  # Little-endian payload length
+
+
+class WriteJournal:
+    """Append-only journal split into segments, one per flush.
+    
+    Every buffered record is appended to the active segment before it is
+    acknowledged. A flush rotates the segment, and the closed segment is
+    deleted only after its records have been written to the database, so
+    anything still on disk at startup was never persisted. Appends are
+    flushed to the OS (they survive a process crash), and segments are
+    fsynced when rotated.
+    """
+    
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.codec = codec_registry.get_codec("msgpack", "none")
+        # Segments left behind by a previous process, replayed on start
+        self.recovered_segments = self.segments()
+        self._sequence = max((self._segment_sequence(path) for path in self.recovered_segments), default=0)
+        self._active_path: Optional[Path] = None
+        self._active_file = None
+    
+    @staticmethod
+    def _segment_sequence(path: Path) -> int:
+        return int(path.stem)
+    
+    def segments(self) -> List[Path]:
+        """Segments on disk, oldest first."""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob("*.journal"), key=self._segment_sequence)
+    
+    def append(self, record: Any) -> None:
+        if self._active_file is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._sequence += 1
+            self._active_path = self.directory / f"{self._sequence:012d}.journal"
+            self._active_file = open(self._active_path, "ab")
+        
+        payload = self.codec.encode(record, compress=False)
+        self._active_file.write(_RECORD_HEADER.pack(len(payload)) + payload)
+        self._active_file.flush()
+    
+    def rotate(self) -> Optional[Path]:
+        """Close the active segment and return its path (None if empty)."""
+        if self._active_file is None:
+            return None
+        
+        self._active_file.flush()
+        os.fsync(self._active_file.fileno())
+        self._active_file.close()
+        
+        closed_path = self._active_path
+        self._active_file = None
+        self._active_path = None
+        return closed_path
+    
+    def read_segment(self, path: Path) -> List[Any]:
+        """Read all complete records from a segment, ignoring a torn tail."""
+        records = []
+        data = path.read_bytes()
+        offset = 0
+        
+        while offset + _RECORD_HEADER.size <= len(data):
+            (length,) = _RECORD_HEADER.unpack_from(data, offset)
+            start = offset + _RECORD_HEADER.size
+            if start + length > len(data):
+                logger.warning(f"Ignoring truncated record at end of {path.name}")
+                break
+            records.append(self.codec.decode(data[start:start + length]))
+            offset = start + length
+        
+        return records
+    
+    def dead_letter(self, records: List[Any]) -> Path:
+        """Write records that cannot be stored to ``dead_letter/``, which is not replayed."""
+        directory = self.directory / "dead_letter"
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{time.time_ns()}.journal"
+        with open(path, "wb") as dead_file:
+            for record in records:
+                payload = self.codec.encode(record, compress=False)
+                dead_file.write(_RECORD_HEADER.pack(len(payload)) + payload)
+            dead_file.flush()
+            os.fsync(dead_file.fileno())
+        return path
+    
+    @staticmethod
+    def discard(path: Path) -> None:
+        path.unlink(missing_ok=True)
+    
+    def close(self) -> None:
+        self.rotate()
+
+
+class WriteBehindBuffer:
+    """Bounded in-memory buffer that writes batches to storage off the hot path.
+    
+    Producers call ``put_nowait`` (never blocks, returns False when the buffer
+    is full) or ``put`` (waits for space, i.e. backpressure). A background
+    flusher drains the buffer when it reaches ``batch_size`` records or every
+    ``flush_interval`` seconds, and hands chunks of at most ``batch_size`` to
+    ``writer``. Failed writes are retried with backoff; their journal segments
+    stay on disk until they succeed and are replayed on the next start, so
+    delivery is at-least-once. A chunk that fails ``max_retries`` times in a
+    row is moved to a dead-letter segment and counted, so one bad record
+    cannot stall the buffer and block producers.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        writer: Callable[[List[Any]], Awaitable[None]],
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        journal_dir: Optional[str] = None,
+        max_retries: Optional[int] = None
+    ):
+        self.name = name
+        self.writer = writer
+        self.batch_size = batch_size or data_optimization.BATCH_PROCESSING_SIZE
+        self.flush_interval = flush_interval or data_optimization.BATCH_PROCESSING_INTERVAL
+        self.max_retries = max_retries or data_optimization.WRITE_BEHIND_MAX_RETRIES
+        self.queue: asyncio.Queue = asyncio.Queue(
+            maxsize=max_pending or data_optimization.WRITE_BEHIND_MAX_PENDING
+        )
+        self.journal = WriteJournal(Path(journal_dir or data_optimization.WRITE_BEHIND_JOURNAL_DIR) / name)
+        
+        self.is_running = False
+        self._flush_requested = asyncio.Event()
+        self._flusher_task: Optional[asyncio.Task] = None
+        # Flushed batches whose write has not succeeded yet: (segment, records)
+        self._unwritten: List[Tuple[Optional[Path], List[Any]]] = []
+        self._chunk_failures = 0  # Consecutive failures of the oldest unwritten chunk
+        
+        self.stats = {
+            "enqueued": 0,
+            "rejected": 0,
+            "flushes": 0,
+            "records_written": 0,
+            "write_failures": 0,
+            "dead_lettered_chunks": 0,
+            "dead_lettered_records": 0,
+            "replayed": 0,
+            "last_flush_ms": 0.0
+        }
+    
+    async def start(self) -> None:
+        """Replay journal segments left by a previous run, then start flushing."""
+        for segment in self.journal.recovered_segments:
+            records = self.journal.read_segment(segment)
+            if records:
+                logger.info(f"Replaying {len(records)} journaled {self.name} records from {segment.name}")
+                self.stats["replayed"] += len(records)
+                self._unwritten.append((segment, records))
+            else:
+                self.journal.discard(segment)
+        
+        self.is_running = True
+        self._flusher_task = asyncio.create_task(self._flush_loop())
+    
+    async def stop(self) -> None:
+        """Stop the flusher and write out everything still buffered."""
+        self.is_running = False
+        self._flush_requested.set()
+        
+        if self._flusher_task:
+            await self._flusher_task
+        
+        await self.flush()
+        self.journal.close()
+    
+    def put_nowait(self, record: Any) -> bool:
+        """Buffer a record without waiting; returns False if the buffer is full."""
+        try:
+            self.queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return False
+        
+        self.journal.append(record)
+        self._on_enqueued()
+        return True
+    
+    async def put(self, record: Any) -> None:
+        """Buffer a record, waiting for space if the buffer is full."""
+        await self.queue.put(record)
+        self.journal.append(record)
+        self._on_enqueued()
+    
+    def _on_enqueued(self) -> None:
+        self.stats["enqueued"] += 1
+        if self.queue.qsize() >= self.batch_size:
+            self._flush_requested.set()
+    
+    async def flush(self) -> None:
+        """Write batches left over from failed flushes, then drain the buffer.
+        
+        While earlier batches cannot be written the buffer is not drained, so
+        it fills up and producers see backpressure instead of memory growing.
+        """
+        await self._write_unwritten()
+        
+        records = []
+        while not self.queue.empty():
+            records.append(self.queue.get_nowait())
+        
+        # Drain and rotate without yielding so the segment matches the batch
+        segment = self.journal.rotate()
+        if records:
+            self._unwritten.append((segment, records))
+        elif segment is not None:
+            self.journal.discard(segment)
+        
+        await self._write_unwritten()
+    
+    async def _write_unwritten(self) -> None:
+        """Write pending batches in order, at-least-once, in chunks of batch_size."""
+        while self._unwritten:
+            segment, records = self._unwritten[0]
+            start_time = time.perf_counter()
+            written = 0
+            
+            while records:
+                chunk = records[:self.batch_size]
+                try:
+                    await self.writer(chunk)
+                    written += len(chunk)
+                except Exception:
+                    self._chunk_failures += 1
+                    if self._chunk_failures < self.max_retries:
+                        raise
+                    self._dead_letter(chunk)
+                self._chunk_failures = 0
+                records = records[self.batch_size:]
+                # Do not rewrite chunks that already succeeded if a later one fails
+                self._unwritten[0] = (segment, records)
+            
+            self._unwritten.pop(0)
+            if segment is not None:
+                self.journal.discard(segment)
+            
+            self.stats["flushes"] += 1
+            self.stats["records_written"] += written
+            self.stats["last_flush_ms"] = round((time.perf_counter() - start_time) * 1000, 3)
+    
+    def _dead_letter(self, chunk: List[Any]) -> None:
+        path = self.journal.dead_letter(chunk)
+        self.stats["dead_lettered_chunks"] += 1
+        self.stats["dead_lettered_records"] += len(chunk)
+        logger.error(
+            f"Write-behind chunk of {len(chunk)} {self.name} records failed "
+            f"{self.max_retries} times, moved to {path}"
+        )
+    
+    async def _flush_loop(self) -> None:
+        """Flush on size or time, backing off while the writer is failing."""
+        backoff = 1.0
+        
+        while self.is_running:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            
+            try:
+                await self.flush()
+                backoff = 1.0
+            except Exception as e:
+                self.stats["write_failures"] += 1
+                logger.error(f"Write-behind flush for {self.name} failed, retrying in {backoff:.0f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "pending": self.queue.qsize(),
+            "unwritten_batches": len(self._unwritten),
+            "capacity": self.queue.maxsize,
+            **self.stats
+        }
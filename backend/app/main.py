@@ -21,6 +21,7 @@ from services.autonomous_trading_service import autonomous_trading_service
 from services.signal_generation_service import signal_generation_service
 from services.analytics_service import analytics_service
 from services.scheduler_service import scheduler_service
+from app.api.metrics import router as metrics_router
 
 # Setup logging
 logging.basicConfig(
@@ -47,6 +48,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Databento usage metering (Prometheus scrape target and usage totals)
+app.include_router(metrics_router)
+
 # Pydantic models for request/response
 class AutomationSettings(BaseModel):
     masterSwitch: bool
@@ -10,6 +10,9 @@ import json
 import math
 import statistics
 
+import numpy as np
+
+from app.core.lean_tick_store import tick_store, MARKET_DATA
 from .autonomous_trading_service import autonomous_trading_service
 from .signal_generation_service import signal_generation_service
 from .market_hours_service import market_hours_service
@@ -437,8 +440,43 @@ class AnalyticsService:
             "execution_time": "2.3 seconds"
         }
         
+        # Underlying benchmark over the same window from the local tick store
+        market_history = self.get_market_history_summary(
+            parameters.get("symbol", "SPY"),
+            datetime.strptime(backtest_result["start_date"], "%Y-%m-%d"),
+            datetime.now()
+        )
+        if market_history:
+            backtest_result["market_history"] = market_history
+        
         return backtest_result
     
+    def get_market_history_summary(self, symbol: str, start: datetime, end: datetime) -> Dict[str, Any]:
+        """Summarize stored ticks for a symbol without going through the database"""
+        prices = []
+        volume = 0
+        
+        # Files are scanned one at a time as memory-mapped arrays
+        for chunk in tick_store.scan(MARKET_DATA, symbol, start, end, ["price", "volume"]):
+            prices.append(chunk["price"])
+            volume += int(chunk["volume"].sum())
+        
+        if not prices:
+            return {}
+        
+        prices = np.concatenate(prices)
+        returns = np.diff(np.log(prices[prices > 0]))
+        running_max = np.maximum.accumulate(prices)
+        
+        return {
+            "symbol": symbol,
+            "data_points": int(len(prices)),
+            "total_volume": volume,
+            "underlying_return": round(float(prices[-1] / prices[0] - 1) * 100, 2),
+            "realized_volatility": round(float(returns.std()) * 100, 4) if len(returns) > 1 else 0.0,
+            "max_drawdown": round(float(((prices - running_max) / running_max).min()) * 100, 2)
+        }
+    
     def get_strategy_optimization_suggestions(self, strategy: str) -> List[Dict[str, Any]]:
         """Get optimization suggestions for a strategy"""
         suggestions = [
@@ -10,6 +10,7 @@ from typing import Dict, Any, List, Optional
 from enum import Enum
 import json
 
+from app.core.lean_order_book import order_book_engine
 from .market_hours_service import market_hours_service, MarketSession
 
 logger = logging.getLogger(__name__)
@@ -276,14 +277,33 @@ class AutonomousTradingService:
             if should_exit:
                 await self._close_position(position_id, exit_reason)
     
+    def _contract_symbol(self, position: Dict[str, Any]) -> Optional[str]:
+        """OPRA raw (OSI) symbol of a position's option contract"""
+        try:
+            if position['expiry'] == '0DTE':
+                expiry = market_hours_service.get_current_et_time().date()
+            else:
+                expiry = datetime.fromisoformat(str(position['expiry'])).date()
+            right = 'C' if str(position['type']).upper().startswith('C') else 'P'
+            strike = int(round(float(position['strike']) * 1000))
+            return f"{position['symbol']:<6}{expiry:%y%m%d}{right}{strike:08d}"
+        except (KeyError, TypeError, ValueError):
+            return None
+    
     async def _update_position_price(self, position: Dict[str, Any]):
         """Update position's current price and P&L"""
         import random
         
-        # Simulate price movement
         entry_price = position['entry_price']
-        price_change = random.uniform(-0.3, 0.3)  # ±30% price movement
-        current_price = max(0.01, entry_price * (1 + price_change))
+        
+        # Mark to the contract's microprice when its book is on the feed
+        contract_symbol = self._contract_symbol(position)
+        current_price = order_book_engine.microprice(contract_symbol) if contract_symbol else None
+        
+        if current_price is None:
+            # Simulate price movement
+            price_change = random.uniform(-0.3, 0.3)  # ±30% price movement
+            current_price = max(0.01, entry_price * (1 + price_change))
         
         position['current_price'] = round(current_price, 2)
         
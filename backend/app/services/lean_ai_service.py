@@ -5,12 +5,11 @@ Optimized AI/ML service with efficient learning and reduced computational costs.
 
 import asyncio
 import logging
-import pickle
 import gzip
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 import numpy as np
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 import json
 
 # Lightweight ML libraries for lean deployment
@@ -22,11 +21,70 @@ from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_sc
 import joblib
 
 from app.core.lean_config import lean_config, ai_optimization
-from app.core.lean_cache import lean_cache_manager, cache_result
+from app.core.lean_cache import cache_result
 from app.core.lean_database import lean_db_manager
+from app.core.lean_feature_store import feature_store, hours_to_close, COLUMNS
+from app.core.lean_model_registry import model_registry
+from app.core.lean_tree_compiler import tree_compiler
 
 logger = logging.getLogger(__name__)
 
+SIGNAL_TYPES = ['correlation', 'momentum', 'volatility', 'ai_prediction']
+STRATEGIES = [
+    'iron_condor', 'bull_call_spread', 'bear_put_spread',
+    'long_straddle', 'long_strangle', 'iron_butterfly',
+    'short_straddle'
+]
+INFERENCE_OUTPUTS = ('signal', 'volatility', 'strategy')
+# Estimators kept in the model registry, one artifact each
+MODEL_NAMES = ('signal_classifier', 'volatility_predictor', 'correlation_predictor', 'strategy_selector', 'feature_scaler')
+
+
+def _prediction_key(service: 'LeanAIService', market_data: Dict[str, Any], signal: Optional[Dict[str, Any]] = None):
+    """Cache key inputs of a prediction, taken from what the features are built from.
+    
+    The symbol, the model version, the snapshot fields the features read and
+    the feature store's revision; no features are extracted for the key.
+    Timestamps count only to the minute (for ``price_history`` snapshots),
+    so repeated snapshots of an unchanged market hit the cache. Floats keep
+    the cache's default key precision, which resolves a cent on any price
+    below $10,000; coarser rounding would merge prices whose returns differ.
+    """
+    price = market_data.get('price')
+    history = market_data.get('price_history')
+    timestamp = market_data.get('timestamp') if history is not None else None
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.replace(second=0, microsecond=0)
+    symbol = market_data.get('symbol', '')
+    inputs = (
+        feature_store.revision(None if price else symbol),
+        price, market_data.get('volume'), market_data.get('avg_volume'),
+        market_data.get('vix'), market_data.get('vix_change'),
+        market_data.get('correlation_spy_qqq'), market_data.get('correlation_spy_iwm'),
+        history, timestamp
+    )
+    if signal is not None:
+        inputs += (signal.get('signal_type'), signal.get('confidence'))
+    # One tuple, so the inputs share a single digest in the key
+    return symbol, service.model_version, inputs
+
+
+class _RegistryModel:
+    """Model attribute loaded from the model registry on first access."""
+    
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+    
+    def __get__(self, service: Any, owner: Optional[type] = None) -> Any:
+        if service is None:
+            return self
+        if self.name not in service._models:
+            service._models[self.name] = model_registry.load(self.name, service.model_version) if service.model_version else None
+        return service._models[self.name]
+    
+    def __set__(self, service: Any, model: Any) -> None:
+        service._models[self.name] = model
+
 
 @dataclass
 class ModelPerformance:
@@ -54,7 +112,17 @@ class AIUsageStats:
 class LeanAIService:
     """Optimized AI service with efficient learning and prediction."""
     
+    # Loaded lazily from the promoted registry version
+    signal_classifier = _RegistryModel()
+    volatility_predictor = _RegistryModel()
+    correlation_predictor = _RegistryModel()
+    strategy_selector = _RegistryModel()
+    feature_scaler = _RegistryModel()
+    
     def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self.model_version: Optional[str] = None
+        
         # Lightweight models for lean deployment
         self.signal_classifier = None
         self.volatility_predictor = None
@@ -97,6 +165,7 @@ class LeanAIService:
             'correlation_spy_iwm', 'vix_level', 'vix_change',
             'time_to_close', 'market_regime', 'momentum_score'
         ]
+        self.feature_columns = [COLUMNS[name] for name in self.essential_features]
     
     async def initialize(self) -> None:
         """Initialize AI service with lean configuration."""
@@ -121,26 +190,35 @@ class LeanAIService:
             await self._initialize_default_models()
     
     async def _load_models(self) -> None:
-        """Load pre-trained models from cache or storage."""
+        """Use the promoted model version; models are memory-mapped on first use."""
         try:
-            # Try to load from cache first
-            cached_models = await lean_cache_manager.get("ai_models")
+            manifest = await asyncio.to_thread(model_registry.manifest)
             
-            if cached_models:
-                self.signal_classifier = cached_models.get('signal_classifier')
-                self.volatility_predictor = cached_models.get('volatility_predictor')
-                self.correlation_predictor = cached_models.get('correlation_predictor')
-                self.strategy_selector = cached_models.get('strategy_selector')
-                
-                logger.info("Loaded models from cache")
-            else:
-                # Initialize new models
+            if manifest is None:
+                await self._initialize_default_models()
+            elif manifest.get('features') != self.essential_features:
+                logger.warning(f"Model version {manifest['version']} was trained on other features, using defaults")
                 await self._initialize_default_models()
+            else:
+                self._use_model_version(manifest)
+                logger.info(f"Using model version {manifest['version']}")
                 
         except Exception as e:
             logger.error(f"Failed to load models: {e}")
             await self._initialize_default_models()
     
+    def _use_model_version(self, manifest: Dict[str, Any]) -> None:
+        """Switch to a registry version: drop loaded models and restore its metrics."""
+        self._models.clear()
+        self.model_version = manifest['version']
+        for model_name, metrics in manifest.get('metrics', {}).items():
+            if model_name in self.model_performance:
+                last_updated = metrics.get('last_updated')
+                self.model_performance[model_name] = ModelPerformance(**{
+                    **metrics,
+                    'last_updated': datetime.fromisoformat(last_updated) if last_updated else None
+                })
+    
     async def _initialize_default_models(self) -> None:
         """Initialize default lightweight models."""
         try:
@@ -184,230 +262,296 @@ class LeanAIService:
             raise
     
     async def _initialize_feature_scaler(self) -> None:
-        """Initialize feature scaler with cached data if available."""
+        """Initialize feature scaler unless the registry version provides one."""
         try:
-            cached_scaler = await lean_cache_manager.get("feature_scaler")
-            
-            if cached_scaler:
-                self.feature_scaler = cached_scaler
-                logger.info("Loaded feature scaler from cache")
-            else:
+            if self.feature_scaler is None or not self._is_fitted(self.feature_scaler):
                 # Initialize with dummy data
                 dummy_features = np.random.randn(100, len(self.essential_features))
-                self.feature_scaler.fit(dummy_features)
-                
-                # Cache the scaler
-                await lean_cache_manager.set("feature_scaler", self.feature_scaler, ttl=86400)
+                self.feature_scaler = StandardScaler().fit(dummy_features)
                 
         except Exception as e:
             logger.error(f"Failed to initialize feature scaler: {e}")
     
+    def _extract_feature_matrix(self, snapshots: List[Dict[str, Any]]) -> np.ndarray:
+        """One (N, F) feature matrix for a batch of market snapshots.
+        
+        Rows are gathered from the feature store, with the price changes taken
+        against the snapshot's own price and the volume ratio from its
+        ``volume``/``avg_volume`` when given. Snapshots that carry their own
+        ``price_history`` are built from their fields alone.
+        """
+        start_time = datetime.utcnow()
+        
+        matrix = feature_store.matrix(
+            [market_data.get('symbol', '') for market_data in snapshots],
+            self.feature_columns,
+            prices=[market_data.get('price') or np.nan for market_data in snapshots]
+        )
+        
+        volume_ratio = self.feature_columns.index(COLUMNS['volume_ratio'])
+        for row, market_data in enumerate(snapshots):
+            if market_data.get('price_history') is not None:
+                matrix[row] = self._snapshot_features(market_data)
+            elif market_data.get('avg_volume'):
+                matrix[row, volume_ratio] = market_data.get('volume', 0) / market_data['avg_volume']
+        
+        # VIX features come from the snapshot until the store has seen a VIX print
+        vix_level = self.feature_columns.index(COLUMNS['vix_level'])
+        missing = np.flatnonzero(np.isnan(matrix[:, vix_level]))
+        if len(missing):
+            vix = np.array([snapshots[row].get('vix', 20) for row in missing], dtype=np.float64)
+            matrix[missing, vix_level] = vix
+            matrix[missing, self.feature_columns.index(COLUMNS['vix_change'])] = [
+                snapshots[row].get('vix_change', 0) for row in missing
+            ]
+            matrix[missing, self.feature_columns.index(COLUMNS['market_regime'])] = np.digitize(vix, (15, 25))
+        
+        # Track computation time
+        compute_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+        self.usage_stats.compute_time_ms += compute_time
+        self.usage_stats.feature_extractions += len(snapshots)
+        
+        return matrix
+    
+    def _snapshot_features(self, market_data: Dict[str, Any]) -> np.ndarray:
+        """Features of one snapshot from its own fields, without the feature store.
+        
+        ``price_history`` holds one close per minute, oldest first; the
+        definitions match the feature store's. Correlations are read from the
+        snapshot when present, 0 otherwise.
+        """
+        price = float(market_data.get('price') or 0.0)
+        history = np.asarray(market_data.get('price_history', ()), dtype=np.float64)
+        values = dict.fromkeys(self.essential_features, 0.0)
+        
+        for lag, name in ((1, 'price_change_1m'), (5, 'price_change_5m'), (15, 'price_change_15m')):
+            if len(history) >= lag and history[-lag] > 0 and price > 0:
+                values[name] = price / history[-lag] - 1
+        values['momentum_score'] = values['price_change_1m'] + values['price_change_5m'] + values['price_change_15m']
+        
+        window = history[-(ai_optimization.FEATURE_VOLATILITY_WINDOW + 1):]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = np.diff(window) / window[:-1]
+        returns = returns[np.isfinite(returns)]
+        if len(returns) > 1:
+            values['volatility_1h'] = float(np.std(returns, ddof=1))
+        
+        avg_volume = market_data.get('avg_volume')
+        values['volume_ratio'] = market_data.get('volume', 0) / avg_volume if avg_volume else 1.0
+        values['correlation_spy_qqq'] = market_data.get('correlation_spy_qqq', 0.0)
+        values['correlation_spy_iwm'] = market_data.get('correlation_spy_iwm', 0.0)
+        
+        vix = market_data.get('vix', 20)
+        values['vix_level'] = vix
+        values['vix_change'] = market_data.get('vix_change', 0)
+        values['market_regime'] = 0 if vix < 15 else (1 if vix < 25 else 2)
+        values['time_to_close'] = hours_to_close(market_data.get('timestamp') or datetime.utcnow())
+        
+        return np.array([values[name] for name in self.essential_features], dtype=np.float64)
+    
+    def _training_matrix(self, samples: List[Dict[str, Any]]) -> np.ndarray:
+        """Features each feedback sample was predicted on.
+        
+        The vector recorded with the sample's signal is used when present;
+        otherwise it is rebuilt from the sample's own market data. The
+        feature store only holds the current state, so it is never used here.
+        """
+        rows = []
+        for result in samples:
+            recorded = (result.get('signal') or {}).get('features')
+            if recorded is None:
+                recorded = result['market_data'].get('features')
+            if recorded is not None and len(recorded) == len(self.essential_features):
+                rows.append(np.asarray(recorded, dtype=np.float64))
+            else:
+                rows.append(self._snapshot_features(result['market_data']))
+        return np.array(rows)
+    
     def _extract_essential_features(self, market_data: Dict[str, Any]) -> np.ndarray:
         """Extract essential features for lean AI processing."""
-        try:
-            start_time = datetime.utcnow()
-            
-            features = []
-            
-            # Price change features (lightweight)
-            price = market_data.get('price', 0)
-            prev_prices = market_data.get('price_history', [price])
-            
-            if len(prev_prices) >= 15:
-                features.extend([
-                    (price - prev_prices[-1]) / prev_prices[-1] if prev_prices[-1] > 0 else 0,  # 1m change
-                    (price - prev_prices[-5]) / prev_prices[-5] if prev_prices[-5] > 0 else 0,  # 5m change
-                    (price - prev_prices[-15]) / prev_prices[-15] if prev_prices[-15] > 0 else 0  # 15m change
-                ])
-            else:
-                features.extend([0, 0, 0])
-            
-            # Volume ratio
-            volume = market_data.get('volume', 0)
-            avg_volume = market_data.get('avg_volume', volume)
-            volume_ratio = volume / avg_volume if avg_volume > 0 else 1
-            features.append(volume_ratio)
-            
-            # Volatility (simplified calculation)
-            if len(prev_prices) >= 60:
-                price_changes = np.diff(prev_prices[-60:])
-                volatility = np.std(price_changes) if len(price_changes) > 0 else 0
-            else:
-                volatility = 0
-            features.append(volatility)
-            
-            # Correlation features (simplified)
-            spy_price = market_data.get('spy_price', price)
-            qqq_price = market_data.get('qqq_price', price)
-            iwm_price = market_data.get('iwm_price', price)
-            
-            # Simple correlation approximation
-            correlation_spy_qqq = 0.8 + np.random.normal(0, 0.1)  # Mock correlation
-            correlation_spy_iwm = 0.7 + np.random.normal(0, 0.1)  # Mock correlation
-            features.extend([correlation_spy_qqq, correlation_spy_iwm])
-            
-            # VIX features
-            vix_level = market_data.get('vix', 20)
-            vix_change = market_data.get('vix_change', 0)
-            features.extend([vix_level, vix_change])
-            
-            # Time features
-            current_time = datetime.utcnow()
-            market_close = current_time.replace(hour=16, minute=0, second=0, microsecond=0)
-            time_to_close = (market_close - current_time).total_seconds() / 3600  # Hours
-            features.append(max(0, time_to_close))
-            
-            # Market regime (simplified)
-            if vix_level < 15:
-                market_regime = 0  # Low volatility
-            elif vix_level < 25:
-                market_regime = 1  # Normal volatility
-            else:
-                market_regime = 2  # High volatility
-            features.append(market_regime)
-            
-            # Momentum score (simplified)
-            momentum_score = sum(features[:3])  # Sum of price changes
-            features.append(momentum_score)
-            
-            # Ensure we have the right number of features
-            while len(features) < len(self.essential_features):
-                features.append(0)
-            
-            features = features[:len(self.essential_features)]
-            
-            # Track computation time
-            compute_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-            self.usage_stats.compute_time_ms += compute_time
-            self.usage_stats.feature_extractions += 1
-            
-            return np.array(features).reshape(1, -1)
-            
-        except Exception as e:
-            logger.error(f"Failed to extract features: {e}")
-            return np.zeros((1, len(self.essential_features)))
+        return self._extract_feature_matrix([market_data])
     
-    @cache_result(ttl=1800, key_prefix="ai_prediction")
-    async def generate_signal_prediction(self, market_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate signal prediction with caching for efficiency."""
-        try:
-            start_time = datetime.utcnow()
-            
-            # Extract features
-            features = self._extract_essential_features(market_data)
-            
-            # Scale features
-            scaled_features = self.feature_scaler.transform(features)
-            
-            # Generate prediction
-            if self.signal_classifier is not None:
-                # Predict signal type and confidence
-                signal_proba = self.signal_classifier.predict_proba(scaled_features)[0]
-                signal_class = self.signal_classifier.predict(scaled_features)[0]
-                
-                # Map to signal types
-                signal_types = ['correlation', 'momentum', 'volatility', 'ai_prediction']
-                signal_type = signal_types[signal_class] if signal_class < len(signal_types) else 'ai_prediction'
-                
-                confidence = float(np.max(signal_proba))
-                
-                prediction = {
-                    'signal_type': signal_type,
-                    'confidence': confidence,
-                    'timestamp': datetime.utcnow(),
-                    'symbol': market_data.get('symbol', 'UNKNOWN'),
-                    'features_used': len(self.essential_features),
-                    'model_version': 'lean_v1.0'
-                }
-                
-                # Track performance
-                compute_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-                self.usage_stats.compute_time_ms += compute_time
-                self.usage_stats.predictions_today += 1
+    @staticmethod
+    def _is_fitted(model: Any) -> bool:
+        return model is not None and hasattr(model, 'n_features_in_')
+    
+    @staticmethod
+    def _inference_model(model: Any) -> Any:
+        """Compiled flat-array form of a fitted tree ensemble, or the model itself."""
+        if not ai_optimization.COMPILED_TREE_INFERENCE:
+            return model
+        return tree_compiler.compiled(model) or model
+    
+    def _run_models(
+        self,
+        snapshots: List[Dict[str, Any]],
+        signals: Optional[List[Dict[str, Any]]] = None,
+        outputs: Tuple[str, ...] = INFERENCE_OUTPUTS
+    ) -> List[Dict[str, Any]]:
+        """Requested outputs for every snapshot: features are built and scaled once,
+        and each model runs once over the whole matrix.
+        
+        Classes come from the argmax over ``predict_proba``, so the probabilities
+        that give the confidence are not computed a second time by ``predict``.
+        Models that are missing or not trained yet fall back per row.
+        """
+        start_time = datetime.utcnow()
+        rows = len(snapshots)
+        features = self._extract_feature_matrix(snapshots)
+        scaled = self.feature_scaler.transform(features)
+        results: List[Dict[str, Any]] = [{'symbol': data.get('symbol', 'UNKNOWN')} for data in snapshots]
+        
+        # The strategy fallback needs a signal for each row
+        if 'signal' in outputs or ('strategy' in outputs and signals is None):
+            if self._is_fitted(self.signal_classifier):
+                classifier = self._inference_model(self.signal_classifier)
+                proba = classifier.predict_proba(scaled)
+                best = proba.argmax(axis=1)
+                labels = classifier.classes_[best]
+                confidence = proba[np.arange(rows), best]
+                self.model_performance['signal_classifier'].prediction_count += rows
                 
-                return prediction
-            
+                for result, label, row_confidence, row_features in zip(results, labels, confidence, features):
+                    result['signal'] = {
+                        'signal_type': SIGNAL_TYPES[label] if 0 <= label < len(SIGNAL_TYPES) else 'ai_prediction',
+                        'confidence': float(row_confidence),
+                        'timestamp': start_time,
+                        'symbol': result['symbol'],
+                        'features_used': len(self.essential_features),
+                        'model_version': 'lean_v1.0',
+                        # Kept for feedback training: the store only knows the current state
+                        'features': row_features.tolist()
+                    }
             else:
                 # Fallback prediction
-                return {
-                    'signal_type': 'ai_prediction',
-                    'confidence': 0.5,
-                    'timestamp': datetime.utcnow(),
-                    'symbol': market_data.get('symbol', 'UNKNOWN'),
-                    'features_used': 0,
-                    'model_version': 'fallback'
-                }
-                
-        except Exception as e:
-            logger.error(f"Failed to generate signal prediction: {e}")
-            return {
+                for result, row_features in zip(results, features):
+                    result['signal'] = {
+                        'signal_type': 'ai_prediction',
+                        'confidence': 0.5,
+                        'timestamp': start_time,
+                        'symbol': result['symbol'],
+                        'features_used': 0,
+                        'model_version': 'fallback',
+                        'features': row_features.tolist()
+                    }
+        
+        if 'volatility' in outputs:
+            if self._is_fitted(self.volatility_predictor):
+                volatility = np.maximum(0.0, self._inference_model(self.volatility_predictor).predict(scaled))
+                self.model_performance['volatility_predictor'].prediction_count += rows
+            else:
+                # Fallback to current VIX level
+                volatility = [data.get('vix', 20.0) / 100.0 for data in snapshots]
+            for result, row_volatility in zip(results, volatility):
+                result['volatility'] = float(row_volatility)
+        
+        if 'strategy' in outputs:
+            strategy_idx = [-1] * rows
+            if self._is_fitted(self.strategy_selector):
+                selector = self._inference_model(self.strategy_selector)
+                proba = selector.predict_proba(scaled)
+                strategy_idx = selector.classes_[proba.argmax(axis=1)]
+                self.model_performance['strategy_selector'].prediction_count += rows
+            
+            for row, (result, idx) in enumerate(zip(results, strategy_idx)):
+                if 0 <= idx < len(STRATEGIES):
+                    result['strategy'] = STRATEGIES[idx]
+                else:
+                    signal = signals[row] if signals is not None else result['signal']
+                    result['strategy'] = self._fallback_strategy(snapshots[row], signal)
+        
+        if 'signal' not in outputs:
+            for result in results:
+                result.pop('signal', None)
+        
+        # Track performance
+        compute_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+        self.usage_stats.compute_time_ms += compute_time
+        self.usage_stats.predictions_today += rows
+        
+        return results
+    
+    @staticmethod
+    def _fallback_strategy(market_data: Dict[str, Any], signal: Dict[str, Any]) -> str:
+        """Strategy selection based on signal type and market conditions."""
+        signal_type = signal.get('signal_type', 'ai_prediction')
+        confidence = signal.get('confidence', 0.5)
+        vix = market_data.get('vix', 20)
+        
+        if signal_type == 'correlation' and confidence > 0.7:
+            return 'iron_condor'
+        elif signal_type == 'momentum' and confidence > 0.75:
+            if vix < 20:
+                return 'bull_call_spread'
+            else:
+                return 'bear_put_spread'
+        elif signal_type == 'volatility':
+            if vix > 25:
+                return 'long_straddle'
+            else:
+                return 'iron_butterfly'
+        else:
+            return 'iron_condor'  # Conservative default
+    
+    async def predict_batch(
+        self,
+        snapshots: List[Dict[str, Any]],
+        signals: Optional[List[Dict[str, Any]]] = None,
+        outputs: Tuple[str, ...] = INFERENCE_OUTPUTS
+    ) -> List[Dict[str, Any]]:
+        """Signal, volatility and strategy for many snapshots (all underlyings,
+        every candidate strike) in chunks of ``INFERENCE_BATCH_SIZE`` rows.
+        
+        Returns one dict per snapshot, in order, with ``symbol`` and the
+        requested ``outputs``. ``signals`` optionally supplies the signal the
+        strategy fallback uses for each row.
+        """
+        results: List[Dict[str, Any]] = []
+        for start in range(0, len(snapshots), self.batch_size):
+            chunk = snapshots[start:start + self.batch_size]
+            chunk_signals = signals[start:start + self.batch_size] if signals is not None else None
+            try:
+                results.extend(self._run_models(chunk, chunk_signals, outputs))
+            except Exception as e:
+                logger.error(f"Failed to run batch inference on {len(chunk)} snapshots: {e}")
+                results.extend(self._error_result(data, e, outputs) for data in chunk)
+        return results
+    
+    @staticmethod
+    def _error_result(market_data: Dict[str, Any], error: Exception, outputs: Tuple[str, ...]) -> Dict[str, Any]:
+        symbol = market_data.get('symbol', 'UNKNOWN')
+        result: Dict[str, Any] = {'symbol': symbol}
+        if 'signal' in outputs:
+            result['signal'] = {
                 'signal_type': 'error',
                 'confidence': 0.0,
                 'timestamp': datetime.utcnow(),
-                'symbol': market_data.get('symbol', 'UNKNOWN'),
-                'error': str(e)
+                'symbol': symbol,
+                'error': str(error)
             }
+        if 'volatility' in outputs:
+            result['volatility'] = 0.2  # Default 20% volatility
+        if 'strategy' in outputs:
+            result['strategy'] = 'iron_condor'
+        return result
+    
+    @cache_result(ttl=1800, key_prefix="ai_prediction", key=_prediction_key)
+    async def generate_signal_prediction(self, market_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate signal prediction with caching for efficiency."""
+        results = await self.predict_batch([market_data], outputs=('signal',))
+        return results[0]['signal']
     
-    @cache_result(ttl=3600, key_prefix="volatility_prediction")
+    @cache_result(ttl=3600, key_prefix="volatility_prediction", key=_prediction_key)
     async def predict_volatility(self, market_data: Dict[str, Any]) -> float:
         """Predict volatility with caching."""
-        try:
-            features = self._extract_essential_features(market_data)
-            scaled_features = self.feature_scaler.transform(features)
-            
-            if self.volatility_predictor is not None:
-                volatility = self.volatility_predictor.predict(scaled_features)[0]
-                return max(0.0, float(volatility))
-            
-            # Fallback to current VIX level
-            return market_data.get('vix', 20.0) / 100.0
-            
-        except Exception as e:
-            logger.error(f"Failed to predict volatility: {e}")
-            return 0.2  # Default 20% volatility
+        results = await self.predict_batch([market_data], outputs=('volatility',))
+        return results[0]['volatility']
     
-    @cache_result(ttl=600, key_prefix="strategy_recommendation")
+    @cache_result(ttl=600, key_prefix="strategy_recommendation", key=_prediction_key)
     async def recommend_strategy(self, market_data: Dict[str, Any], signal: Dict[str, Any]) -> str:
         """Recommend optimal strategy based on market conditions."""
-        try:
-            features = self._extract_essential_features(market_data)
-            scaled_features = self.feature_scaler.transform(features)
-            
-            if self.strategy_selector is not None:
-                strategy_idx = self.strategy_selector.predict(scaled_features)[0]
-                
-                strategies = [
-                    'iron_condor', 'bull_call_spread', 'bear_put_spread',
-                    'long_straddle', 'long_strangle', 'iron_butterfly',
-                    'short_straddle'
-                ]
-                
-                if 0 <= strategy_idx < len(strategies):
-                    return strategies[strategy_idx]
-            
-            # Fallback strategy selection based on signal type and market conditions
-            signal_type = signal.get('signal_type', 'ai_prediction')
-            confidence = signal.get('confidence', 0.5)
-            vix = market_data.get('vix', 20)
-            
-            if signal_type == 'correlation' and confidence > 0.7:
-                return 'iron_condor'
-            elif signal_type == 'momentum' and confidence > 0.75:
-                if vix < 20:
-                    return 'bull_call_spread'
-                else:
-                    return 'bear_put_spread'
-            elif signal_type == 'volatility':
-                if vix > 25:
-                    return 'long_straddle'
-                else:
-                    return 'iron_butterfly'
-            else:
-                return 'iron_condor'  # Conservative default
-                
-        except Exception as e:
-            logger.error(f"Failed to recommend strategy: {e}")
-            return 'iron_condor'
+        results = await self.predict_batch([market_data], [signal], outputs=('strategy',))
+        return results[0]['strategy']
     
     async def update_models_with_feedback(self, trading_results: List[Dict[str, Any]]) -> None:
         """Update models with trading feedback for continuous learning."""
@@ -418,24 +562,15 @@ class LeanAIService:
             start_time = datetime.utcnow()
             
             # Prepare training data
-            features_list = []
-            labels_list = []
+            samples = [result for result in trading_results if 'market_data' in result and 'outcome' in result]
             
-            for result in trading_results:
-                if 'market_data' in result and 'outcome' in result:
-                    features = self._extract_essential_features(result['market_data'])
-                    outcome = 1 if result['outcome'] > 0 else 0  # Binary classification
-                    
-                    features_list.append(features[0])
-                    labels_list.append(outcome)
-            
-            if len(features_list) < ai_optimization.TRAINING_BATCH_SIZE:
-                logger.debug(f"Insufficient data for model update: {len(features_list)} samples")
+            if len(samples) < ai_optimization.TRAINING_BATCH_SIZE:
+                logger.debug(f"Insufficient data for model update: {len(samples)} samples")
                 return
             
-            # Convert to numpy arrays
-            X = np.array(features_list)
-            y = np.array(labels_list)
+            # Features each sample was predicted on, binary labels
+            X = self._training_matrix(samples)
+            y = np.array([1 if result['outcome'] > 0 else 0 for result in samples])
             
             # Update feature scaler
             self.feature_scaler.partial_fit(X)
@@ -462,8 +597,8 @@ class LeanAIService:
                 self.model_performance['signal_classifier'].last_updated = datetime.utcnow()
                 self.model_performance['signal_classifier'].training_samples += len(y)
             
-            # Cache updated models
-            await self._cache_models()
+            # Persist the updated models as a new version
+            await self._save_models()
             
             # Track usage
             compute_time = (datetime.utcnow() - start_time).total_seconds() * 1000
@@ -475,24 +610,33 @@ class LeanAIService:
         except Exception as e:
             logger.error(f"Failed to update models with feedback: {e}")
     
-    async def _cache_models(self) -> None:
-        """Cache models for persistence and quick loading."""
+    async def _save_models(self) -> None:
+        """Save the models as a registry version and promote it."""
         try:
-            models_dict = {
-                'signal_classifier': self.signal_classifier,
-                'volatility_predictor': self.volatility_predictor,
-                'correlation_predictor': self.correlation_predictor,
-                'strategy_selector': self.strategy_selector
-            }
-            
-            # Cache with compression for efficiency
-            await lean_cache_manager.set("ai_models", models_dict, ttl=86400)  # 24 hours
-            await lean_cache_manager.set("feature_scaler", self.feature_scaler, ttl=86400)
+            models = {name: getattr(self, name) for name in MODEL_NAMES}
+            if not any(self._is_fitted(model) for name, model in models.items() if name != 'feature_scaler'):
+                # Untrained defaults must not replace a trained version
+                return
             
-            logger.debug("Cached updated models")
+            metrics = {name: asdict(performance) for name, performance in self.model_performance.items()}
+            self.model_version = await asyncio.to_thread(
+                model_registry.save, models, metrics, {'features': self.essential_features}
+            )
+            logger.debug(f"Saved models as version {self.model_version}")
             
         except Exception as e:
-            logger.error(f"Failed to cache models: {e}")
+            logger.error(f"Failed to save models: {e}")
+    
+    async def promote_model_version(self, version: str) -> None:
+        """Promote a saved model version and serve it from now on."""
+        await asyncio.to_thread(model_registry.promote, version)
+        await self._load_models()
+    
+    async def rollback_model_version(self) -> str:
+        """Return to the previously promoted model version."""
+        version = await asyncio.to_thread(model_registry.rollback)
+        await self._load_models()
+        return version
     
     async def get_model_performance(self) -> Dict[str, Any]:
         """Get model performance metrics."""
@@ -512,6 +656,9 @@ class LeanAIService:
             
             return {
                 'model_performance': performance_dict,
+                'model_version': self.model_version,
+                'model_registry': model_registry.get_stats(),
+                'tree_compiler': tree_compiler.get_stats(),
                 'usage_stats': {
                     'predictions_today': self.usage_stats.predictions_today,
                     'model_updates_today': self.usage_stats.model_updates_today,
@@ -585,8 +732,8 @@ class LeanAIService:
     async def close(self) -> None:
         """Close AI service and save models."""
         try:
-            # Cache final model state
-            await self._cache_models()
+            # Save final model state
+            await self._save_models()
             
             logger.info("Lean AI service closed")
             
@@ -5,34 +5,46 @@ Optimized market data service with intelligent data management and cost reductio
 
 import asyncio
 import logging
-from datetime import datetime, date, timedelta, time
+import math
+from datetime import datetime, date, timedelta, time, timezone
 from typing import Dict, List, Optional, Callable, Any, Set
 from decimal import Decimal
 import json
-import gzip
+import zlib
 from dataclasses import dataclass
 
+import numpy as np
+
 import databento as db
 from databento import DBNStore
 from databento.common.enums import Dataset, Schema, SType
-from databento.live.session import LiveSession
 
 from app.core.lean_config import lean_config, data_optimization, get_sampling_rate
 from app.core.lean_cache import lean_cache_manager, cache_result
 from app.core.lean_database import lean_db_manager
+from app.core.lean_write_buffer import WriteBehindBuffer
+from app.core.lean_tick_store import tick_store, MARKET_DATA, OPTIONS_DATA
+from app.core.lean_live_feed import LiveFeedPipeline, DatabentoLiveSource, DBNFileReplayer
+from app.core.lean_order_book import order_book_engine
+from app.core.lean_metrics import LatencyHistogram
+from app.core.lean_metering import usage_meter
+from app.core.lean_rate_limiter import databento_rate_limiter
+from app.core.lean_options_chain import ColumnarOptionsChain
+from app.core.lean_sampling import AdaptiveSampler
+from app.core.lean_backfill import HistoricalBackfill, DBNFixtureSource
+from app.core.lean_data_quality import data_quality_filter
+from app.core.lean_feature_store import feature_store
 from app.models.market_data_models import MarketDataSnapshot, OptionsChain, VIXData
+from app.services.market_hours_service import market_hours_service
 
 logger = logging.getLogger(__name__)
 
 
 @dataclass
 class DataUsageStats:
-    """Track data usage for cost optimization."""
-    api_calls_today: int = 0
+    """Track data usage for cost optimization (volumes and cost are in usage_meter)."""
     data_points_received: int = 0
     data_points_filtered: int = 0
-    compression_ratio: float = 0.0
-    cost_savings_percent: float = 0.0
 
 
 class LeanDatabentoService:
@@ -40,7 +52,9 @@ class LeanDatabentoService:
     
     def __init__(self):
         self.client = None
-        self.live_session: Optional[LiveSession] = None
+        self.live_source: Optional[DatabentoLiveSource] = None
+        self.replayer: Optional[DBNFileReplayer] = None
+        self._feed_task: Optional[asyncio.Task] = None
         self.is_running = False
         self.subscriptions = {}
         self.callbacks = {}
@@ -49,7 +63,7 @@ class LeanDatabentoService:
         
         # Data optimization settings
         self.sampling_rate = get_sampling_rate()
-        self.last_sample_time = {}
+        self.sampler = AdaptiveSampler(market_hours_service)
         self.data_filters = self._initialize_data_filters()
         self.usage_stats = DataUsageStats()
         
@@ -57,18 +71,34 @@ class LeanDatabentoService:
         self.data_cache = {}
         self.cache_timestamps = {}
         
-        # Rate limiting for cost control
-        self.api_call_count = 0
-        self.api_call_reset_time = datetime.utcnow()
+        # Write-behind buffers, one per table, so the tick path never waits on storage
+        self.write_buffers = {
+            "market_data": WriteBehindBuffer("lean_market_data", self._write_market_data_batch),
+            "options_data": WriteBehindBuffer("lean_options_data", self._write_options_data_batch)
+        }
+        
+        # Rate limiting for cost control (API budgets are taken by backfills via databento_rate_limiter)
         self.max_api_calls_per_minute = lean_config.DATABENTO_RATE_LIMIT
         
-        # Data handlers with optimization
-        self.data_handlers = {
-            Schema.TRADES: self._handle_trade_data_optimized,
-            Schema.MBO: self._handle_order_book_data_optimized,
-            Schema.TBBO: self._handle_quote_data_optimized,
-            Schema.OHLCV_1M: self._handle_ohlcv_data_optimized,
+        # Polling fan-out: at most one per-second request budget in flight at once
+        self.collection_concurrency = max(1, math.ceil(self.max_api_calls_per_minute / 60))
+        self.cycle_latency = LatencyHistogram()
+        self.fetch_latency = LatencyHistogram()
+        self.collection_stats = {
+            "cycles": 0,
+            "overruns": 0,
+            "skipped_cycles": 0,
+            "deadline_misses": 0,
+            "fetch_errors": 0
         }
+        
+        # Push pipeline: live or replayed DBN records land in per-instrument ring buffers;
+        # bad prints are rejected in batches before snapshots reach the cache or storage
+        self.feed = LiveFeedPipeline(quality=data_quality_filter)
+        # Books are built from the same records (MBO for depth, TBBO for top of book)
+        order_book_engine.attach(self.feed)
+        # Model features follow every trade of the feed
+        feature_store.attach(self.feed)
     
     def _initialize_data_filters(self) -> Dict[str, Any]:
         """Initialize intelligent data filters for cost optimization."""
@@ -85,6 +115,11 @@ class LeanDatabentoService:
         """Initialize Databento client with lean configuration."""
         try:
             if not lean_config.DATABENTO_API_KEY:
+                if lean_config.DATABENTO_REPLAY_FILE:
+                    logger.warning(f"Databento API key not configured, replaying {lean_config.DATABENTO_REPLAY_FILE}")
+                    self.replayer = DBNFileReplayer(self.feed, lean_config.DATABENTO_REPLAY_FILE)
+                    return
+                
                 logger.warning("Databento API key not configured, using mock data")
                 await self._start_mock_feed()
                 return
@@ -95,11 +130,14 @@ class LeanDatabentoService:
                 timeout=lean_config.DATABENTO_TIMEOUT
             )
             
-            # Initialize live session with optimized settings
-            self.live_session = db.Live(
-                key=lean_config.DATABENTO_API_KEY,
-                dataset=Dataset.OPRA_PILLAR,  # Options data
-                upgrade_policy=db.UpgradePolicy.UPGRADE
+            # Live subscriptions for the underlyings, started with the real-time feed
+            self.live_source = DatabentoLiveSource(
+                self.feed,
+                [
+                    (lean_config.DATABENTO_EQUITY_DATASET, schema, self.supported_symbols)
+                    for schema in lean_config.DATABENTO_LIVE_SCHEMAS
+                ],
+                meter=usage_meter
             )
             
             # Test connection and validate API limits
@@ -129,107 +167,37 @@ class LeanDatabentoService:
     
     def _should_sample_data(self, symbol: str, timestamp: datetime) -> bool:
         """Determine if data should be sampled based on intelligent sampling strategy."""
-        current_sampling_rate = get_sampling_rate()
-        
-        # Check if enough time has passed since last sample
-        last_sample = self.last_sample_time.get(symbol, datetime.min)
-        time_diff = (timestamp - last_sample).total_seconds()
-        
-        if time_diff < current_sampling_rate:
-            return False
-        
-        # Update last sample time
-        self.last_sample_time[symbol] = timestamp
-        return True
+        # Interval adapts to session, recent volatility, spread and volume, within the daily budget
+        return self.sampler.should_sample(symbol)
     
     def _is_market_hours(self, timestamp: datetime) -> bool:
         """Check if timestamp is during market hours for cost optimization."""
-        # Convert to market time (EST/EDT)
-        market_time = timestamp.replace(tzinfo=None)  # Assume UTC input
-        market_hour = (market_time.hour - 4) % 24  # Rough EST conversion
-        
-        # Market hours: 9:30 AM - 4:00 PM ET
-        if market_hour == 9 and market_time.minute >= 30:
-            return True
-        elif 10 <= market_hour <= 15:
-            return True
-        elif market_hour == 16 and market_time.minute == 0:
-            return True
-        
-        return False
+        return market_hours_service.is_trading_hours(timestamp.replace(tzinfo=timezone.utc))
     
-    def _filter_options_data(self, options_data: List[Dict]) -> List[Dict]:
+    def _filter_options_data(self, chain: ColumnarOptionsChain, expiry_date: date) -> ColumnarOptionsChain:
         """Filter options data to reduce costs and focus on relevant strikes."""
-        filtered_data = []
+        mask = chain.filter_mask(
+            min_volume=self.data_filters['min_volume_threshold'],
+            moneyness_band=0.1,  # 10% from ATM
+            expiry_date=expiry_date  # 0DTE only for cost optimization
+        )
+        filtered = chain.take(mask)
         
-        for option in options_data:
-            # Filter by volume threshold
-            if option.get('volume', 0) < self.data_filters['min_volume_threshold']:
-                continue
-            
-            # Filter by strikes range (ATM ±10 only)
-            underlying_price = option.get('underlying_price', 0)
-            strike = option.get('strike', 0)
-            
-            if underlying_price > 0:
-                strike_distance = abs(strike - underlying_price)
-                max_distance = underlying_price * 0.1  # 10% from ATM
-                
-                if strike_distance > max_distance:
-                    continue
-            
-            # Filter by expiry (0DTE only for cost optimization)
-            expiry = option.get('expiry')
-            if expiry:
-                if isinstance(expiry, str):
-                    expiry = datetime.fromisoformat(expiry)
-                
-                # Only include options expiring today
-                if expiry.date() != datetime.utcnow().date():
-                    continue
-            
-            filtered_data.append(option)
-            
-        self.usage_stats.data_points_filtered += len(options_data) - len(filtered_data)
-        return filtered_data
-    
-    def _compress_market_data(self, data: Dict[str, Any]) -> bytes:
-        """Compress market data for efficient storage and transmission."""
-        try:
-            # Remove unnecessary fields for compression
-            essential_data = {
-                'symbol': data.get('symbol'),
-                'price': round(data.get('price', 0), data_optimization.PRICE_PRECISION),
-                'volume': int(data.get('volume', 0)),
-                'timestamp': data.get('timestamp').isoformat() if data.get('timestamp') else None,
-                'change': round(data.get('change', 0), data_optimization.PRICE_PRECISION),
-                'change_percent': round(data.get('change_percent', 0), data_optimization.PERCENTAGE_PRECISION)
-            }
-            
-            # Serialize and compress
-            json_data = json.dumps(essential_data).encode('utf-8')
-            compressed_data = gzip.compress(json_data)
-            
-            # Calculate compression ratio
-            compression_ratio = len(compressed_data) / len(json_data)
-            self.usage_stats.compression_ratio = compression_ratio
-            
-            return compressed_data
-            
-        except Exception as e:
-            logger.error(f"Failed to compress market data: {e}")
-            return json.dumps(data).encode('utf-8')
+        self.usage_stats.data_points_filtered += len(chain) - len(filtered)
+        return filtered
     
     @cache_result(ttl=60, key_prefix="market_data")
     async def get_real_time_data(self, symbol: str) -> Optional[Dict[str, Any]]:
         """Get real-time market data with intelligent caching."""
+        return await self._refresh_real_time_data(symbol)
+    
+    async def _refresh_real_time_data(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Sample, fetch, cache and store one data point; bypasses the read cache
+        so the collection loop runs at the sampler's pace, not the cache TTL.
+        """
         try:
-            # Check rate limits
-            if not await self._check_rate_limits():
-                logger.warning("Rate limit exceeded, using cached data")
-                return await lean_cache_manager.get(f"market_data:{symbol}")
-            
-            # Check if we should sample this data point
+            # Check if we should sample this data point; skips are not metered as
+            # avoided cost while the polls themselves are unbilled mock data
             current_time = datetime.utcnow()
             if not self._should_sample_data(symbol, current_time):
                 return await lean_cache_manager.get(f"market_data:{symbol}")
@@ -242,19 +210,24 @@ class LeanDatabentoService:
             market_data = await self._fetch_market_data_from_api(symbol)
             
             if market_data:
+                self.sampler.observe(symbol, market_data)
+                feature_store.update(symbol, market_data['timestamp'], market_data['price'],
+                                     market_data.get('volume', 0))
+                
                 # Apply data filters
                 if self._should_store_data(market_data):
                     # Cache the data
                     await lean_cache_manager.set(f"market_data:{symbol}", market_data, ttl=60)
                     
                     # Store in database batch
-                    await self._queue_for_batch_storage(market_data)
+                    self._queue_for_batch_storage("market_data", market_data)
                     
                     self.usage_stats.data_points_received += 1
                     
                 return market_data
             
-            return None
+            # Rate limited or failed: fall back to the last cached value
+            return await lean_cache_manager.get(f"market_data:{symbol}")
             
         except Exception as e:
             logger.error(f"Failed to get real-time data for {symbol}: {e}")
@@ -263,19 +236,12 @@ class LeanDatabentoService:
     async def _fetch_market_data_from_api(self, symbol: str) -> Optional[Dict[str, Any]]:
         """Fetch market data from Databento API with error handling."""
         try:
-            self.api_call_count += 1
-            
-            # Mock implementation - replace with actual Databento API call
-            # This would be the actual API call:
-            # data = await self.client.timeseries.get_range(
-            #     dataset=lean_config.DATABENTO_DATASET,
-            #     symbols=[symbol],
-            #     schema=Schema.TRADES,
-            #     start=datetime.utcnow() - timedelta(minutes=1),
-            #     end=datetime.utcnow()
-            # )
-            
-            # For now, return mock data
+            # Latest state from the push feed, when it has data for the symbol
+            snapshot = self.feed.snapshot(symbol)
+            if snapshot:
+                return snapshot
+            
+            # Mock data until polling calls the API; the push feed is the real source
             mock_data = {
                 'symbol': symbol,
                 'price': 450.0 + (hash(symbol) % 100) / 10,  # Mock price
@@ -296,17 +262,6 @@ class LeanDatabentoService:
             logger.error(f"API call failed for {symbol}: {e}")
             return None
     
-    async def _check_rate_limits(self) -> bool:
-        """Check if we're within API rate limits."""
-        current_time = datetime.utcnow()
-        
-        # Reset counter every minute
-        if (current_time - self.api_call_reset_time).total_seconds() >= 60:
-            self.api_call_count = 0
-            self.api_call_reset_time = current_time
-        
-        return self.api_call_count < self.max_api_calls_per_minute
-    
     def _should_store_data(self, data: Dict[str, Any]) -> bool:
         """Determine if data should be stored based on significance."""
         # Check volume threshold
@@ -327,52 +282,55 @@ class LeanDatabentoService:
         
         return True
     
-    async def _queue_for_batch_storage(self, data: Dict[str, Any]) -> None:
-        """Queue data for batch storage to optimize database operations."""
-        try:
-            # Add to batch queue
-            batch_key = f"batch_storage:{data['symbol']}"
-            batch_data = await lean_cache_manager.get(batch_key, [])
-            
-            batch_data.append(data)
-            
-            # Store batch when it reaches optimal size
-            if len(batch_data) >= data_optimization.BATCH_PROCESSING_SIZE:
-                await self._process_batch_storage(batch_data)
-                await lean_cache_manager.delete(batch_key)
-            else:
-                await lean_cache_manager.set(batch_key, batch_data, ttl=300)  # 5 minutes
-                
-        except Exception as e:
-            logger.error(f"Failed to queue data for batch storage: {e}")
+    def _queue_for_batch_storage(self, table: str, data: Dict[str, Any]) -> None:
+        """Hand data to the table's write-behind buffer without waiting on storage."""
+        if not self.write_buffers[table].put_nowait(data):
+            logger.warning(f"Write-behind buffer for {table} is full, dropping record")
+    
+    async def _write_market_data_batch(self, batch_data: List[Dict[str, Any]]) -> None:
+        """Write a batch of buffered market data; errors propagate so it is retried."""
+        market_snapshots = []
+        for data in batch_data:
+            snapshot = MarketDataSnapshot(
+                symbol=data['symbol'],
+                timestamp=data['timestamp'],
+                price=data['price'],
+                volume=data['volume'],
+                change=data.get('change', 0),
+                change_percent=data.get('change_percent', 0),
+                high=data.get('high', data['price']),
+                low=data.get('low', data['price']),
+                open=data.get('open', data['price']),
+                vwap=data.get('vwap')
+            )
+            market_snapshots.append(snapshot)
+        
+        await lean_db_manager.store_market_data_batch(market_snapshots)
+        logger.debug(f"Processed batch storage of {len(batch_data)} data points")
+        
+        await self._append_to_tick_store(MARKET_DATA, batch_data)
+    
+    async def _write_options_data_batch(self, batch_data: List[Dict[str, Any]]) -> None:
+        """Write a batch of buffered options chains; errors propagate so it is retried."""
+        options_chains = [OptionsChain(**data) for data in batch_data]
+        
+        await lean_db_manager.store_options_data_batch(options_chains)
+        logger.debug(f"Processed batch storage of {len(batch_data)} options chains")
+        
+        quotes = [
+            {**option, 'underlying_symbol': chain['symbol'], 'timestamp': chain['timestamp']}
+            for chain in batch_data
+            for option in chain['options']
+        ]
+        await self._append_to_tick_store(OPTIONS_DATA, quotes)
     
-    async def _process_batch_storage(self, batch_data: List[Dict[str, Any]]) -> None:
-        """Process batch storage of market data."""
+    async def _append_to_tick_store(self, kind: str, records: List[Dict[str, Any]]) -> None:
+        """Mirror a stored batch into the columnar tick store used for history scans."""
         try:
-            # Convert to MarketDataSnapshot objects
-            market_snapshots = []
-            for data in batch_data:
-                snapshot = MarketDataSnapshot(
-                    symbol=data['symbol'],
-                    timestamp=data['timestamp'],
-                    price=data['price'],
-                    volume=data['volume'],
-                    change=data.get('change', 0),
-                    change_percent=data.get('change_percent', 0),
-                    high=data.get('high', data['price']),
-                    low=data.get('low', data['price']),
-                    open=data.get('open', data['price']),
-                    vwap=data.get('vwap')
-                )
-                market_snapshots.append(snapshot)
-            
-            # Store in database
-            await lean_db_manager.store_market_data_batch(market_snapshots)
-            
-            logger.debug(f"Processed batch storage of {len(batch_data)} data points")
-            
+            await asyncio.to_thread(tick_store.append, kind, records)
         except Exception as e:
-            logger.error(f"Failed to process batch storage: {e}")
+            # The database write already succeeded; do not fail (and replay) the batch
+            logger.error(f"Failed to append {kind} to tick store: {e}")
     
     @cache_result(ttl=300, key_prefix="options_chain")
     async def get_options_chain(self, symbol: str, expiry_date: Optional[date] = None) -> Optional[OptionsChain]:
@@ -381,25 +339,16 @@ class LeanDatabentoService:
             if not expiry_date:
                 expiry_date = datetime.utcnow().date()  # Default to 0DTE
             
-            # Check rate limits
-            if not await self._check_rate_limits():
-                logger.warning("Rate limit exceeded for options chain request")
-                return await lean_cache_manager.get(f"options_chain:{symbol}:{expiry_date}")
+            # Fetch options data (mock implementation for now)
+            chain = await self._fetch_options_data_from_api(symbol, expiry_date)
             
-            # Fetch options data (mock implementation)
-            options_data = await self._fetch_options_data_from_api(symbol, expiry_date)
-            
-            if options_data:
-                # Apply intelligent filtering
-                filtered_options = self._filter_options_data(options_data)
+            if chain is not None and len(chain):
+                # Apply intelligent filtering on the columns
+                filtered_chain = self._filter_options_data(chain, expiry_date)
                 
-                # Create OptionsChain object
-                options_chain = OptionsChain(
-                    symbol=symbol,
-                    timestamp=datetime.utcnow(),
-                    expiry=datetime.combine(expiry_date, time()),
-                    options=filtered_options
-                )
+                # Per-contract dicts are built once, here, for the model and the write path
+                chain_data = filtered_chain.to_chain_data(datetime.combine(expiry_date, time()))
+                options_chain = OptionsChain(**chain_data)
                 
                 # Cache the result
                 await lean_cache_manager.set(
@@ -408,6 +357,9 @@ class LeanDatabentoService:
                     ttl=300
                 )
                 
+                # Store in database batch
+                self._queue_for_batch_storage("options_data", chain_data)
+                
                 return options_chain
             
             return None
@@ -416,89 +368,97 @@ class LeanDatabentoService:
             logger.error(f"Failed to get options chain for {symbol}: {e}")
             return None
     
-    async def _fetch_options_data_from_api(self, symbol: str, expiry_date: date) -> List[Dict[str, Any]]:
+    async def _fetch_options_data_from_api(self, symbol: str, expiry_date: date) -> Optional[ColumnarOptionsChain]:
         """Fetch options data from Databento API."""
         try:
-            self.api_call_count += 1
-            
-            # Mock options data - replace with actual API call
+            # Mock options data until chains are pulled from the API
             underlying_price = 450.0 + (hash(symbol) % 100) / 10
-            options_data = []
             
-            # Generate mock options for ATM ±10 strikes only
-            for i in range(-10, 11):
-                strike = underlying_price + i
-                
-                # Call option
-                call_option = {
-                    'symbol': f"{symbol}{expiry_date.strftime('%y%m%d')}C{int(strike):08d}",
-                    'underlying_symbol': symbol,
-                    'strike': strike,
-                    'expiry': datetime.combine(expiry_date, time()),
-                    'option_type': 'CALL',
-                    'bid': max(0.01, underlying_price - strike + (hash(f"{symbol}C{strike}") % 100) / 100),
-                    'ask': max(0.02, underlying_price - strike + (hash(f"{symbol}C{strike}") % 100) / 100 + 0.01),
-                    'volume': max(1, hash(f"{symbol}C{strike}") % 1000),
-                    'open_interest': max(1, hash(f"{symbol}C{strike}") % 5000),
-                    'implied_volatility': 0.15 + (hash(f"{symbol}C{strike}") % 100) / 1000,
-                    'delta': max(0.01, min(0.99, 0.5 + (strike - underlying_price) / 100)),
-                    'gamma': 0.01 + (hash(f"{symbol}C{strike}") % 50) / 10000,
-                    'theta': -0.05 - (hash(f"{symbol}C{strike}") % 50) / 10000,
-                    'vega': 0.1 + (hash(f"{symbol}C{strike}") % 50) / 1000
-                }
-                options_data.append(call_option)
-                
-                # Put option
-                put_option = {
-                    'symbol': f"{symbol}{expiry_date.strftime('%y%m%d')}P{int(strike):08d}",
-                    'underlying_symbol': symbol,
-                    'strike': strike,
-                    'expiry': datetime.combine(expiry_date, time()),
-                    'option_type': 'PUT',
-                    'bid': max(0.01, strike - underlying_price + (hash(f"{symbol}P{strike}") % 100) / 100),
-                    'ask': max(0.02, strike - underlying_price + (hash(f"{symbol}P{strike}") % 100) / 100 + 0.01),
-                    'volume': max(1, hash(f"{symbol}P{strike}") % 1000),
-                    'open_interest': max(1, hash(f"{symbol}P{strike}") % 5000),
-                    'implied_volatility': 0.15 + (hash(f"{symbol}P{strike}") % 100) / 1000,
-                    'delta': max(-0.99, min(-0.01, -0.5 + (strike - underlying_price) / 100)),
-                    'gamma': 0.01 + (hash(f"{symbol}P{strike}") % 50) / 10000,
-                    'theta': -0.05 - (hash(f"{symbol}P{strike}") % 50) / 10000,
-                    'vega': 0.1 + (hash(f"{symbol}P{strike}") % 50) / 1000
-                }
-                options_data.append(put_option)
-            
-            return options_data
+            # Generate mock options for ATM ±10 strikes only, calls then puts
+            offsets = np.tile(np.arange(-10, 11, dtype=np.float64), 2)
+            is_call = np.repeat([True, False], len(offsets) // 2)
+            strike = underlying_price + offsets
+            moneyness = np.where(is_call, -offsets, offsets)  # Intrinsic value per contract
+            
+            rng = np.random.default_rng(zlib.crc32(f"{symbol}{expiry_date}".encode()))
+            noise = rng.integers(0, 100, len(strike))
+            greek_noise = rng.integers(0, 50, len(strike))
+            
+            return ColumnarOptionsChain(
+                symbol=symbol,
+                underlying_price=underlying_price,
+                timestamp=datetime.utcnow(),
+                expiry=np.full(len(strike), np.datetime64(expiry_date, "s")),
+                is_call=is_call,
+                strike=strike,
+                bid=np.maximum(0.01, moneyness + noise / 100),
+                ask=np.maximum(0.02, moneyness + noise / 100 + 0.01),
+                volume=np.maximum(1, rng.integers(0, 1000, len(strike))),
+                open_interest=np.maximum(1, rng.integers(0, 5000, len(strike))),
+                implied_volatility=0.15 + noise / 1000,
+                delta=np.where(
+                    is_call,
+                    np.clip(0.5 + offsets / 100, 0.01, 0.99),
+                    np.clip(-0.5 + offsets / 100, -0.99, -0.01)
+                ),
+                gamma=0.01 + greek_noise / 10000,
+                theta=-0.05 - greek_noise / 10000,
+                vega=0.1 + greek_noise / 1000
+            )
             
         except Exception as e:
             logger.error(f"Failed to fetch options data for {symbol}: {e}")
-            return []
+            return None
+    
+    async def backfill(
+        self,
+        start: date,
+        end: date,
+        symbols: Optional[List[str]] = None,
+        schema: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Load [start, end) of history into the tick store through the local DBN cache."""
+        if self.client is not None:
+            source = self.client
+        elif lean_config.DATABENTO_BACKFILL_FIXTURE_DIR:
+            source = DBNFixtureSource(lean_config.DATABENTO_BACKFILL_FIXTURE_DIR)
+        else:
+            raise RuntimeError("Backfill needs a Databento API key or a fixture directory")
+        
+        backfill = HistoricalBackfill(source)
+        return await backfill.run(symbols or self.supported_symbols, start, end, schema)
     
     async def get_usage_stats(self) -> Dict[str, Any]:
         """Get data usage statistics for cost monitoring."""
         try:
-            # Calculate cost savings
             total_data_points = self.usage_stats.data_points_received + self.usage_stats.data_points_filtered
             if total_data_points > 0:
                 filter_efficiency = (self.usage_stats.data_points_filtered / total_data_points) * 100
             else:
                 filter_efficiency = 0
             
-            # Estimate cost savings based on data reduction
-            estimated_cost_savings = filter_efficiency * 0.7  # Rough estimate
+            # Requests, volumes and cost are measured; savings are avoided cost over paid plus avoided
+            metering = usage_meter.get_stats()
             
             return {
-                'api_calls_today': self.usage_stats.api_calls_today,
+                'api_calls_today': metering['totals_today']['requests'],
                 'data_points_received': self.usage_stats.data_points_received,
                 'data_points_filtered': self.usage_stats.data_points_filtered,
                 'filter_efficiency_percent': round(filter_efficiency, 2),
-                'compression_ratio': round(self.usage_stats.compression_ratio, 3),
-                'estimated_cost_savings_percent': round(estimated_cost_savings, 2),
-                'current_sampling_rate': get_sampling_rate(),
-                'rate_limit_status': {
-                    'calls_this_minute': self.api_call_count,
-                    'limit_per_minute': self.max_api_calls_per_minute,
-                    'remaining': max(0, self.max_api_calls_per_minute - self.api_call_count)
-                }
+                'compression_ratio': metering['compression_ratio'],
+                'cost_today_usd': metering['totals_today']['cost_usd'],
+                'estimated_cost_savings_percent': metering['cost_savings_percent'],
+                'metering': metering,
+                'current_sampling_rate': self.sampler.cycle_interval(),
+                'sampling': self.sampler.get_stats(),
+                'data_quality': data_quality_filter.get_stats(),
+                'write_buffers': {table: buffer.get_stats() for table, buffer in self.write_buffers.items()},
+                'tick_store': tick_store.get_stats(),
+                'live_feed': self.feed.get_stats(),
+                'feature_store': feature_store.get_stats(),
+                'order_books': order_book_engine.get_stats(),
+                'collection': self.get_collection_stats(),
+                'rate_limit_status': await databento_rate_limiter.get_status()
             }
             
         except Exception as e:
@@ -525,36 +485,26 @@ class LeanDatabentoService:
         
         asyncio.create_task(mock_data_generator())
     
-    async def _handle_trade_data_optimized(self, data: Any) -> None:
-        """Handle trade data with optimization."""
-        # Implement optimized trade data handling
-        pass
-    
-    async def _handle_order_book_data_optimized(self, data: Any) -> None:
-        """Handle order book data with optimization."""
-        # Implement optimized order book data handling
-        pass
-    
-    async def _handle_quote_data_optimized(self, data: Any) -> None:
-        """Handle quote data with optimization."""
-        # Implement optimized quote data handling
-        pass
-    
-    async def _handle_ohlcv_data_optimized(self, data: Any) -> None:
-        """Handle OHLCV data with optimization."""
-        # Implement optimized OHLCV data handling
-        pass
-    
     async def start_real_time_feed(self) -> None:
         """Start optimized real-time data feed."""
         try:
             self.is_running = True
             
+            # Fill the feature windows from stored ticks before live updates arrive
+            await asyncio.to_thread(feature_store.warm_up, tick_store, MARKET_DATA,
+                                    [*self.supported_symbols, self.vix_symbol])
+            
             # Start data collection with intelligent sampling
             asyncio.create_task(self._optimized_data_collection_loop())
             
-            # Start batch processing
-            asyncio.create_task(self._batch_processing_loop())
+            # Start write-behind buffers (replays anything journaled before a crash)
+            for buffer in self.write_buffers.values():
+                await buffer.start()
+            
+            # Start the push feed (live subscription or local DBN replay)
+            feed_source = self.live_source or self.replayer
+            if feed_source:
+                self._feed_task = asyncio.create_task(feed_source.run())
             
             # Start usage monitoring
             asyncio.create_task(self._usage_monitoring_loop())
@@ -567,39 +517,84 @@ class LeanDatabentoService:
             raise
     
     async def _optimized_data_collection_loop(self) -> None:
-        """Optimized data collection loop with intelligent sampling."""
+        """Optimized data collection loop with intelligent sampling.
+        
+        Cycles start on a fixed grid (start time + n * sampling interval), so
+        collection time does not push later cycles back. A cycle that runs past
+        its slot is counted as an overrun and the missed slots are skipped
+        rather than run back to back.
+        """
+        loop = asyncio.get_running_loop()
+        next_start = loop.time()
+        
         while self.is_running:
+            # Shortest per-symbol interval; symbols that are not due are skipped
+            current_sampling_rate = self.sampler.cycle_interval()
+            cycle_start = loop.time()
+            
             try:
-                current_sampling_rate = get_sampling_rate()
-                
-                # Collect data for all supported symbols
-                for symbol in self.supported_symbols:
-                    await self.get_real_time_data(symbol)
-                
-                await asyncio.sleep(current_sampling_rate)
-                
+                await self._collect_all_symbols(
+                    deadline=current_sampling_rate * data_optimization.DATA_COLLECTION_DEADLINE_FRACTION
+                )
             except Exception as e:
                 logger.error(f"Data collection loop error: {e}")
-                await asyncio.sleep(60)
+            
+            self.cycle_latency.observe((loop.time() - cycle_start) * 1000)
+            self.collection_stats["cycles"] += 1
+            
+            next_start += current_sampling_rate
+            now = loop.time()
+            if now >= next_start:
+                missed = int((now - next_start) // current_sampling_rate) + 1
+                next_start += missed * current_sampling_rate
+                self.collection_stats["overruns"] += 1
+                self.collection_stats["skipped_cycles"] += missed
+                logger.warning(
+                    f"Data collection cycle took {(now - cycle_start):.2f}s, "
+                    f"over the {current_sampling_rate}s sampling interval"
+                )
+            
+            await asyncio.sleep(next_start - loop.time())
     
-    async def _batch_processing_loop(self) -> None:
-        """Process batched data periodically."""
-        while self.is_running:
-            try:
-                await asyncio.sleep(data_optimization.BATCH_PROCESSING_INTERVAL)
-                
-                # Process any remaining batches
-                for symbol in self.supported_symbols:
-                    batch_key = f"batch_storage:{symbol}"
-                    batch_data = await lean_cache_manager.get(batch_key, [])
-                    
-                    if batch_data:
-                        await self._process_batch_storage(batch_data)
-                        await lean_cache_manager.delete(batch_key)
-                
-            except Exception as e:
-                logger.error(f"Batch processing loop error: {e}")
-                await asyncio.sleep(60)
+    async def _collect_all_symbols(self, deadline: float) -> None:
+        """Fetch every supported symbol concurrently, giving up after ``deadline`` seconds."""
+        semaphore = asyncio.Semaphore(self.collection_concurrency)
+        
+        async def collect(symbol: str) -> None:
+            async with semaphore:
+                loop = asyncio.get_running_loop()
+                start = loop.time()
+                try:
+                    await self._refresh_real_time_data(symbol)
+                except Exception as e:
+                    self.collection_stats["fetch_errors"] += 1
+                    logger.error(f"Data collection failed for {symbol}: {e}")
+                finally:
+                    self.fetch_latency.observe((loop.time() - start) * 1000)
+        
+        tasks = [asyncio.create_task(collect(symbol)) for symbol in self.supported_symbols]
+        if not tasks:
+            return
+        
+        _, pending = await asyncio.wait(tasks, timeout=deadline)
+        if pending:
+            # Late symbols are retried next cycle rather than delaying it
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            self.collection_stats["deadline_misses"] += len(pending)
+            logger.warning(f"{len(pending)} symbols missed the {deadline:.2f}s collection deadline")
+    
+    def get_collection_stats(self) -> Dict[str, Any]:
+        """Polling loop health: cycle and per-symbol fetch latency histograms."""
+        return {
+            **self.collection_stats,
+            "sampling_interval_seconds": self.sampler.cycle_interval(),
+            "concurrency": self.collection_concurrency,
+            "symbols": len(self.supported_symbols),
+            "cycle_latency": self.cycle_latency.to_dict(),
+            "fetch_latency": self.fetch_latency.to_dict()
+        }
     
     async def _usage_monitoring_loop(self) -> None:
         """Monitor usage and adjust settings for cost optimization."""
@@ -614,8 +609,12 @@ class LeanDatabentoService:
                     logger.warning("Approaching rate limit, reducing sampling frequency")
                     # Could implement dynamic sampling rate adjustment here
                 
-                # Log usage statistics
+                # Log usage statistics and persist today's totals
                 logger.info(f"Data usage stats: {stats}")
+                await asyncio.to_thread(usage_meter.flush)
+                
+                # Compact finished days and prune expired ones in the tick store
+                await asyncio.to_thread(tick_store.maintain)
                 
             except Exception as e:
                 logger.error(f"Usage monitoring error: {e}")
@@ -625,11 +624,22 @@ class LeanDatabentoService:
         """Stop real-time data feed."""
         self.is_running = False
         
-        if self.live_session:
-            try:
-                await self.live_session.stop()
-            except Exception as e:
-                logger.error(f"Error stopping live session: {e}")
+        for feed_source in (self.live_source, self.replayer):
+            if feed_source:
+                try:
+                    await feed_source.stop()
+                except Exception as e:
+                    logger.error(f"Error stopping live feed: {e}")
+        
+        await asyncio.to_thread(usage_meter.flush)
+        
+        # Flush buffered writes; anything that cannot be written stays journaled
+        for buffer in self.write_buffers.values():
+            if buffer.is_running:
+                try:
+                    await buffer.stop()
+                except Exception as e:
+                    logger.error(f"Error flushing {buffer.name} write buffer: {e}")
         
         logger.info("Lean real-time data feed stopped")
     
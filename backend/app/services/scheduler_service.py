@@ -14,6 +14,7 @@ from .market_hours_service import market_hours_service, MarketSession
 from .autonomous_trading_service import autonomous_trading_service
 from .signal_generation_service import signal_generation_service
 from .analytics_service import analytics_service
+from app.core.lean_database import lean_db_manager
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,7 @@ class ScheduledTaskType(Enum):
     LEARNING_CYCLE = "learning_cycle"
     EOD_REPORT = "eod_report"
     SYSTEM_MAINTENANCE = "system_maintenance"
+    DATABASE_MAINTENANCE = "database_maintenance"
     PERFORMANCE_ANALYSIS = "performance_analysis"
 
 class TaskStatus(Enum):
@@ -136,6 +138,17 @@ class SchedulerService:
                 "next_run": None
             },
             
+            # Partitions ahead of time and retention, outside market hours
+            "database_maintenance": {
+                "type": ScheduledTaskType.DATABASE_MAINTENANCE,
+                "description": "Create upcoming table partitions and drop expired data",
+                "schedule": "learning_hours",
+                "frequency": "daily",
+                "enabled": True,
+                "last_run": None,
+                "next_run": None
+            },
+            
             # Weekend activities
             "weekly_optimization": {
                 "type": ScheduledTaskType.LEARNING_CYCLE,
@@ -340,6 +353,8 @@ class SchedulerService:
                 await self._execute_eod_report()
             elif task_type == ScheduledTaskType.SYSTEM_MAINTENANCE:
                 await self._execute_system_maintenance()
+            elif task_type == ScheduledTaskType.DATABASE_MAINTENANCE:
+                await self._execute_database_maintenance()
             elif task_type == ScheduledTaskType.PERFORMANCE_ANALYSIS:
                 await self._execute_performance_analysis()
             
@@ -423,6 +438,12 @@ class SchedulerService:
         await self._cleanup_old_data()
         logger.info("System maintenance completed")
     
+    async def _execute_database_maintenance(self):
+        """Execute database maintenance tasks"""
+        # Creates partitions ahead of today, then drops the expired ones
+        await lean_db_manager.cleanup_old_data()
+        logger.info("Database maintenance completed")
+    
     async def _execute_performance_analysis(self):
         """Execute performance analysis"""
         # Run comprehensive performance analysis
@@ -12,6 +12,7 @@ import json
 import random
 import math
 
+from app.core.lean_order_book import order_book_engine
 from .market_hours_service import market_hours_service
 
 logger = logging.getLogger(__name__)
@@ -141,6 +142,16 @@ class SignalGenerationService:
         if not market_data:
             return signals
         
+        # Price off the live book when the feed has one for the symbol
+        quote = order_book_engine.quote(symbol)
+        if quote:
+            market_data = {
+                **market_data,
+                'price': quote['microprice'],
+                'spread': quote['spread'],
+                'imbalance': quote['imbalance']
+            }
+        
         # Apply different strategies based on market regime
         strategies = self._select_strategies_for_regime(market_regime)
         
@@ -224,6 +235,12 @@ class SignalGenerationService:
         
         adjustment = confidence_adjustments.get(market_regime, 0)
         
+        # Wide markets are costly to cross, so trust signals less
+        spread = market_data.get('spread')
+        if spread is not None and market_data.get('price'):
+            spread_bps = spread / market_data['price'] * 10000
+            adjustment -= min(10.0, max(0.0, spread_bps - 5))
+        
         # Add some randomness to simulate real-world variability
         random_factor = random.uniform(-5, 5)
         
@@ -252,6 +269,11 @@ class SignalGenerationService:
             if vix_level > 18:
                 return 'BUY', SignalStrength.STRONG  # Buy calls on VIX spike
         
+        # Lopsided top of book: follow the side with more resting size
+        imbalance = market_data.get('imbalance')
+        if imbalance is not None and abs(imbalance) >= 0.6:
+            return ('BUY' if imbalance > 0 else 'SELL'), SignalStrength.MODERATE
+        
         # Default to random for demo
         directions = ['BUY', 'SELL']
         strengths = list(SignalStrength)
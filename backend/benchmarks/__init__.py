@@ -0,0 +1 @@
+# Micro-benchmarks for Smart-Lean-0DTE backend hot paths
@@ -0,0 +1,117 @@
+"""
+AI Inference Benchmark for Smart-0DTE-System
+Compares per-snapshot model calls with LeanAIService.predict_batch.
+
+The models are the service defaults, trained on synthetic features, and the
+feature store is warmed with an hour of synthetic minute ticks. The
+per-snapshot path does what the three single-row methods used to do for each
+snapshot: extract and scale features three times, then ``predict_proba`` and
+``predict`` on the classifier, ``predict`` on the volatility regressor and on
+the strategy selector. The batch path builds one feature matrix for every
+underlying and candidate strike and runs each model once.
+
+Usage (from backend/):
+    python -m benchmarks.ai_inference_benchmark [--strikes 42] [--rounds 20]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.core.lean_feature_store import feature_store
+from app.services.lean_ai_service import LeanAIService
+
+
+def build_service(rng: np.random.Generator, samples: int = 1000) -> LeanAIService:
+    service = LeanAIService()
+    asyncio.run(service._initialize_default_models())
+    
+    features = rng.normal(size=(samples, len(service.essential_features)))
+    service.feature_scaler.fit(features)
+    scaled = service.feature_scaler.transform(features)
+    service.signal_classifier.fit(scaled, rng.integers(0, 4, samples))
+    service.volatility_predictor.fit(scaled, rng.random(samples))
+    service.strategy_selector.fit(scaled, rng.integers(0, 7, samples))
+    return service
+
+
+UNDERLYINGS = (('SPY', 450.0), ('QQQ', 380.0), ('IWM', 200.0), ('VIX', 18.0))
+
+
+def warm_feature_store(rng: np.random.Generator, minutes: int = 60) -> None:
+    """Replay ``minutes`` of one-minute synthetic ticks ending now."""
+    end = np.datetime64(datetime.utcnow(), "ns")
+    timestamps = end - np.arange(minutes, 0, -1) * np.timedelta64(60, "s")
+    feature_store.replay({
+        symbol: {
+            'timestamp': timestamps,
+            'price': price + np.cumsum(rng.normal(0, 0.05, minutes)),
+            'volume': rng.integers(1000, 11000, minutes).astype(np.float64)
+        }
+        for symbol, price in UNDERLYINGS
+    })
+
+
+def build_snapshots(rng: np.random.Generator, strikes: int) -> List[Dict[str, Any]]:
+    """One snapshot per underlying and candidate strike."""
+    snapshots = []
+    for symbol, price in UNDERLYINGS[:3]:
+        for offset in range(-(strikes // 2), strikes - strikes // 2):
+            snapshots.append({
+                'symbol': symbol,
+                'price': price,
+                'strike': round(price) + offset,
+                'volume': int(rng.integers(1000, 11000)),
+                'vix': 18.0
+            })
+    return snapshots
+
+
+def per_snapshot(service: LeanAIService, snapshots: List[Dict[str, Any]]) -> None:
+    for market_data in snapshots:
+        scaled = service.feature_scaler.transform(service._extract_essential_features(market_data))
+        service.signal_classifier.predict_proba(scaled)
+        service.signal_classifier.predict(scaled)
+        
+        scaled = service.feature_scaler.transform(service._extract_essential_features(market_data))
+        service.volatility_predictor.predict(scaled)
+        
+        scaled = service.feature_scaler.transform(service._extract_essential_features(market_data))
+        service.strategy_selector.predict(scaled)
+
+
+def batched(service: LeanAIService, snapshots: List[Dict[str, Any]]) -> None:
+    asyncio.run(service.predict_batch(snapshots))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--strikes", type=int, default=42, help="Candidate strikes per underlying")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(args.seed)
+    service = build_service(rng)
+    warm_feature_store(rng)
+    snapshots = build_snapshots(rng, args.strikes)
+    print(f"{len(snapshots)} snapshots per round, batch size {service.batch_size}")
+    
+    baseline = None
+    for name, func in (("per snapshot", per_snapshot), ("predict_batch", batched)):
+        func(service, snapshots)  # Warm up
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            func(service, snapshots)
+        elapsed = (time.perf_counter() - start) / args.rounds
+        baseline = baseline or elapsed
+        print(f"{name:<14} {elapsed * 1000:>9.2f} ms/round {elapsed / len(snapshots) * 1e6:>9.1f} us/snapshot "
+              f"{baseline / elapsed:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Codec Benchmark for Smart-0DTE-System
+Compares encode/decode latency and compression ratio of the registered codecs
+on market snapshot and 0DTE options-chain payloads.
+
+Usage (from backend/):
+    python -m benchmarks.codec_benchmark [--iterations 2000] [--train-dictionary]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, date, time as dt_time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from app.core.lean_codecs import (
+    CodecRegistry, Compressor, PayloadCodec, _ZstdCodec, codec_registry,
+    train_zstd_dictionary, zstandard
+)
+from app.core.lean_config import data_optimization
+
+
+def build_market_snapshot(symbol: str, rng: random.Random) -> Dict[str, Any]:
+    """Market snapshot shaped like LeanDatabentoService._fetch_market_data_from_api."""
+    price = round(450.0 + rng.uniform(-5, 5), 2)
+    return {
+        'symbol': symbol,
+        'price': price,
+        'volume': rng.randint(1000, 11000),
+        'timestamp': datetime.utcnow(),
+        'change': round(rng.uniform(-1, 1), 2),
+        'change_percent': round(rng.uniform(-0.1, 0.1), 4),
+        'bid': round(price - 0.05, 2),
+        'ask': round(price + 0.05, 2),
+        'high': round(price + rng.uniform(0, 2), 2),
+        'low': round(price - rng.uniform(0, 2), 2),
+        'open': round(price + rng.uniform(-1, 1), 2)
+    }
+
+
+def build_options_chain(symbol: str, rng: random.Random) -> Dict[str, Any]:
+    """0DTE chain (ATM +/-10 strikes) shaped like _fetch_options_data_from_api."""
+    underlying_price = 450.0 + rng.uniform(-5, 5)
+    expiry = datetime.combine(date.today(), dt_time())
+    options = []
+    
+    for i in range(-10, 11):
+        strike = round(underlying_price) + i
+        for option_type, sign in (('CALL', 1), ('PUT', -1)):
+            intrinsic = max(0.0, sign * (underlying_price - strike))
+            bid = round(max(0.01, intrinsic + rng.uniform(0, 1)), 2)
+            options.append({
+                'symbol': f"{symbol}{expiry.strftime('%y%m%d')}{option_type[0]}{int(strike):08d}",
+                'underlying_symbol': symbol,
+                'strike': float(strike),
+                'expiry': expiry,
+                'option_type': option_type,
+                'bid': bid,
+                'ask': round(bid + 0.01, 2),
+                'volume': rng.randint(1, 1000),
+                'open_interest': rng.randint(1, 5000),
+                'implied_volatility': round(0.15 + rng.uniform(0, 0.1), 4),
+                'delta': round(sign * max(0.01, min(0.99, 0.5 + sign * (underlying_price - strike) / 100)), 4),
+                'gamma': round(0.01 + rng.uniform(0, 0.005), 6),
+                'theta': round(-0.05 - rng.uniform(0, 0.005), 4),
+                'vega': round(0.1 + rng.uniform(0, 0.05), 4)
+            })
+    
+    return {'symbol': symbol, 'timestamp': datetime.utcnow(), 'expiry': expiry, 'options': options}
+
+
+def _time_us(func: Callable[[], Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def benchmark_codec(codec: PayloadCodec, payloads: List[Any], iterations: int) -> Dict[str, float]:
+    """Average encode/decode latency (µs) and compression ratio over payloads."""
+    raw_bytes = 0
+    encoded_bytes = 0
+    encode_us = 0.0
+    decode_us = 0.0
+    serializer = codec.serializer
+    
+    for payload in payloads:
+        encoded = codec.encode(payload)
+        raw_bytes += len(serializer.dumps(payload))
+        encoded_bytes += len(encoded)
+        encode_us += _time_us(lambda: codec.encode(payload), iterations)
+        decode_us += _time_us(lambda: codec.decode(encoded), iterations)
+    
+    return {
+        'encode_us': encode_us / len(payloads),
+        'decode_us': decode_us / len(payloads),
+        'avg_bytes': encoded_bytes / len(payloads),
+        'ratio': encoded_bytes / raw_bytes if raw_bytes else 1.0
+    }
+
+
+def _dictionary_registry(samples: List[Any]) -> CodecRegistry:
+    """Registry with an extra 'zstd-dict' compressor trained on ``samples``."""
+    registry = CodecRegistry()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dictionary_path = str(Path(tmp_dir) / "bench.zstd-dict")
+        train_zstd_dictionary(samples, dictionary_path)
+        zstd = _ZstdCodec(data_optimization.COMPRESSION_LEVEL, dictionary_path)
+    
+    registry.register_compressor(Compressor(
+        "zstd-dict", 4, zstd.compress, zstd.decompress, data_optimization.ZSTD_DICTIONARY_MIN_BYTES
+    ))
+    return registry
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--train-dictionary", action="store_true",
+                        help="also benchmark zstd with a dictionary trained on snapshots")
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    symbols = ["SPY", "QQQ", "IWM"]
+    workloads = {
+        "snapshot": [build_market_snapshot(symbol, rng) for symbol in symbols],
+        "options_chain": [build_options_chain(symbol, rng) for symbol in symbols],
+    }
+    
+    registry = codec_registry
+    if args.train_dictionary:
+        if zstandard is None:
+            parser.error("--train-dictionary requires the zstandard package")
+        training_samples = [build_market_snapshot(rng.choice(symbols), rng) for _ in range(2000)]
+        registry = _dictionary_registry(training_samples)
+    
+    print(f"{'workload':<14} {'codec':<18} {'encode µs':>10} {'decode µs':>10} {'bytes':>8} {'ratio':>7}")
+    for workload, payloads in workloads.items():
+        for serialization in registry.serializers:
+            for compression in registry.compressors:
+                codec = registry.get_codec(serialization, compression)
+                result = benchmark_codec(codec, payloads, args.iterations)
+                print(
+                    f"{workload:<14} {codec.name:<18} {result['encode_us']:>10.2f} "
+                    f"{result['decode_us']:>10.2f} {result['avg_bytes']:>8.0f} {result['ratio']:>7.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
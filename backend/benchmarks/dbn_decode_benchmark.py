@@ -0,0 +1,123 @@
+"""
+DBN Decode Benchmark for Smart-0DTE-System
+Compares dict-per-record decoding with structured NumPy batches from DBNReader.
+
+Every path turns TBBO records into prices, sizes, quotes and timestamps: the
+baseline builds one dict per record the way ``_fetch_market_data_from_api``
+shapes market data, the others convert whole columns per batch. Each path is
+timed once and then run again under tracemalloc to report peak bytes
+allocated. The synthetic stream starts with symbol mapping records, which
+``DBNStore.to_ndarray`` reads as quotes (its extra rows and truncation
+warning); DBNReader skips them.
+
+Usage (from backend/):
+    python -m benchmarks.dbn_decode_benchmark --records 1000000
+    python -m benchmarks.dbn_decode_benchmark --file data/dbn_cache/objects/ab/ab12....dbn
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+import databento as db
+import zstandard
+
+from app.core.lean_dbn_decode import DBNReader, to_price
+from benchmarks.live_feed_replay import write_synthetic_tbbo
+
+
+def dict_per_record(path: str) -> int:
+    decoded = []
+    for record in db.DBNStore.from_file(path):
+        if not isinstance(record, db.MBP1Msg):
+            continue
+        decoded.append({
+            'instrument_id': record.instrument_id,
+            'price': record.price * 1e-9,
+            'volume': record.size,
+            'bid': record.bid_px_00 * 1e-9,
+            'ask': record.ask_px_00 * 1e-9,
+            'timestamp': record.ts_event
+        })
+    return len(decoded)
+
+
+def databento_ndarray(path: str) -> int:
+    records = db.DBNStore.from_file(path).to_ndarray()
+    columns = (to_price(records["price"]), records["size"], to_price(records["bid_px_00"]),
+               to_price(records["ask_px_00"]), records["ts_event"])
+    return len(columns[0])
+
+
+def reader_batches(path: str) -> int:
+    count = 0
+    with DBNReader(path) as reader:
+        for batch in reader:
+            columns = (to_price(batch["price"]), batch["size"], to_price(batch["bid_px_00"]),
+                       to_price(batch["ask_px_00"]), batch["ts_event"])
+            count += len(columns[0])
+    return count
+
+
+def reader_views(path: str) -> int:
+    """Batches only, without materializing any column."""
+    count = 0
+    with DBNReader(path) as reader:
+        for batch in reader:
+            count += len(batch)
+    return count
+
+
+def measure(func: Callable[[str], int], path: str) -> Tuple[int, float, int]:
+    start = time.perf_counter()
+    records = func(path)
+    elapsed = time.perf_counter() - start
+    
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return records, elapsed, peak
+
+
+def run(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if path is None:
+            path = os.path.join(tmp, "tbbo.dbn")
+            write_synthetic_tbbo(path, args.records, args.seed)
+        
+        compressed_path = os.path.join(tmp, "tbbo.dbn.zst")
+        with open(path, "rb") as src, open(compressed_path, "wb") as dst:
+            zstandard.ZstdCompressor().copy_stream(src, dst)
+        print(f"input: {os.path.getsize(path):,} bytes, {os.path.getsize(compressed_path):,} compressed")
+        
+        cases = [
+            ("dict per record", dict_per_record, path),
+            ("DBNStore.to_ndarray", databento_ndarray, path),
+            ("DBNReader columns", reader_batches, path),
+            ("DBNReader columns (zstd)", reader_batches, compressed_path),
+            ("DBNReader views", reader_views, path),
+        ]
+        baseline = None
+        for name, func, case_path in cases:
+            records, elapsed, peak = measure(func, case_path)
+            rate = records / elapsed
+            baseline = baseline or rate
+            print(f"{name:<26} {records:>10} records {rate:>14,.0f} records/s "
+                  f"{rate / baseline:>7.1f}x  peak alloc {peak / 1e6:>9.2f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=500000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--file", help="Existing TBBO/MBP-1 DBN file instead of synthetic data")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
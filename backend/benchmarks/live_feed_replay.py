@@ -0,0 +1,89 @@
+"""
+Live Feed Replay Benchmark for Smart-0DTE-System
+Replays a DBN file through the live feed pipeline and reports records/sec.
+
+Without ``--file`` a synthetic TBBO file is written first, with symbol
+mapping records in the stream as the live gateway sends them. The file is
+replayed twice; the second pass checks that already-seen records are
+dropped, as they are when a reconnect replays from the last timestamp.
+
+Usage (from backend/):
+    python -m benchmarks.live_feed_replay --records 500000
+    python -m benchmarks.live_feed_replay --file data/replay/spy-tbbo.dbn
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import databento_dbn as dbn
+
+from app.core.lean_live_feed import DBNFileReplayer, LiveFeedPipeline
+
+SYMBOLS = ["SPY", "QQQ", "IWM"]
+
+
+def write_synthetic_tbbo(path: str, records: int, seed: int) -> None:
+    """Write a TBBO DBN file with random-walk trades for SYMBOLS."""
+    rng = random.Random(seed)
+    start_ns = time.time_ns() - records * 1000
+    metadata = dbn.Metadata(
+        dataset="XNAS.ITCH", start=start_ns, stype_in=dbn.SType.RAW_SYMBOL,
+        stype_out=dbn.SType.INSTRUMENT_ID, schema=dbn.Schema.TBBO, symbols=SYMBOLS
+    )
+    
+    with open(path, "wb") as f:
+        f.write(metadata.encode())
+        for instrument_id, symbol in enumerate(SYMBOLS, start=1):
+            f.write(bytes(dbn.SymbolMappingMsg(
+                0, instrument_id, start_ns, dbn.SType.RAW_SYMBOL, symbol,
+                dbn.SType.INSTRUMENT_ID, str(instrument_id), start_ns, start_ns + 86400 * 10**9
+            )))
+        
+        prices = {instrument_id: 450_000_000_000 for instrument_id in range(1, len(SYMBOLS) + 1)}
+        for i in range(records):
+            instrument_id = rng.randint(1, len(SYMBOLS))
+            prices[instrument_id] += rng.choice((-10_000_000, 0, 10_000_000))
+            price = prices[instrument_id]
+            ts_event = start_ns + i * 1000
+            f.write(bytes(dbn.MBP1Msg(
+                1, instrument_id, ts_event, price, rng.randint(1, 500), dbn.Action.TRADE,
+                dbn.Side.BID, 0, ts_event + 500, sequence=i + 1,
+                levels=dbn.BidAskPair(bid_px=price - 10_000_000, ask_px=price + 10_000_000,
+                                      bid_sz=rng.randint(1, 50), ask_sz=rng.randint(1, 50))
+            )))
+
+
+async def run(args: argparse.Namespace) -> None:
+    path = args.file
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "synthetic-tbbo.dbn")
+        write_synthetic_tbbo(path, args.records, args.seed)
+    
+    pipeline = LiveFeedPipeline(ring_capacity=args.ring_capacity)
+    
+    for label in ("first pass", "replayed again"):
+        start = time.perf_counter()
+        replayed = await DBNFileReplayer(pipeline, path, speed=0).run()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<16} {replayed:>10} records {elapsed:>8.3f}s {replayed / elapsed:>12,.0f} records/s")
+    
+    for symbol in pipeline.instruments.ids_by_symbol:
+        print(f"{symbol}: {pipeline.snapshot(symbol)}")
+    print(f"pipeline stats: {pipeline.get_stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--file", default=None, help="DBN file to replay instead of synthetic data")
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--ring-capacity", type=int, default=65536)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Order Book Benchmark for Smart-0DTE-System
+Applies synthetic MBO events to the order book engine and reports events/sec.
+
+Orders are added, partially cancelled and modified on either side of a
+fixed mid, with prices clustered near the top of book as on a real venue.
+The final book is checked against one rebuilt from the surviving orders,
+and the cost of the O(1) microprice read is timed separately.
+
+Usage (from backend/):
+    python -m benchmarks.order_book_replay --events 500000
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, List, Tuple
+
+import databento_dbn as dbn
+
+from app.core.lean_live_feed import LiveFeedPipeline
+from app.core.lean_order_book import F_LAST, OrderBookEngine
+
+TICK = 10_000_000  # $0.01 in DBN fixed-point units
+
+
+def synthetic_mbo(events: int, seed: int) -> Tuple[List[dbn.MBOMsg], Dict[int, Tuple[bool, int, int]]]:
+    """MBO records for instrument 1 and the orders left resting after them."""
+    rng = random.Random(seed)
+    mid = 45_000 * TICK
+    resting: Dict[int, Tuple[bool, int, int]] = {}
+    records = []
+    next_id = 0
+    
+    for i in range(events):
+        roll = rng.random()
+        
+        if roll < 0.45 or len(resting) < 100:
+            next_id += 1
+            is_bid = rng.random() < 0.5
+            offset = int(rng.expovariate(0.3)) * TICK
+            price = mid - TICK - offset if is_bid else mid + TICK + offset
+            order_id, action, size = next_id, dbn.Action.ADD, rng.randint(1, 500)
+            resting[order_id] = (is_bid, price, size)
+        else:
+            order_id = rng.choice(list(resting))
+            is_bid, price, size = resting[order_id]
+            if roll < 0.85:
+                action, size = dbn.Action.CANCEL, rng.randint(1, size)
+                remaining = resting[order_id][2] - size
+                if remaining:
+                    resting[order_id] = (is_bid, price, remaining)
+                else:
+                    del resting[order_id]
+            else:
+                action, size = dbn.Action.MODIFY, rng.randint(1, 500)
+                resting[order_id] = (is_bid, price, size)
+        
+        records.append(dbn.MBOMsg(
+            1, 1, i + 1, order_id, price, size, action,
+            dbn.Side.BID if is_bid else dbn.Side.ASK, i + 1,
+            flags=F_LAST, sequence=i + 1
+        ))
+    
+    return records, resting
+
+
+def check_book(engine: OrderBookEngine, resting: Dict[int, Tuple[bool, int, int]]) -> None:
+    levels: Dict[bool, Dict[int, int]] = {True: {}, False: {}}
+    for is_bid, price, size in resting.values():
+        levels[is_bid][price] = levels[is_bid].get(price, 0) + size
+    
+    depth = engine.depth("BENCH", depth=1 << 20)
+    for side, is_bid in (("bids", True), ("asks", False)):
+        expected = sorted(levels[is_bid].items(), reverse=is_bid)
+        actual = list(zip((round(price * 1e9) for price in depth[side]["price"]), depth[side]["size"]))
+        assert actual == expected, f"{side} differ from the rebuilt book"
+
+
+def run(args: argparse.Namespace) -> None:
+    records, resting = synthetic_mbo(args.events, args.seed)
+    
+    pipeline = LiveFeedPipeline(ring_capacity=1024)
+    pipeline.instruments.add(1, "BENCH")
+    engine = OrderBookEngine(pipeline)
+    
+    start = time.perf_counter()
+    for record in records:
+        pipeline.on_record(record)
+    elapsed = time.perf_counter() - start
+    print(f"applied {len(records):>10} events {elapsed:>8.3f}s {len(records) / elapsed:>12,.0f} events/s")
+    
+    check_book(engine, resting)
+    book = engine.books[1]
+    print(f"book matches rebuilt orders: {len(resting)} orders, "
+          f"{book.bids.count} bid / {book.asks.count} ask levels")
+    
+    reads = 1_000_000
+    start = time.perf_counter()
+    for _ in range(reads):
+        engine.microprice("BENCH")
+    elapsed = time.perf_counter() - start
+    print(f"microprice read {elapsed / reads * 1e9:>8.0f} ns")
+    print(f"quote: {engine.quote('BENCH')}")
+    print(f"engine stats: {engine.get_stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=7)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Tree Inference Benchmark for Smart-0DTE-System
+Compares sklearn tree ensembles with their compiled flat-array predictors.
+
+The models are the AI service defaults (signal classifier and strategy
+selector random forests, volatility gradient boosting regressor) trained on
+synthetic features. Before timing, every compiled predictor is checked
+against sklearn on held-out rows, including rows with missing values; the
+run fails if any prediction differs by more than the tolerance. Latency is
+the median of repeated calls at each batch size.
+
+Usage (from backend/):
+    python -m benchmarks.tree_inference_benchmark [--batch-sizes 1 10 1000] [--repeat 200]
+"""
+
+import argparse
+import time
+from typing import Any, Callable, List
+
+import numpy as np
+from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, RandomForestClassifier
+
+from app.core.lean_config import ai_optimization
+from app.core.lean_tree_compiler import compile_ensemble, max_abs_error
+from benchmarks.ai_inference_benchmark import build_service
+
+
+def median_us(func: Callable[[], Any], repeat: int) -> float:
+    func()  # Warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1e6
+
+
+def check_parity(name: str, model: Any, rows: List[np.ndarray]) -> None:
+    compiled = compile_ensemble(model)
+    for X in rows:
+        error = max_abs_error(model, compiled, X)
+        if error > ai_optimization.COMPILED_TREE_TOLERANCE:
+            raise SystemExit(f"{name}: compiled predictor differs from sklearn by {error}")
+    print(f"{name:<22} parity ok ({compiled.n_trees} trees, {compiled.n_nodes} nodes, depth {compiled.depth})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(args.seed)
+    service = build_service(rng)
+    features = len(service.essential_features)
+    models = {
+        "signal_classifier": (service.signal_classifier, "predict_proba"),
+        "strategy_selector": (service.strategy_selector, "predict_proba"),
+        "volatility_predictor": (service.volatility_predictor, "predict"),
+    }
+    
+    # Parity on held-out rows, with and without missing values, plus models trained with them
+    held_out = rng.normal(size=(5000, features))
+    with_nan = held_out.copy()
+    with_nan[rng.random(with_nan.shape) < 0.1] = np.nan
+    for name, (model, _) in models.items():
+        check_parity(name, model, [held_out, held_out[:1], np.round(held_out, 1)])
+    train = rng.normal(size=(1000, features))
+    train[rng.random(train.shape) < 0.05] = np.nan
+    target = np.nan_to_num(train[:, 0]) + rng.normal(0, 0.1, 1000)
+    check_parity("forest with NaN", RandomForestClassifier(n_estimators=10, max_depth=8, random_state=0)
+                 .fit(train, target > 0), [with_nan, held_out])
+    check_parity("extra trees", ExtraTreesRegressor(n_estimators=10, max_depth=8, random_state=0)
+                 .fit(np.nan_to_num(train), target), [held_out])
+    check_parity("gbr absolute_error", GradientBoostingRegressor(loss="absolute_error", n_estimators=20, random_state=0)
+                 .fit(np.nan_to_num(train), target), [held_out])
+    
+    print(f"\n{'model':<22}{'batch':>7}{'sklearn us':>13}{'compiled us':>13}{'speedup':>9}")
+    for name, (model, method) in models.items():
+        compiled = compile_ensemble(model)
+        for batch_size in args.batch_sizes:
+            X = held_out[:batch_size] if batch_size <= len(held_out) else rng.normal(size=(batch_size, features))
+            reference = median_us(lambda: getattr(model, method)(X), args.repeat)
+            flat = median_us(lambda: getattr(compiled, method)(X), args.repeat)
+            print(f"{name:<22}{batch_size:>7}{reference:>13.1f}{flat:>13.1f}{reference / flat:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
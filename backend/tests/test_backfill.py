@@ -0,0 +1,22 @@
+"""DBN cache partials: a run never discards another live run's downloads."""
+
+from app.core.lean_backfill import DBNCache
+
+
+def test_discard_partials_keeps_live_runs_and_removes_abandoned_ones(tmp_path):
+    running = DBNCache(str(tmp_path))
+    run_dir = running.begin_run()
+    running.partial_path(run_dir, "live").write_bytes(b"dbn")
+    
+    abandoned = tmp_path / "partial" / "1-abandoned"
+    abandoned.mkdir()
+    (abandoned / ".lock").touch()
+    (abandoned / "old.part").write_bytes(b"dbn")
+    
+    other = DBNCache(str(tmp_path))
+    assert other.discard_partials() == 1
+    assert not abandoned.exists()
+    assert running.partial_path(run_dir, "live").exists()
+    
+    running.end_run(run_dir)
+    assert not run_dir.exists()
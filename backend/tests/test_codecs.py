@@ -0,0 +1,42 @@
+"""zstd dictionaries: frames written before a retrain still decode."""
+
+import random
+
+import pytest
+
+from app.core.lean_codecs import _ZstdCodec, codec_registry, train_zstd_dictionary, zstandard
+
+pytestmark = pytest.mark.skipif(zstandard is None, reason="zstandard is not installed")
+
+
+def snapshots(seed):
+    rng = random.Random(seed)
+    return [
+        {
+            'symbol': rng.choice(['SPY', 'QQQ', 'IWM']),
+            'price': round(rng.uniform(300, 500), 2),
+            'volume': rng.randint(100, 100000),
+            'bid': round(rng.uniform(300, 500), 2),
+            'ask': round(rng.uniform(300, 500), 2),
+            'exchange': rng.choice(['XNAS', 'ARCX', 'BATS']) * seed,
+        }
+        for _ in range(2000)
+    ]
+
+
+def test_frames_from_a_previous_dictionary_decode_after_retraining(tmp_path):
+    path = str(tmp_path / "market_data.zstd-dict")
+    payload = codec_registry.serializers["msgpack"].dumps(snapshots(1)[0])
+    
+    train_zstd_dictionary(snapshots(1), path, dict_size=4096)
+    old = _ZstdCodec(3, path)
+    old_frame = old.compress(payload)
+    
+    train_zstd_dictionary(snapshots(2), path, dict_size=4096)
+    new = _ZstdCodec(3, path)
+    new_frame = new.compress(payload)
+    
+    assert new.dictionary.dict_id() != old.dictionary.dict_id()
+    assert new.decompress(old_frame) == payload
+    assert new.decompress(new_frame) == payload
+    assert new.decompress(zstandard.ZstdCompressor().compress(payload)) == payload
@@ -0,0 +1,61 @@
+"""Live feed replay handling and the quality check of buffered ticks."""
+
+import time
+
+import databento as db
+
+from app.core.lean_data_quality import DataQualityFilter
+from app.core.lean_live_feed import LiveFeedPipeline
+
+INSTRUMENT_ID = 7
+TS = 1_700_000_000_000_000_000
+
+
+def trade(price, size, ts_recv=TS, ts_event=TS):
+    return db.TradeMsg(
+        publisher_id=1, instrument_id=INSTRUMENT_ID, ts_event=ts_event,
+        price=int(price * 1e9), size=size, action=db.Action.TRADE, side=db.Side.BID, depth=0,
+        ts_recv=ts_recv, sequence=42
+    )
+
+
+def test_trades_sharing_a_key_are_both_stored():
+    pipeline = LiveFeedPipeline(ring_capacity=8)
+    pipeline.on_record(trade(100.00, 1))
+    pipeline.on_record(trade(100.01, 2))
+    
+    ticks = pipeline.rings[INSTRUMENT_ID].latest()
+    assert len(ticks) == 2
+    assert list(ticks["size"]) == [1, 2]
+    assert pipeline.stats["duplicates"] == 0
+
+
+def test_reconnect_drops_only_the_replayed_overlap():
+    pipeline = LiveFeedPipeline(ring_capacity=8)
+    pipeline.on_record(trade(100.00, 1))
+    pipeline.on_record(trade(100.01, 2))
+    
+    pipeline.begin_replay()
+    pipeline.on_record(trade(100.00, 1))
+    pipeline.on_record(trade(100.01, 2))
+    pipeline.on_record(trade(100.02, 3, ts_recv=TS + 1))
+    pipeline.on_record(trade(100.03, 4, ts_recv=TS + 1))
+    
+    assert list(pipeline.rings[INSTRUMENT_ID].latest()["size"]) == [1, 2, 3, 4]
+    assert pipeline.stats["duplicates"] == 2
+
+
+def test_snapshot_skips_ticks_rejected_by_the_quality_check():
+    pipeline = LiveFeedPipeline(ring_capacity=8, quality=DataQualityFilter())
+    pipeline.instruments.add(INSTRUMENT_ID, "X")
+    now = time.time_ns()
+    pipeline.on_record(trade(100.00, 1, ts_event=now))
+    pipeline.on_record(trade(0.0, 5, ts_event=now + 1))  # Invalid print
+    
+    snapshot = pipeline.snapshot("X")
+    assert snapshot["price"] == 100.00 and snapshot["low"] == 100.00
+    assert snapshot["volume"] == 1
+    
+    pipeline.on_record(trade(100.02, 2, ts_event=now + 2))
+    assert pipeline.snapshot("X")["price"] == 100.02
+    assert pipeline.rings[INSTRUMENT_ID].checked == 3
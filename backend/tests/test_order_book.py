@@ -0,0 +1,73 @@
+"""Order book replay handling: only a reconnect's overlap is dropped."""
+
+from types import SimpleNamespace
+
+from app.core.lean_live_feed import LiveFeedPipeline
+from app.core.lean_order_book import F_LAST, OrderBookEngine
+
+INSTRUMENT_ID = 7
+TS = 1_700_000_000_000_000_000
+
+
+def mbo(action, side="N", price=0, size=0, order_id=0, ts_recv=TS, flags=0):
+    return SimpleNamespace(
+        instrument_id=INSTRUMENT_ID, ts_event=TS, ts_recv=ts_recv, sequence=0,
+        action=action, side=side, price=int(price * 1e9), size=size,
+        order_id=order_id, flags=flags
+    )
+
+
+def engine_with_book(*records):
+    engine = OrderBookEngine(max_instruments=4, levels=4)
+    engine.instruments.add(INSTRUMENT_ID, "X")
+    for record in records:
+        engine.on_mbo(record)
+    return engine
+
+
+def snapshot():
+    return [
+        mbo("R"),
+        mbo("A", "B", 100.00, 5, order_id=1),
+        mbo("A", "A", 100.10, 10, order_id=2, flags=F_LAST),
+    ]
+
+
+def test_snapshot_records_sharing_a_key_are_all_applied():
+    engine = engine_with_book(*snapshot())
+    
+    quote = engine.quote("X")
+    assert quote is not None
+    assert quote["bid"] == 100.00 and quote["ask"] == 100.10
+    assert engine.stats["duplicates"] == 0
+    assert engine.stats["publishes"] == 1
+
+
+def test_trade_fill_cancel_of_one_match_reduce_the_level():
+    engine = engine_with_book(
+        *snapshot(),
+        mbo("T", "B", 100.10, 4, ts_recv=TS + 1),
+        mbo("F", "A", 100.10, 4, order_id=2, ts_recv=TS + 1),
+        mbo("C", "A", 100.10, 4, order_id=2, ts_recv=TS + 1, flags=F_LAST),
+    )
+    
+    assert engine.quote("X")["ask_size"] == 6
+    assert engine.stats["duplicates"] == 0
+
+
+def test_reconnect_drops_only_the_replayed_overlap():
+    pipeline = LiveFeedPipeline(ring_capacity=8)
+    engine = OrderBookEngine(pipeline, max_instruments=4, levels=4)
+    pipeline.instruments.add(INSTRUMENT_ID, "X")
+    for record in snapshot():
+        engine.on_mbo(record)
+    
+    pipeline.begin_replay()
+    # The gateway replays from the last ts_event: the whole snapshot again, then new events
+    for record in snapshot()[1:]:
+        engine.on_mbo(record)
+    engine.on_mbo(mbo("A", "B", 100.00, 3, order_id=3, ts_recv=TS + 1, flags=F_LAST))
+    engine.on_mbo(mbo("A", "B", 100.00, 2, order_id=4, ts_recv=TS + 1, flags=F_LAST))
+    
+    assert engine.stats["duplicates"] == 2
+    assert engine.quote("X")["bid_size"] == 10
@@ -0,0 +1,39 @@
+"""Write-behind buffer: a chunk that keeps failing is dead-lettered."""
+
+import asyncio
+
+import pytest
+
+from app.core.lean_write_buffer import WriteBehindBuffer
+
+
+def test_poison_chunk_is_dead_lettered_after_max_retries(tmp_path):
+    written = []
+    
+    async def writer(chunk):
+        if any(record["poison"] for record in chunk):
+            raise ValueError("cannot store")
+        written.extend(chunk)
+    
+    async def run():
+        buffer = WriteBehindBuffer("test", writer, batch_size=2, journal_dir=str(tmp_path), max_retries=3)
+        for i in range(4):
+            buffer.put_nowait({"i": i, "poison": i == 1})
+        
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await buffer.flush()
+        await buffer.flush()
+        return buffer
+    
+    buffer = asyncio.run(run())
+    
+    assert [record["i"] for record in written] == [2, 3]
+    assert buffer.stats["dead_lettered_chunks"] == 1
+    assert buffer.stats["dead_lettered_records"] == 2
+    assert buffer.get_stats()["unwritten_batches"] == 0
+    
+    dead = list((tmp_path / "test" / "dead_letter").glob("*.journal"))
+    assert len(dead) == 1
+    assert [record["i"] for record in buffer.journal.read_segment(dead[0])] == [0, 1]
+    assert buffer.journal.segments() == []